@@ -1,5 +1,131 @@
 import collections
-import statsmodels.formula.api as smf
+import numpy as np
+import pandas as pd
+
+# Columns of the rows returned by each aggregate function
+INFO_COLUMNS = ["sub_num", "datetime", "condition", "age", "sex", "RA"]
+ANT_COLUMNS = [
+    "sub_num",
+    "ant_follow_error_rt",
+    "ant_follow_correct_rt",
+    "ant_neutral_rt",
+    "ant_congruent_rt",
+    "ant_incongruent_rt",
+    "ant_neutral_rtsd",
+    "ant_congruent_rtsd",
+    "ant_incongruent_rtsd",
+    "ant_neutral_rtcov",
+    "ant_congruent_rtcov",
+    "ant_incongruent_rtcov",
+    "ant_neutral_correct",
+    "ant_congruent_correct",
+    "ant_incongruent_correct",
+    "ant_nocue_rt",
+    "ant_center_rt",
+    "ant_spatial_rt",
+    "ant_double_rt",
+    "ant_nocue_rtsd",
+    "ant_center_rtsd",
+    "ant_spatial_rtsd",
+    "ant_double_rtsd",
+    "ant_nocue_rtcov",
+    "ant_center_rtcov",
+    "ant_spatial_rtcov",
+    "ant_double_rtcov",
+    "ant_nocue_correct",
+    "ant_center_correct",
+    "ant_spatial_correct",
+    "ant_double_correct",
+    "ant_conflict_intercept",
+    "ant_conflict_slope",
+    "ant_conflict_slope_norm",
+    "ant_alerting_intercept",
+    "ant_alerting_slope",
+    "ant_alerting_slope_norm",
+    "ant_orienting_intercept",
+    "ant_orienting_slope",
+    "ant_orienting_slope_norm",
+]
+DIGIT_SPAN_COLUMNS = [
+    "sub_num",
+    "digit_correct_count",
+    "digit_correct_prop",
+    "digit_num_items",
+]
+FLANKER_COMPAT_COLUMNS = [
+    "sub_num",
+    "flanker_compat_follow_error_rt",
+    "flanker_compat_follow_correct_rt",
+    "flanker_compat_congruent_rt",
+    "flanker_compat_incongruent_rt",
+    "flanker_compat_congruent_rtsd",
+    "flanker_compat_incongruent_rtsd",
+    "flanker_compat_congruent_rtcov",
+    "flanker_compat_incongruent_rtcov",
+    "flanker_compat_congruent_correct",
+    "flanker_compat_incongruent_correct",
+    "flanker_compat_conflict_intercept",
+    "flanker_compat_conflict_slope",
+    "flanker_compat_conflict_slope_norm",
+]
+FLANKER_INCOMPAT_COLUMNS = [
+    "sub_num",
+    "flanker_incompat_follow_error_rt",
+    "flanker_incompat_follow_correct_rt",
+    "flanker_incompat_congruent_rt",
+    "flanker_incompat_incongruent_rt",
+    "flanker_incompat_congruent_rtsd",
+    "flanker_incompat_incongruent_rtsd",
+    "flanker_incompat_congruent_rtcov",
+    "flanker_incompat_incongruent_rtcov",
+    "flanker_incompat_congruent_correct",
+    "flanker_incompat_incongruent_correct",
+    "flanker_incompat_conflict_intercept",
+    "flanker_incompat_conflict_slope",
+    "flanker_incompat_conflict_slope_norm",
+]
+MRT_COLUMNS = ["sub_num", "mrt_count", "mrt_prop", "mrt_num_items"]
+RAVENS_COLUMNS = [
+    "sub_num",
+    "ravens_rt",
+    "ravens_count",
+    "ravens_prop",
+    "ravens_num_items",
+]
+SART_COLUMNS = [
+    "sub_num",
+    "sart_follow_error_rt",
+    "sart_follow_correct_rt",
+    "sart_total_rt",
+    "sart_total_rtsd",
+    "sart_total_rtcov",
+    "sart_frequent_rt",
+    "sart_frequent_rtsd",
+    "sart_frequent_rtcov",
+    "sart_infrequent_rt",
+    "sart_infrequent_rtsd",
+    "sart_infrequent_rtcov",
+    "sart_error_count",
+    "sart_errors_prop",
+    "sart_errors_num_items",
+]
+STERNBERG_COLUMNS = [
+    "sub_num",
+    "stern_follow_error_rt",
+    "stern_follow_correct_rt",
+    "stern_set_2_rt",
+    "stern_set_6_rt",
+    "stern_set_2_rtsd",
+    "stern_set_6_rtsd",
+    "stern_set_2_rtcov",
+    "stern_set_6_rtcov",
+    "stern_set_2_correct",
+    "stern_set_6_correct",
+    "stern_intercept",
+    "stern_slope",
+    "stern_slope_norm",
+]
+FLANKER_BOTH_COLUMNS = FLANKER_COMPAT_COLUMNS + FLANKER_INCOMPAT_COLUMNS[1:]
 
 
 def aggregate_digit_span(data, sub_num):
@@ -67,7 +193,165 @@ def aggregate_sart(data, sub_num):
     ]
 
 
-def aggregate_ant(data, sub_num, response_type="full"):
+# Columns of a condition summary. Object labels, as building an index of
+# strings costs more than the summary itself on current pandas
+SUMMARY_COLUMNS = pd.Index(["rt", "rtsd", "rtcov", "correct"], dtype=object)
+
+
+def _condition_summaries(df, conditions):
+    """Return the RT descriptives and number correct of each condition level.
+
+    Every level of every condition is summarised in a single grouped pass.
+    Each trial is numbered with a group per condition (its level), and the
+    trial counts, RT sums, squared RT deviations and numbers correct of all
+    the groups are each one np.bincount. Missing RTs are left out, as by
+    pandas.
+
+    Parameters:
+    df -- trial data with RT and correct columns
+    conditions -- list of (condition column, levels) pairs. The levels are
+        in output order. Missing levels give NaN
+
+    Returns:
+    summaries -- list of DataFrames, one per condition, indexed by level,
+        with rt, rtsd, rtcov and correct columns
+    """
+
+    rt = df["RT"].to_numpy(dtype=float)
+    correct = df["correct"].to_numpy(dtype=float)
+
+    # Group of each trial under each condition, with one spare group for
+    # levels that are not summarised
+    groups = []
+    num_groups = 0
+    for condition, levels in conditions:
+        numbers = {level: num_groups + i for i, level in enumerate(levels)}
+        groups.append([numbers.get(level, -1) for level in df[condition].tolist()])
+        num_groups += len(levels)
+    groups = np.array(groups, dtype=int).ravel()
+    groups[groups < 0] = num_groups
+
+    rts = np.tile(rt, len(conditions))
+    timed = ~np.isnan(rts)
+
+    size = np.bincount(groups, minlength=num_groups + 1)
+    count = np.bincount(groups[timed], minlength=num_groups + 1)
+    number_correct = np.bincount(
+        groups, np.tile(correct, len(conditions)), minlength=num_groups + 1
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(groups[timed], rts[timed], num_groups + 1) / count
+        deviations = (rts[timed] - mean[groups[timed]]) ** 2
+        sd = np.sqrt(
+            np.bincount(groups[timed], deviations, num_groups + 1) / (count - 1)
+        )
+
+    # Levels without timed trials have no RT SD, and missing levels no number
+    # correct either
+    sd = np.where(count > 0, sd, np.nan)
+    number_correct = np.where(size > 0, number_correct, np.nan)
+    integer_correct = pd.api.types.infer_dtype(df["correct"]) == "integer"
+
+    summaries = []
+    start = 0
+    for condition, levels in conditions:
+        level_groups = slice(start, start + len(levels))
+        start += len(levels)
+
+        level_mean = mean[level_groups]
+        level_sd = sd[level_groups]
+        level_correct = number_correct[level_groups]
+
+        summary = pd.DataFrame(
+            np.column_stack(
+                [level_mean, level_sd, level_sd / level_mean, level_correct]
+            ),
+            pd.Index(levels, name=condition, dtype=object),
+            SUMMARY_COLUMNS,
+        )
+
+        # Numbers correct stay integers, as pandas sums them, unless a level
+        # is missing
+        if integer_correct and not np.isnan(level_correct).any():
+            summary["correct"] = level_correct.astype(int)
+
+        summaries.append(summary)
+
+    return summaries
+
+
+def _condition_summary(df, condition, levels):
+    """Return the RT descriptives and number correct of each condition level.
+
+    Parameters:
+    df -- trial data with RT and correct columns
+    condition -- name of the condition column
+    levels -- condition levels, in output order. Missing levels give NaN
+
+    Returns:
+    summary -- DataFrame indexed by level, with rt, rtsd, rtcov and correct
+        columns
+    """
+
+    return _condition_summaries(df, [(condition, levels)])[0]
+
+
+def _summary_values(summary):
+    # Flatten a condition summary statistic by statistic, e.g. the RT of every
+    # level, then the RT SD of every level
+    return [value for column in summary.columns for value in summary[column]]
+
+
+def contrast(df, condition, reference, level, method="closed"):
+    """Return the intercept and slope of RT on a two-level condition.
+
+    These are the parameters of the OLS fit of
+    RT ~ C(condition, Treatment(reference)) to the trials of both levels. For
+    a single treatment-coded predictor the intercept is the mean RT of the
+    reference level, and the slope the difference between the mean RTs of
+    the two levels, so no model needs to be fit.
+
+    Parameters:
+    df -- trial data with an RT column
+    condition -- name of the condition column
+    reference -- reference level
+    level -- level compared to the reference
+    method -- "closed" to use the mean RTs, or "statsmodels" to fit the model
+        with statsmodels, e.g. to verify the closed form
+
+    Returns:
+    intercept -- mean RT of the reference level
+    slope -- RT difference of the level from the reference
+    """
+
+    if method == "closed":
+        means = df.groupby(condition)["RT"].mean()
+        intercept = means.get(reference, float("nan"))
+        slope = means.get(level, float("nan")) - intercept
+    elif method == "statsmodels":
+        import statsmodels.formula.api as smf
+
+        df = df[(df[condition] == reference) | (df[condition] == level)]
+        formula = "RT ~ C(%s, Treatment(reference=%r))" % (condition, reference)
+        intercept, slope = smf.ols(formula, df).fit().params
+    else:
+        raise ValueError("Unknown contrast method: %s" % method)
+
+    return intercept, slope
+
+
+def _summary_contrast(df, summary, reference, level, method):
+    # contrast() of a summarised condition. The closed form is read from the
+    # mean RTs of the summary, without grouping the trials again
+    if method == "closed":
+        intercept = summary.at[reference, "rt"]
+        return intercept, summary.at[level, "rt"] - intercept
+
+    return contrast(df, summary.index.name, reference, level, method)
+
+
+def aggregate_ant(data, sub_num, response_type="full", method="closed"):
 
     # Calculate times following errors and correct responses
     df = data
@@ -82,113 +366,53 @@ def aggregate_ant(data, sub_num, response_type="full"):
         df = data
 
     # Aggregated descriptives
-
-    ## congruency conditions
-    grouped_congruency = df.groupby("congruency")
-    neutral_rt = grouped_congruency.mean().get_value("neutral", "RT")
-    congruent_rt = grouped_congruency.mean().get_value("congruent", "RT")
-    incongruent_rt = grouped_congruency.mean().get_value("incongruent", "RT")
-
-    neutral_rtsd = grouped_congruency.std().get_value("neutral", "RT")
-    congruent_rtsd = grouped_congruency.std().get_value("congruent", "RT")
-    incongruent_rtsd = grouped_congruency.std().get_value("incongruent", "RT")
-
-    neutral_rtcov = neutral_rtsd / neutral_rt
-    congruent_rtcov = congruent_rtsd / congruent_rt
-    incongruent_rtcov = incongruent_rtsd / incongruent_rt
-
-    neutral_correct = grouped_congruency.sum().get_value("neutral", "correct")
-    congruent_correct = grouped_congruency.sum().get_value("congruent", "correct")
-    incongruent_correct = grouped_congruency.sum().get_value("incongruent", "correct")
-
-    ## cue conditions
-    grouped_cue = df.groupby("cue")
-    nocue_rt = grouped_cue.mean().get_value("nocue", "RT")
-    center_rt = grouped_cue.mean().get_value("center", "RT")
-    spatial_rt = grouped_cue.mean().get_value("spatial", "RT")
-    double_rt = grouped_cue.mean().get_value("double", "RT")
-
-    nocue_rtsd = grouped_cue.std().get_value("nocue", "RT")
-    center_rtsd = grouped_cue.std().get_value("center", "RT")
-    spatial_rtsd = grouped_cue.std().get_value("spatial", "RT")
-    double_rtsd = grouped_cue.std().get_value("double", "RT")
-
-    nocue_rtcov = nocue_rtsd / nocue_rt
-    center_rtcov = center_rtsd / center_rt
-    spatial_rtcov = spatial_rtsd / spatial_rt
-    double_rtcov = double_rtsd / double_rt
-
-    nocue_correct = grouped_cue.sum().get_value("nocue", "correct")
-    center_correct = grouped_cue.sum().get_value("center", "correct")
-    spatial_correct = grouped_cue.sum().get_value("spatial", "correct")
-    double_correct = grouped_cue.sum().get_value("double", "correct")
-
-    # OLS regression
-    conflict_df = df[
-        (df["congruency"] == "congruent") | (df["congruency"] == "incongruent")
-    ]
-    formula_conflict = "RT ~ C(congruency, Treatment(reference='congruent'))"
-    ols_results = smf.ols(formula_conflict, conflict_df).fit()
-    conflict_intercept, conflict_slope = ols_results.params
+    congruency, cue = _condition_summaries(
+        df,
+        [
+            ("congruency", ["neutral", "congruent", "incongruent"]),
+            ("cue", ["nocue", "center", "spatial", "double"]),
+        ],
+    )
+
+    congruent_rt = congruency.at["congruent", "rt"]
+    double_rt = cue.at["double", "rt"]
+    spatial_rt = cue.at["spatial", "rt"]
+
+    # Regression contrasts
+    conflict_intercept, conflict_slope = _summary_contrast(
+        df, congruency, "congruent", "incongruent", method
+    )
     conflict_slope_norm = conflict_slope / congruent_rt
 
-    alerting_df = df[(df["cue"] == "double") | (df["cue"] == "nocue")]
-    formula_alerting = "RT ~ C(cue, Treatment(reference='double'))"
-    ols_results = smf.ols(formula_alerting, alerting_df).fit()
-    alerting_intercept, alerting_slope = ols_results.params
+    alerting_intercept, alerting_slope = _summary_contrast(
+        df, cue, "double", "nocue", method
+    )
     alerting_slope_norm = alerting_slope / double_rt
 
-    orienting_df = df[(df["cue"] == "spatial") | (df["cue"] == "center")]
-    formula_orienting = "RT ~ C(cue, Treatment(reference='spatial'))"
-    ols_results = smf.ols(formula_orienting, orienting_df).fit()
-    orienting_intercept, orienting_slope = ols_results.params
+    orienting_intercept, orienting_slope = _summary_contrast(
+        df, cue, "spatial", "center", method
+    )
     orienting_slope_norm = orienting_slope / spatial_rt
 
-    return [
-        sub_num,
-        follow_error_rt,
-        follow_correct_rt,
-        neutral_rt,
-        congruent_rt,
-        incongruent_rt,
-        neutral_rtsd,
-        congruent_rtsd,
-        incongruent_rtsd,
-        neutral_rtcov,
-        congruent_rtcov,
-        incongruent_rtcov,
-        neutral_correct,
-        congruent_correct,
-        incongruent_correct,
-        nocue_rt,
-        center_rt,
-        spatial_rt,
-        double_rt,
-        nocue_rtsd,
-        center_rtsd,
-        spatial_rtsd,
-        double_rtsd,
-        nocue_rtcov,
-        center_rtcov,
-        spatial_rtcov,
-        double_rtcov,
-        nocue_correct,
-        center_correct,
-        spatial_correct,
-        double_correct,
-        conflict_intercept,
-        conflict_slope,
-        conflict_slope_norm,
-        alerting_intercept,
-        alerting_slope,
-        alerting_slope_norm,
-        orienting_intercept,
-        orienting_slope,
-        orienting_slope_norm,
-    ]
+    return (
+        [sub_num, follow_error_rt, follow_correct_rt]
+        + _summary_values(congruency)
+        + _summary_values(cue)
+        + [
+            conflict_intercept,
+            conflict_slope,
+            conflict_slope_norm,
+            alerting_intercept,
+            alerting_slope,
+            alerting_slope_norm,
+            orienting_intercept,
+            orienting_slope,
+            orienting_slope_norm,
+        ]
+    )
 
 
-def aggregate_sternberg(data, sub_num, response_type="full"):
+def aggregate_sternberg(data, sub_num, response_type="full", method="closed"):
 
     # Calculate times following errors and correct responses
     df = data
@@ -203,42 +427,21 @@ def aggregate_sternberg(data, sub_num, response_type="full"):
         df = data
 
     # Aggregated descriptives
-    grouped_set_size = df.groupby("setSize")
-    set_2_rt = grouped_set_size.mean().get_value(2, "RT")
-    set_2_rtsd = grouped_set_size.std().get_value(2, "RT")
-    set_2_rtcov = set_2_rtsd / set_2_rt
-    set_2_correct = grouped_set_size.sum().get_value(2, "correct")
-
-    set_6_rt = grouped_set_size.mean().get_value(6, "RT")
-    set_6_rtsd = grouped_set_size.std().get_value(6, "RT")
-    set_6_rtcov = set_6_rtsd / set_6_rt
-    set_6_correct = grouped_set_size.sum().get_value(6, "correct")
-
-    # OLS regression
-    formula = "RT ~ C(setSize, Treatment(reference=2))"
-    ols_results = smf.ols(formula, df).fit()
-    intercept, slope = ols_results.params
+    set_size = _condition_summary(df, "setSize", [2, 6])
+    set_2_rt = set_size.at[2, "rt"]
+
+    # Regression contrast
+    intercept, slope = _summary_contrast(df, set_size, 2, 6, method)
     slope_norm = slope / set_2_rt
 
-    return [
-        sub_num,
-        follow_error_rt,
-        follow_correct_rt,
-        set_2_rt,
-        set_6_rt,
-        set_2_rtsd,
-        set_6_rtsd,
-        set_2_rtcov,
-        set_6_rtcov,
-        set_2_correct,
-        set_6_correct,
-        intercept,
-        slope,
-        slope_norm,
-    ]
+    return (
+        [sub_num, follow_error_rt, follow_correct_rt]
+        + _summary_values(set_size)
+        + [intercept, slope, slope_norm]
+    )
 
 
-def aggregate_flanker(data, sub_num, response_type="full"):
+def aggregate_flanker(data, sub_num, response_type="full", method="closed"):
 
     columns = [sub_num]
 
@@ -257,45 +460,19 @@ def aggregate_flanker(data, sub_num, response_type="full"):
         elif response_type == "full":
             df = df_cur
 
-        grouped_congruency = df.groupby(["congruency"])
-
-        congruent_rt = grouped_congruency.mean().get_value("congruent", "RT")
-        incongruent_rt = grouped_congruency.mean().get_value("incongruent", "RT")
+        congruency = _condition_summary(df, "congruency", ["congruent", "incongruent"])
+        congruent_rt = congruency.at["congruent", "rt"]
 
-        congruent_rtsd = grouped_congruency.std().get_value("congruent", "RT")
-        incongruent_rtsd = grouped_congruency.std().get_value("incongruent", "RT")
-
-        congruent_rtcov = congruent_rtsd / congruent_rt
-        incongruent_rtcov = incongruent_rtsd / incongruent_rt
-
-        congruent_correct = grouped_congruency.sum().get_value("congruent", "correct")
-        incongruent_correct = grouped_congruency.sum().get_value(
-            "incongruent", "correct"
+        # Regression contrast
+        conflict_intercept, conflict_slope = _summary_contrast(
+            df, congruency, "congruent", "incongruent", method
         )
-
-        # OLS regression
-        conflict_df = df[
-            (df["congruency"] == "congruent") | (df["congruency"] == "incongruent")
-        ]
-        formula_conflict = "RT ~ C(congruency, Treatment(reference='congruent'))"
-        ols_results = smf.ols(formula_conflict, conflict_df).fit()
-        conflict_intercept, conflict_slope = ols_results.params
         conflict_slope_norm = conflict_slope / congruent_rt
 
-        columns += [
-            follow_error_rt,
-            follow_correct_rt,
-            congruent_rt,
-            incongruent_rt,
-            congruent_rtsd,
-            incongruent_rtsd,
-            congruent_rtcov,
-            incongruent_rtcov,
-            congruent_correct,
-            incongruent_correct,
-            conflict_intercept,
-            conflict_slope,
-            conflict_slope_norm,
-        ]
+        columns += (
+            [follow_error_rt, follow_correct_rt]
+            + _summary_values(congruency)
+            + [conflict_intercept, conflict_slope, conflict_slope_norm]
+        )
 
     return columns
@@ -0,0 +1,277 @@
+import pandas as pd
+import analysis
+
+# Statistics of each condition level, in the order of the summary columns
+CONDITION_STATS = ["rt", "rtsd", "rtcov", "correct"]
+
+
+def _subjects(trials):
+    # Every subject in a trial table, in output order
+    return pd.Index(trials["sub_num"].unique()).sort_values()
+
+
+def _follow_rts(trials, accuracy="correct"):
+    """Return the mean RT following errors and following correct responses.
+
+    The previous trial is taken within each subject, as it is when each
+    subject is aggregated separately.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    accuracy -- name of the accuracy column, 1 for correct and 0 for errors
+    """
+
+    subject = trials["sub_num"]
+    previous = trials[accuracy].groupby(subject, sort=False).shift()
+
+    return pd.concat(
+        [
+            trials["RT"].where(previous == 0).groupby(subject).mean(),
+            trials["RT"].where(previous == 1).groupby(subject).mean(),
+        ],
+        axis=1,
+    )
+
+
+def _filter_responses(trials, response_type):
+    # Keep the trials used for the descriptives: full / correct / incorrect
+    if response_type == "correct":
+        return trials[trials["correct"] == 1]
+    elif response_type == "incorrect":
+        return trials[trials["correct"] == 0]
+
+    return trials
+
+
+def _condition_summary(trials, condition, levels):
+    """Return the RT descriptives and number correct of each subject and level.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    condition -- name of the condition column
+    levels -- condition levels, in output order. Missing levels give NaN
+
+    Returns:
+    summary -- DataFrame indexed by subject, with a column for every
+        (statistic, level) pair, ordered statistic by statistic
+    """
+
+    grouped = trials.groupby(["sub_num", condition])
+    rt = grouped["RT"].mean()
+    rtsd = grouped["RT"].std()
+
+    summary = pd.concat(
+        [rt, rtsd, rtsd / rt, grouped["correct"].sum()],
+        axis=1,
+        keys=CONDITION_STATS,
+    ).unstack(condition)
+
+    return summary.reindex(
+        columns=pd.MultiIndex.from_product([CONDITION_STATS, levels])
+    )
+
+
+def _contrasts(summary, reference, level):
+    """Return the regression intercept and slope, and the normalised slope.
+
+    The closed form of analysis.contrast(), from the mean RT of each level.
+
+    Parameters:
+    summary -- condition summary from _condition_summary()
+    reference -- reference level
+    level -- level compared to the reference
+    """
+
+    intercept = summary[("rt", reference)]
+    slope = summary[("rt", level)] - intercept
+
+    return pd.concat([intercept, slope, slope / intercept], axis=1)
+
+
+def _summary_frame(parts, subjects, columns):
+    """Join the parts of a summary into one table with one row per subject.
+
+    Parameters:
+    parts -- DataFrames or Series indexed by subject, in column order
+    subjects -- index of every subject
+    columns -- names of the summary columns, starting with sub_num
+    """
+
+    # Number the columns so that parts with different headers can be joined
+    frames = []
+    num_columns = 0
+    for part in parts:
+        frame = pd.DataFrame(part).reindex(subjects)
+        frame.columns = range(num_columns, num_columns + frame.shape[1])
+        num_columns += frame.shape[1]
+        frames.append(frame)
+
+    summary = pd.concat(frames, axis=1)
+    summary.columns = columns[1:]
+    summary.insert(0, "sub_num", subjects)
+
+    return summary.reset_index(drop=True)
+
+
+def _score_summary(trials, columns):
+    # Number correct, proportion correct and number of items
+    grouped = trials.groupby("sub_num")["correct"]
+    count = grouped.sum()
+    num_items = grouped.size()
+
+    return _summary_frame(
+        [count, count / num_items, num_items], _subjects(trials), columns
+    )
+
+
+def aggregate_digit_span(trials):
+    """Summarize the backwards digit span task of every subject.
+
+    Each aggregate function takes the trials of every subject in a single
+    long-format table, with a sub_num column, and returns the same columns as
+    the analysis function of the same name, with one row per subject.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    """
+
+    return _score_summary(trials, analysis.DIGIT_SPAN_COLUMNS)
+
+
+def aggregate_mrt(trials):
+    """Summarize the mental rotation task of every subject.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    """
+
+    return _score_summary(trials, analysis.MRT_COLUMNS)
+
+
+def aggregate_ravens(trials):
+    """Summarize the Raven's matrices of every subject.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    """
+
+    grouped = trials.groupby("sub_num")
+    count = grouped["correct"].sum()
+    num_items = grouped.size()
+
+    return _summary_frame(
+        [grouped["RT"].mean(), count, count / num_items, num_items],
+        _subjects(trials),
+        analysis.RAVENS_COLUMNS,
+    )
+
+
+def aggregate_sart(trials):
+    """Summarize the SART of every subject.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    """
+
+    subject = trials["sub_num"]
+    infrequent = trials["stimulus"] == 3
+
+    parts = [_follow_rts(trials, "accuracy")]
+    for rt in [
+        trials["RT"],
+        trials["RT"].where(~infrequent),
+        trials["RT"].where(infrequent),
+    ]:
+        grouped = rt.groupby(subject)
+        mean = grouped.mean()
+        sd = grouped.std()
+        parts += [mean, sd, sd / mean]
+
+    # Key presses to the infrequent stimulus (3) are errors
+    error_count = trials["key press"].where(infrequent).groupby(subject).sum()
+    num_items = infrequent.groupby(subject).sum()
+    parts += [error_count, error_count / num_items, num_items]
+
+    return _summary_frame(parts, _subjects(trials), analysis.SART_COLUMNS)
+
+
+def aggregate_ant(trials, response_type="full"):
+    """Summarize the attention network test of every subject.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    response_type -- trials used for the descriptives: "full", "correct" or
+        "incorrect"
+    """
+
+    subjects = _subjects(trials)
+    follow_rts = _follow_rts(trials)
+    trials = _filter_responses(trials, response_type)
+
+    congruency = _condition_summary(
+        trials, "congruency", ["neutral", "congruent", "incongruent"]
+    )
+    cue = _condition_summary(trials, "cue", ["nocue", "center", "spatial", "double"])
+
+    parts = [
+        follow_rts,
+        congruency,
+        cue,
+        _contrasts(congruency, "congruent", "incongruent"),
+        _contrasts(cue, "double", "nocue"),
+        _contrasts(cue, "spatial", "center"),
+    ]
+
+    return _summary_frame(parts, subjects, analysis.ANT_COLUMNS)
+
+
+def aggregate_sternberg(trials, response_type="full"):
+    """Summarize the Sternberg task of every subject.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    response_type -- trials used for the descriptives: "full", "correct" or
+        "incorrect"
+    """
+
+    subjects = _subjects(trials)
+    follow_rts = _follow_rts(trials)
+    trials = _filter_responses(trials, response_type)
+
+    set_size = _condition_summary(trials, "setSize", [2, 6])
+    parts = [follow_rts, set_size, _contrasts(set_size, 2, 6)]
+
+    return _summary_frame(parts, subjects, analysis.STERNBERG_COLUMNS)
+
+
+def aggregate_flanker(trials, response_type="full"):
+    """Summarize the Eriksen flanker task of every subject.
+
+    Subjects that only did one compatibility condition have NaN in the
+    columns of the other.
+
+    Parameters:
+    trials -- long-format trial data of every subject
+    response_type -- trials used for the descriptives: "full", "correct" or
+        "incorrect"
+    """
+
+    subjects = _subjects(trials)
+
+    parts = []
+    for compatibility in ["compatible", "incompatible"]:
+        compat_trials = trials[trials["compatibility"] == compatibility]
+
+        follow_rts = _follow_rts(compat_trials)
+        compat_trials = _filter_responses(compat_trials, response_type)
+
+        congruency = _condition_summary(
+            compat_trials, "congruency", ["congruent", "incongruent"]
+        )
+        parts += [
+            follow_rts,
+            congruency,
+            _contrasts(congruency, "congruent", "incongruent"),
+        ]
+
+    return _summary_frame(parts, subjects, analysis.FLANKER_BOTH_COLUMNS)
@@ -0,0 +1,176 @@
+import os
+import json
+import sqlite3
+import hashlib
+import numpy as np
+
+# Default name of the cache file, kept in the data directory
+CACHE_FILE = ".aggregate_cache.sqlite"
+
+# Increase when the aggregated values change, to discard old cached rows
+CACHE_VERSION = 1
+
+# Size of the chunks that files are read in when hashing
+HASH_CHUNK = 1 << 20
+
+
+def _files(path):
+    # Files making up a session: the file itself, or every file in a directory
+    if os.path.isdir(path):
+        return [os.path.join(path, f) for f in sorted(os.listdir(path))]
+
+    return [path]
+
+
+def file_stat(path):
+    """Return the total size and latest modification time of a session.
+
+    Parameters:
+    path -- path to a session file or directory
+    """
+
+    stats = [os.stat(f) for f in _files(path)]
+
+    return sum(s.st_size for s in stats), max(s.st_mtime for s in stats)
+
+
+def file_hash(path):
+    """Return the SHA-1 hash of the contents of a session.
+
+    Parameters:
+    path -- path to a session file or directory
+    """
+
+    digest = hashlib.sha1()
+    for f in _files(path):
+        digest.update(os.path.basename(f).encode("utf-8"))
+        with open(f, "rb") as session_file:
+            for chunk in iter(lambda: session_file.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def fingerprint(path):
+    """Return the size, modification time and content hash of a session.
+
+    Parameters:
+    path -- path to a session file or directory
+    """
+
+    size, mtime = file_stat(path)
+
+    return size, mtime, file_hash(path)
+
+
+def _json_value(value):
+    # NumPy scalars are not serialisable by the json module
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+class AggregateCache(object):
+    """Persistent cache of the summary rows of each session.
+
+    Rows are keyed by the absolute session path, and stored with the size,
+    modification time and content hash of the session. A session whose size
+    and modification time are unchanged is not read again. If only the
+    modification time changed (e.g. the file was copied), the contents are
+    hashed and the rows reused when the hash still matches.
+
+    Parameters:
+    path -- path to the SQLite cache file. Created if it does not exist
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != CACHE_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS sessions")
+            self.connection.execute("PRAGMA user_version = %d" % CACHE_VERSION)
+
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, hash TEXT, "
+            "method TEXT, rows TEXT)"
+        )
+        self.connection.commit()
+
+    def get(self, path, method):
+        """Return the cached summary rows of a session, or None if outdated.
+
+        Parameters:
+        path -- path to the saved session
+        method -- regression contrast method the rows were aggregated with
+        """
+
+        entry = self.connection.execute(
+            "SELECT size, mtime, hash, method, rows FROM sessions WHERE path = ?",
+            (os.path.abspath(path),),
+        ).fetchone()
+        if entry is None:
+            return None
+
+        size, mtime, content_hash, cached_method, rows = entry
+        current_size, current_mtime = file_stat(path)
+
+        if cached_method != method or current_size != size:
+            return None
+        elif current_mtime != mtime:
+            if file_hash(path) != content_hash:
+                return None
+
+            self.connection.execute(
+                "UPDATE sessions SET mtime = ? WHERE path = ?",
+                (current_mtime, os.path.abspath(path)),
+            )
+
+        return json.loads(rows)
+
+    def set(self, path, session_fingerprint, method, rows):
+        """Store the summary rows of a session.
+
+        Parameters:
+        path -- path to the saved session
+        session_fingerprint -- (size, mtime, hash) from fingerprint()
+        method -- regression contrast method the rows were aggregated with
+        rows -- dictionary of summary rows, keyed by summary table name
+        """
+
+        rows = dict(
+            (name, [_json_value(value) for value in row]) for name, row in rows.items()
+        )
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(path),)
+            + tuple(session_fingerprint)
+            + (method, json.dumps(rows)),
+        )
+
+    def prune(self, paths):
+        """Remove the sessions that are not in a list of paths.
+
+        Parameters:
+        paths -- paths of the sessions to keep
+        """
+
+        keep = set(os.path.abspath(path) for path in paths)
+        cached = [
+            row[0] for row in self.connection.execute("SELECT path FROM sessions")
+        ]
+
+        self.connection.executemany(
+            "DELETE FROM sessions WHERE path = ?",
+            [(path,) for path in cached if path not in keep],
+        )
+
+    def close(self):
+        """Write the changes to the cache file and close it."""
+
+        self.connection.commit()
+        self.connection.close()
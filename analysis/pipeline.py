@@ -0,0 +1,530 @@
+import os
+import sys
+import argparse
+import pandas as pd
+import cache
+import analysis
+import batch
+
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Battery modules (session storage) live in the parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import storage
+
+# Summary tables, in the order they are merged into the output
+SUMMARY_COLUMNS = [
+    ("info", analysis.INFO_COLUMNS),
+    ("ant", analysis.ANT_COLUMNS),
+    ("digit", analysis.DIGIT_SPAN_COLUMNS),
+    ("flanker_compat", analysis.FLANKER_COMPAT_COLUMNS),
+    ("flanker_incompat", analysis.FLANKER_INCOMPAT_COLUMNS),
+    ("flanker_both", analysis.FLANKER_BOTH_COLUMNS),
+    ("mrt", analysis.MRT_COLUMNS),
+    ("ravens", analysis.RAVENS_COLUMNS),
+    ("sart", analysis.SART_COLUMNS),
+    ("sternberg", analysis.STERNBERG_COLUMNS),
+]
+
+
+SUMMARY_TABLES = dict(SUMMARY_COLUMNS)
+
+# Columns of the streamed subject rows: every summary column once. The
+# columns of the single compatibility Flanker summaries are part of those of
+# the summary with both
+STREAM_COLUMNS = list(
+    OrderedDict.fromkeys(column for _, columns in SUMMARY_COLUMNS for column in columns)
+)
+
+# Subject information columns that hold text. All other columns are numbers
+TEXT_COLUMNS = ["sub_num", "datetime", "sex", "RA"]
+
+# Number of subject rows written to the output at a time when streaming
+CHUNK_SIZE = 1000
+
+# Number of sessions queued per worker process
+MAX_PENDING = 4
+
+# Batch aggregate function of each task, in the order they are merged
+BATCH_AGGREGATES = [
+    ("ANT", batch.aggregate_ant),
+    ("Digit span (backwards)", batch.aggregate_digit_span),
+    ("Eriksen Flanker", batch.aggregate_flanker),
+    ("MRT", batch.aggregate_mrt),
+    ("Ravens Matrices", batch.aggregate_ravens),
+    ("SART", batch.aggregate_sart),
+    ("Sternberg", batch.aggregate_sternberg),
+]
+
+
+def _info(info):
+    # Subject information columns of the summary
+    return info[analysis.INFO_COLUMNS].astype({"condition": int, "age": int})
+
+
+def summarize_session(path, session_storage, method="closed"):
+    """Aggregate the data of every task in a single session.
+
+    Parameters:
+    path -- path to the saved session
+    session_storage -- storage backend the session was saved with
+    method -- regression contrast method, see analysis.contrast()
+
+    Returns:
+    rows -- dictionary of summary rows, keyed by summary table name
+    """
+
+    sub = session_storage.load(path)
+    sub_num = sub[storage.INFO_TABLE].loc[0, "sub_num"]
+
+    rows = {}
+    for task, data in sub.items():
+        if task == storage.INFO_TABLE:
+            rows["info"] = list(_info(data).loc[0])
+        elif task == "ANT":
+            # full / correct / incorrect
+            rows["ant"] = analysis.aggregate_ant(data, sub_num, "full", method)
+        elif task == "Digit span (backwards)":
+            rows["digit"] = analysis.aggregate_digit_span(data, sub_num)
+        elif task == "Eriksen Flanker":
+            compat_conditions = data["compatibility"].unique()
+            if len(compat_conditions) == 2:
+                flanker_table = "flanker_both"
+            elif compat_conditions[0] == "compatible":
+                flanker_table = "flanker_compat"
+            else:
+                flanker_table = "flanker_incompat"
+
+            # full / correct / incorrect
+            rows[flanker_table] = analysis.aggregate_flanker(
+                data, sub_num, "full", method
+            )
+        elif task == "MRT":
+            rows["mrt"] = analysis.aggregate_mrt(data, sub_num)
+        elif task == "Ravens Matrices":
+            rows["ravens"] = analysis.aggregate_ravens(data, sub_num)
+        elif task == "SART":
+            rows["sart"] = analysis.aggregate_sart(data, sub_num)
+        elif task == "Sternberg":
+            # full / correct / incorrect
+            rows["sternberg"] = analysis.aggregate_sternberg(
+                data, sub_num, "full", method
+            )
+
+    return rows
+
+
+def _show_progress(done, total, path):
+    sys.stderr.write(
+        "\r[%d/%d] Processed %s\033[K" % (done, total, os.path.basename(path))
+    )
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def _iter_sessions(function, sessions, workers=None, progress=True, *args):
+    """Call a function on every session, in parallel worker processes.
+
+    Results are yielded as soon as they are ready, in the order the sessions
+    finish. Only a few sessions per worker are queued at a time, so memory
+    use does not grow with the number of sessions. Sessions that fail are
+    reported on stderr and skipped.
+
+    Parameters:
+    function -- function taking the session path, storage backend and args
+    sessions -- list of (path, storage) pairs
+    workers -- number of worker processes. Defaults to the number of CPUs.
+        With a single worker, sessions are processed in this process
+    progress -- show progress on stderr
+    args -- further arguments to the function
+    """
+
+    errors = []
+
+    if workers == 1:
+        for i, (path, session_storage) in enumerate(sessions):
+            try:
+                result = function(path, session_storage, *args)
+            except Exception as e:
+                errors.append((path, e))
+                result = None
+
+            if progress:
+                _show_progress(i + 1, len(sessions), path)
+
+            if result is not None:
+                yield result
+    else:
+        max_pending = MAX_PENDING * (workers or os.cpu_count() or 1)
+        queued = iter(sessions)
+        pending = {}
+        done = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                for path, session_storage in queued:
+                    future = executor.submit(function, path, session_storage, *args)
+                    pending[future] = path
+                    if len(pending) >= max_pending:
+                        break
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = pending.pop(future)
+                    done += 1
+
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append((path, e))
+                        result = None
+
+                    if progress:
+                        _show_progress(done, len(sessions), path)
+
+                    if result is not None:
+                        yield result
+
+    for path, e in errors:
+        sys.stderr.write("Skipped %s: %s\n" % (path, e))
+
+
+def _map_sessions(function, sessions, workers=None, progress=True, *args):
+    """Call a function on every session and return the list of results.
+
+    See _iter_sessions() for the parameters.
+    """
+
+    return list(_iter_sessions(function, sessions, workers, progress, *args))
+
+
+def _summarize_fingerprinted(path, session_storage, method="closed"):
+    # Fingerprint the session before reading it, so that a change made while
+    # it is summarized is picked up on the next run
+    session_fingerprint = cache.fingerprint(path)
+    rows = summarize_session(path, session_storage, method)
+
+    return path, session_fingerprint, rows
+
+
+def _session_summaries(dir_data, workers, progress, method, cache_file):
+    """Yield the summary rows of every session in a data directory.
+
+    Parameters are as for summarize().
+    """
+
+    sessions = storage.find_sessions(dir_data)
+
+    if cache_file is None:
+        for rows in _iter_sessions(
+            summarize_session, sessions, workers, progress, method
+        ):
+            yield rows
+        return
+
+    aggregate_cache = cache.AggregateCache(cache_file)
+    try:
+        changed = []
+        num_cached = 0
+        for path, session_storage in sessions:
+            cached_rows = aggregate_cache.get(path, method)
+            if cached_rows is None:
+                changed.append((path, session_storage))
+            else:
+                num_cached += 1
+                yield cached_rows
+
+        if progress:
+            sys.stderr.write(
+                "%d cached, %d new or changed sessions\n" % (num_cached, len(changed))
+            )
+
+        for path, session_fingerprint, rows in _iter_sessions(
+            _summarize_fingerprinted, changed, workers, progress, method
+        ):
+            aggregate_cache.set(path, session_fingerprint, method, rows)
+            yield rows
+
+        aggregate_cache.prune(path for path, _ in sessions)
+    finally:
+        aggregate_cache.close()
+
+
+def summarize(dir_data, workers=None, progress=True, method="closed", cache_file=None):
+    """Aggregate every session in a data directory into a single table.
+
+    Sessions are summarized in parallel, one per worker process. The summary
+    rows of each task are collected in lists, and every summary table is
+    built once at the end.
+
+    Parameters:
+    dir_data -- data directory
+    workers -- number of worker processes. Defaults to the number of CPUs.
+        With a single worker, sessions are summarized in this process
+    progress -- show progress on stderr
+    method -- regression contrast method, see analysis.contrast()
+    cache_file -- path to an aggregate cache (see cache.AggregateCache).
+        Only new or changed sessions are summarized, and the cache is updated
+
+    Returns:
+    all_data -- DataFrame with one row per subject
+    """
+
+    results = _session_summaries(dir_data, workers, progress, method, cache_file)
+
+    rows = dict((name, []) for name, _ in SUMMARY_COLUMNS)
+    for result in results:
+        for name, row in result.items():
+            rows[name].append(row)
+
+    # Merge task data
+    ## Only merge tasks that were used
+    all_data = pd.DataFrame(rows["info"], columns=analysis.INFO_COLUMNS)
+    for name, columns in SUMMARY_COLUMNS[1:]:
+        if rows[name]:
+            task = pd.DataFrame(rows[name], columns=columns)
+            all_data = all_data.merge(task, on="sub_num", how="left")
+
+    return all_data.sort_values("sub_num").reset_index(drop=True)
+
+
+def _subject_row(rows):
+    # Join the summary rows of a session into a single row, by column name
+    row = OrderedDict.fromkeys(STREAM_COLUMNS)
+    for name, values in rows.items():
+        row.update(zip(SUMMARY_TABLES[name], values))
+
+    return row
+
+
+def stream_summaries(
+    dir_data, workers=None, progress=True, method="closed", cache_file=None
+):
+    """Yield the summary of each subject as soon as it is computed.
+
+    Unlike summarize(), no summary tables are kept in memory. Each session is
+    joined into a single row with every column in STREAM_COLUMNS, so no
+    merges are needed. Rows are yielded in the order the sessions finish.
+
+    Parameters:
+    Same as summarize()
+
+    Returns:
+    rows -- iterator of ordered dictionaries, keyed by column name
+    """
+
+    for rows in _session_summaries(dir_data, workers, progress, method, cache_file):
+        yield _subject_row(rows)
+
+
+def write_summaries(rows, output_file, chunk_size=CHUNK_SIZE):
+    """Write subject summary rows to a CSV or Parquet file, in chunks.
+
+    Only one chunk of rows is held in memory at a time. Parquet output
+    requires pyarrow, and writes one row group per chunk.
+
+    Parameters:
+    rows -- iterator of subject rows, e.g. from stream_summaries()
+    output_file -- path of the file to create. Files ending in .parquet are
+        written as Parquet, and anything else as CSV
+    chunk_size -- number of rows written at a time
+
+    Returns:
+    num_rows -- number of rows written
+    """
+
+    parquet = output_file.endswith(".parquet")
+    if parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [
+                (column, pa.string() if column in TEXT_COLUMNS else pa.float64())
+                for column in STREAM_COLUMNS
+            ]
+        )
+        writer = pq.ParquetWriter(output_file, schema)
+    else:
+        writer = open(output_file, "w", newline="")
+
+    num_rows = 0
+    try:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                _write_chunk(writer, chunk, num_rows == 0, parquet)
+                num_rows += len(chunk)
+                chunk = []
+
+        if chunk or num_rows == 0:
+            _write_chunk(writer, chunk, num_rows == 0, parquet)
+            num_rows += len(chunk)
+    finally:
+        writer.close()
+
+    return num_rows
+
+
+def _write_chunk(writer, chunk, header, parquet):
+    # Write a chunk of subject rows to an open CSV file or Parquet writer
+    chunk = pd.DataFrame(chunk, columns=STREAM_COLUMNS)
+
+    if parquet:
+        import pyarrow as pa
+
+        numbers = [column for column in STREAM_COLUMNS if column not in TEXT_COLUMNS]
+        chunk[numbers] = chunk[numbers].astype(float)
+        writer.write_table(
+            pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+        )
+    else:
+        chunk.to_csv(writer, header=header, index=False, sep=",")
+
+
+def load_session(path, session_storage, tasks=None):
+    """Load a session, with a sub_num column added to every task table.
+
+    Parameters:
+    path -- path to the saved session
+    session_storage -- storage backend the session was saved with
+    tasks -- list of task (sheet) names to load, with the subject
+        information. Defaults to every task
+
+    Returns:
+    sub -- ordered dictionary of DataFrames, keyed by sheet name
+    """
+
+    if tasks is not None:
+        tasks = [storage.INFO_TABLE] + list(tasks)
+
+    sub = session_storage.load(path, tasks)
+    sub_num = sub[storage.INFO_TABLE].loc[0, "sub_num"]
+
+    for task, data in sub.items():
+        if task != storage.INFO_TABLE:
+            data.insert(0, "sub_num", sub_num)
+
+    return sub
+
+
+def summarize_batch(dir_data, workers=None, progress=True, tasks=None):
+    """Aggregate every session in a data directory with the batch functions.
+
+    Sessions are loaded in parallel, and the trials of each task are joined
+    into a single long-format table that is aggregated for all subjects at
+    once. Flanker summaries always have the columns of both compatibility
+    conditions.
+
+    Parameters:
+    dir_data -- data directory
+    workers -- number of worker processes used to load the sessions
+    progress -- show progress on stderr
+    tasks -- list of task (sheet) names to summarize. Only these sheets are
+        read. Defaults to every task
+
+    Returns:
+    all_data -- DataFrame with one row per subject
+    """
+
+    sessions = storage.find_sessions(dir_data)
+    tables = {}
+
+    for sub in _map_sessions(load_session, sessions, workers, progress, tasks):
+        for task, data in sub.items():
+            tables.setdefault(task, []).append(data)
+
+    all_data = _info(pd.concat(tables[storage.INFO_TABLE], ignore_index=True))
+    for task, aggregate in BATCH_AGGREGATES:
+        if task in tables:
+            trials = pd.concat(tables[task], ignore_index=True)
+            all_data = all_data.merge(aggregate(trials), on="sub_num", how="left")
+
+    return all_data.sort_values("sub_num").reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Summarize the battery data of every subject into a CSV file"
+    )
+    parser.add_argument("data", help="data directory")
+    parser.add_argument("output", help="path of the output file to create")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        choices=["closed", "statsmodels"],
+        default="closed",
+        help="regression contrast method. statsmodels fits each model, e.g. to "
+        "verify the closed form (default: closed)",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        action="store_true",
+        help="aggregate the trials of all subjects at once. Faster with many "
+        "subjects, and always uses the closed form contrasts",
+    )
+    parser.add_argument(
+        "-s",
+        "--stream",
+        action="store_true",
+        help="write each subject to the output as soon as it is summarized, "
+        "keeping memory use flat. Rows are not sorted. Outputs ending in "
+        ".parquet are written as Parquet",
+    )
+    parser.add_argument(
+        "-t",
+        "--task",
+        action="append",
+        dest="tasks",
+        help="only read and summarize this task, e.g. SART. Can be given more "
+        "than once. Implies --batch",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="summarize every session again instead of using the aggregate "
+        "cache in the data directory",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="do not show progress"
+    )
+    args = parser.parse_args(argv)
+
+    if args.no_cache:
+        cache_file = None
+    else:
+        cache_file = os.path.join(args.data, cache.CACHE_FILE)
+
+    if args.batch or args.tasks:
+        all_data = summarize_batch(args.data, args.workers, not args.quiet, args.tasks)
+    elif args.stream:
+        rows = stream_summaries(
+            args.data, args.workers, not args.quiet, args.method, cache_file
+        )
+        write_summaries(rows, args.output)
+        return
+    else:
+        all_data = summarize(
+            args.data, args.workers, not args.quiet, args.method, cache_file
+        )
+
+    all_data.to_csv(args.output, index=False, sep=",")
+
+
+if __name__ == "__main__":
+    main()
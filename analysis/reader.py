@@ -0,0 +1,112 @@
+import os
+import sys
+import pandas as pd
+
+from collections import OrderedDict
+
+# Battery modules (session storage) live in the parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import storage
+
+
+class SessionReader(object):
+    """Read selected tasks of the saved sessions in a data directory.
+
+    Only the requested tables of each session are parsed, so reading one task,
+    or just the subject information, takes a fraction of the time of loading
+    whole sessions. The tasks each session contains are indexed the first
+    time they are needed.
+
+    Parameters:
+    dir_data -- data directory
+    """
+
+    def __init__(self, dir_data):
+        self.dir_data = dir_data
+        self.sessions = OrderedDict(storage.find_sessions(dir_data))
+        self.tables = {}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def table_names(self, path):
+        """Return the names of the tables (info and tasks) in a session.
+
+        Parameters:
+        path -- path to the saved session
+        """
+
+        if path not in self.tables:
+            self.tables[path] = self.sessions[path].table_names(path)
+
+        return self.tables[path]
+
+    def index(self):
+        """Return the tables in every session.
+
+        Returns:
+        index -- ordered dictionary of table name lists, keyed by session path
+        """
+
+        return OrderedDict((path, self.table_names(path)) for path in self.sessions)
+
+    def sessions_with(self, task):
+        """Return the paths of the sessions that contain a task.
+
+        Parameters:
+        task -- task (sheet) name, e.g. "SART"
+        """
+
+        return [path for path in self.sessions if task in self.table_names(path)]
+
+    def read(self, path, tables=None):
+        """Read tables of a single session.
+
+        Parameters:
+        path -- path to the saved session
+        tables -- list of table names to read. Defaults to every table
+
+        Returns:
+        sub -- ordered dictionary of DataFrames, keyed by table name
+        """
+
+        return self.sessions[path].load(path, tables)
+
+    def read_info(self):
+        """Read the subject information of every session, and nothing else.
+
+        Returns:
+        info -- DataFrame with one row per session
+        """
+
+        info = [self.read(path, [storage.INFO_TABLE]) for path in self.sessions]
+
+        return pd.concat(
+            [sub[storage.INFO_TABLE] for sub in info if storage.INFO_TABLE in sub],
+            ignore_index=True,
+        )
+
+    def read_task(self, task):
+        """Read the trials of one task from every session that contains it.
+
+        Parameters:
+        task -- task (sheet) name, e.g. "SART"
+
+        Returns:
+        trials -- long-format DataFrame of the trials of every subject, with a
+            sub_num column, as taken by the batch aggregate functions
+        """
+
+        trials = []
+        for path in self.sessions:
+            sub = self.read(path, [storage.INFO_TABLE, task])
+            if task in sub:
+                data = sub[task]
+                data.insert(0, "sub_num", sub[storage.INFO_TABLE].loc[0, "sub_num"])
+                trials.append(data)
+
+        if not trials:
+            return pd.DataFrame()
+
+        return pd.concat(trials, ignore_index=True)
@@ -0,0 +1,538 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+import pygame
+
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Battery modules live in the parent directory, analysis modules in analysis/
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.join(BASE_DIR, "analysis"))
+
+import analysis
+
+from utils import clock, display, journal, simulation, storage
+
+# Default thresholds, next to this script
+THRESHOLDS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "thresholds.json"
+)
+
+# Durations of the timed waits (ms), and the number of waits of each
+WAIT_DURATIONS = [1, 5, 10, 17, 50, 100]
+WAIT_REPEATS = 20
+
+# Number of times each task is created / each aggregate function is run
+INIT_REPEATS = 3
+AGGREGATE_REPEATS = 20
+
+# Length of the capped render loop that the frame rate is measured over (s)
+RENDER_SECONDS = 2
+
+# Tasks whose (copyrighted) item images are not included: the image
+# directory, and an item image that must be in it (None for any PNG image)
+TASK_IMAGES = OrderedDict(
+    [
+        ("MRT", (os.path.join(BASE_DIR, "tasks", "images", "MRT"), "0a.png")),
+        (
+            "Ravens Matrices",
+            (os.path.join(BASE_DIR, "tasks", "images", "Ravens"), None),
+        ),
+    ]
+)
+
+# Per-subject aggregate function of each task
+AGGREGATES = OrderedDict(
+    [
+        ("ANT", analysis.aggregate_ant),
+        ("Digit span (backwards)", analysis.aggregate_digit_span),
+        ("Eriksen Flanker", analysis.aggregate_flanker),
+        ("MRT", analysis.aggregate_mrt),
+        ("Ravens Matrices", analysis.aggregate_ravens),
+        ("SART", analysis.aggregate_sart),
+        ("Sternberg", analysis.aggregate_sternberg),
+    ]
+)
+
+
+def _stats(values):
+    # Summary statistics of a list of measurements
+    values = np.asarray(values, dtype=float)
+
+    return OrderedDict(
+        [
+            ("n", int(values.size)),
+            ("mean", float(values.mean())),
+            ("median", float(np.median(values))),
+            ("p95", float(np.percentile(values, 95))),
+            ("max", float(values.max())),
+        ]
+    )
+
+
+def _metric(value, unit, stats=None):
+    # A measured value, with the statistics it was taken from
+    metric = OrderedDict([("value", round(float(value), 6)), ("unit", unit)])
+    if stats is not None:
+        metric["stats"] = OrderedDict((k, round(v, 6)) for k, v in stats.items())
+
+    return metric
+
+
+def _skipped(reason):
+    return OrderedDict([("skipped", reason)])
+
+
+def _failed(error):
+    # A benchmark that raised an error, which fails the run
+    return OrderedDict([("error", "%s: %s" % (type(error).__name__, error))])
+
+
+def _missing_images(name):
+    # Reason a task cannot be created for lack of images, or None
+    if name not in TASK_IMAGES:
+        return None
+
+    path, image = TASK_IMAGES[name]
+    files = os.listdir(path) if os.path.isdir(path) else []
+    if image in files or (image is None and any(f.endswith(".png") for f in files)):
+        return None
+
+    return "item images are not installed in %s (see README)" % path
+
+
+class BenchmarkParticipant(simulation.SimulatedParticipant):
+    """Simulated participant that records the real time of each response."""
+
+    def __init__(self, *args, **kwargs):
+        super(BenchmarkParticipant, self).__init__(*args, **kwargs)
+        self.last_response = None
+
+    def post(self, response, time_us):
+        super(BenchmarkParticipant, self).post(response, time_us)
+        self.last_response = time.perf_counter()
+
+
+class BenchmarkJournal(journal.TrialJournal):
+    """Trial journal that records the real time from a response to its write.
+
+    Parameters:
+    path -- path to the journal file
+    participant -- BenchmarkParticipant making the responses
+    """
+
+    def __init__(self, path, participant):
+        super(BenchmarkJournal, self).__init__(path)
+        self.participant = participant
+        self.latencies = OrderedDict()
+
+    def write_trial(self, records, i, phase="main"):
+        super(BenchmarkJournal, self).write_trial(records, i, phase)
+
+        if self.participant.last_response is not None:
+            latency = time.perf_counter() - self.participant.last_response
+            self.latencies.setdefault(self.task, []).append(latency * 1000)
+            self.participant.last_response = None
+
+
+def benchmark_task_init(tasks, seed):
+    """Time the creation of each task (asset loading and trial set up).
+
+    Parameters:
+    tasks -- list of task names
+    seed -- seed for the trial schedules
+
+    Returns:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    available -- names of the tasks that could be created
+    """
+
+    metrics = OrderedDict()
+    available = []
+
+    screen, background = simulation.open_screen()
+    try:
+        for name in tasks:
+            # The copyrighted Ravens and MRT images may not be installed
+            reason = _missing_images(name)
+            if reason is not None:
+                metrics["task_init_s." + name] = _skipped(reason)
+                continue
+
+            times = []
+            for _ in range(INIT_REPEATS):
+                start = time.perf_counter()
+                simulation.create_task(name, screen, background, seed)
+                times.append(time.perf_counter() - start)
+
+            stats = _stats(times)
+            metrics["task_init_s." + name] = _metric(stats["median"], "s", stats)
+            available.append(name)
+    finally:
+        pygame.quit()
+
+    return metrics, available
+
+
+def benchmark_session(tasks, seed, journal_file):
+    """Run a simulated session, timing each task and the response writes.
+
+    Parameters:
+    tasks -- list of task names
+    seed -- seed for the trial schedules and responses
+    journal_file -- path of the session journal to create
+
+    Returns:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    """
+
+    metrics = OrderedDict()
+
+    participant = BenchmarkParticipant(seed)
+    session_journal = BenchmarkJournal(journal_file, participant)
+    session_journal.write_frame(
+        storage.INFO_TABLE,
+        pd.DataFrame(
+            [("", "1", "1", 25, "other", "benchmark", ", ".join(tasks))],
+            columns=["datetime", "sub_num", "condition", "age", "sex", "RA", "tasks"],
+        ),
+    )
+
+    try:
+        for name in tasks:
+            start = time.perf_counter()
+            simulation.run_tasks([name], participant, seed, journal=session_journal)
+            metrics["simulation_s." + name] = _metric(time.perf_counter() - start, "s")
+
+            latencies = session_journal.latencies.get(name)
+            if latencies:
+                stats = _stats(latencies)
+                metrics["response_write_latency_ms." + name] = _metric(
+                    stats["p95"], "ms", stats
+                )
+    finally:
+        session_journal.close()
+
+    return metrics
+
+
+def benchmark_render():
+    """Measure the frame rate of a capped render loop on the real clock.
+
+    The loop redraws a task-like screen (background and a timer line) and
+    ticks a FrameLimiter, as the Ravens, MRT and digit span render loops do.
+    It should keep up with the limiter's frame rate.
+
+    Returns:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    """
+
+    metrics = OrderedDict()
+    real_clock = clock.MonotonicClock()
+
+    screen, background = simulation.open_screen()
+    try:
+        font = pygame.font.SysFont("arial", 30)
+        background.fill((255, 255, 255))
+        frame_limiter = display.FrameLimiter(display.FRAME_RATE, real_clock)
+        num_frames = RENDER_SECONDS * display.FRAME_RATE
+
+        pygame.event.clear()
+        onsets = []
+        for i in range(num_frames + 1):
+            screen.blit(background, (0, 0))
+            line = display.render_text(
+                font, "Time left: %d" % (i // display.FRAME_RATE), (0, 0, 0)
+            )
+            screen.blit(line, (100, 100))
+
+            frame_limiter.tick()
+            onsets.append(display.flip(real_clock))
+    finally:
+        pygame.quit()
+
+    intervals = np.diff(onsets) / 1000
+    stats = _stats(intervals)
+    metrics["render_fps"] = _metric(1000 / stats["mean"], "fps", stats)
+    metrics["render_frame_interval_ms.p95"] = _metric(stats["p95"], "ms")
+
+    return metrics
+
+
+def benchmark_session_write(journal_file, directory):
+    """Time saving and loading a session in every storage format.
+
+    The same steps as at the end of BatteryWindow.start(): the journal is
+    read back and saved by each storage backend. Each saved session is then
+    loaded, as the analysis loads it. The journal itself is also loaded as a
+    session, as for a session whose files were never saved.
+
+    Parameters:
+    journal_file -- path of the session journal
+    directory -- directory to save the session files in
+
+    Returns:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    sessions -- ordered dictionary of the loaded session tables, keyed by
+        storage format
+    """
+
+    metrics = OrderedDict()
+    sessions = OrderedDict()
+
+    start = time.perf_counter()
+    tables = journal.read_journal(journal_file)
+    metrics["session_read_s.journal"] = _metric(time.perf_counter() - start, "s")
+
+    start = time.perf_counter()
+    sessions["journal"] = storage.JournalStorage().load(journal_file)
+    metrics["session_load_s.journal"] = _metric(time.perf_counter() - start, "s")
+
+    for data_format in ["excel", "parquet", "feather"]:
+        try:
+            backend = storage.get_storage(data_format)
+
+            start = time.perf_counter()
+            path = backend.save(tables, directory, "benchmark_" + data_format)
+            duration = time.perf_counter() - start
+        except (ImportError, ValueError) as e:
+            # Optional writer packages (e.g. xlwt, pyarrow) are not installed
+            metrics["session_write_s." + data_format] = _skipped(str(e))
+            continue
+
+        metrics["session_write_s." + data_format] = _metric(duration, "s")
+
+        start = time.perf_counter()
+        sessions[data_format] = backend.load(path)
+        metrics["session_load_s." + data_format] = _metric(
+            time.perf_counter() - start, "s"
+        )
+
+    return metrics, sessions
+
+
+def benchmark_aggregate(sessions):
+    """Time the per-subject aggregate function of each task.
+
+    The tables are aggregated exactly as loaded from each storage format, so
+    a column saved with the wrong type fails the benchmark.
+
+    Parameters:
+    sessions -- ordered dictionary of session tables, keyed by storage format
+
+    Returns:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    """
+
+    metrics = OrderedDict()
+
+    for data_format, tables in sessions.items():
+        sub_num = tables[storage.INFO_TABLE].loc[0, "sub_num"]
+
+        for name, aggregate in AGGREGATES.items():
+            if name not in tables:
+                continue
+
+            metric_name = "aggregate_ms.%s.%s" % (data_format, name)
+            times = []
+            try:
+                for _ in range(AGGREGATE_REPEATS):
+                    start = time.perf_counter()
+                    aggregate(tables[name], sub_num)
+                    times.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                metrics[metric_name] = _failed(e)
+                continue
+
+            stats = _stats(times)
+            metrics[metric_name] = _metric(stats["median"], "ms", stats)
+
+    return metrics
+
+
+def benchmark_wait():
+    """Measure how far display.wait() overruns its deadline on the real clock.
+
+    Returns:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    """
+
+    metrics = OrderedDict()
+    real_clock = clock.MonotonicClock()
+
+    simulation.open_screen()
+    try:
+        overshoots = []
+        for duration in WAIT_DURATIONS:
+            for _ in range(WAIT_REPEATS):
+                overshoots.append(display.wait(duration, real_clock))
+    finally:
+        pygame.quit()
+
+    # The 95th percentile, as a single late wait is usually the OS scheduler
+    stats = _stats(overshoots)
+    metrics["wait_overshoot_ms.p95"] = _metric(stats["p95"], "ms", stats)
+    metrics["wait_overshoot_ms.mean"] = _metric(stats["mean"], "ms")
+
+    return metrics
+
+
+def check_thresholds(metrics, thresholds):
+    """Compare each metric with its threshold, and record the result.
+
+    A threshold is a dictionary with a "min" and/or "max" value. It is looked
+    up by the full metric name (e.g. "task_init_s.MRT"), then by its group
+    (e.g. "task_init_s"). Metrics without a threshold, or that were skipped,
+    always pass. Benchmarks that raised an error always fail.
+
+    Parameters:
+    metrics -- ordered dictionary of metrics, keyed by metric name
+    thresholds -- dictionary of thresholds, keyed by metric name or group
+
+    Returns:
+    passed -- True if every metric is within its threshold
+    """
+
+    passed = True
+    for name, metric in metrics.items():
+        if "error" in metric:
+            metric["passed"] = False
+            passed = False
+            continue
+
+        threshold = thresholds.get(name, thresholds.get(name.split(".")[0]))
+        if threshold is None or "value" not in metric:
+            continue
+
+        metric["threshold"] = threshold
+        metric["passed"] = bool(
+            metric["value"] >= threshold.get("min", -np.inf)
+            and metric["value"] <= threshold.get("max", np.inf)
+        )
+        passed = passed and metric["passed"]
+
+    return passed
+
+
+def run(tasks=None, seed=0, thresholds=None):
+    """Run every benchmark and return the results.
+
+    Parameters:
+    tasks -- list of task names. Defaults to every task
+    seed -- seed for the simulated session
+    thresholds -- dictionary of thresholds, see check_thresholds()
+
+    Returns:
+    results -- ordered dictionary with the environment, every metric, and
+        whether they all passed
+    """
+
+    if tasks is None:
+        tasks = simulation.TASK_NAMES
+    if thresholds is None:
+        thresholds = {}
+
+    directory = tempfile.mkdtemp(prefix="battery_benchmark_")
+    try:
+        metrics, available = benchmark_task_init(tasks, seed)
+
+        journal_file = os.path.join(directory, "benchmark.jsonl")
+        metrics.update(benchmark_session(available, seed, journal_file))
+
+        session_metrics, sessions = benchmark_session_write(journal_file, directory)
+        metrics.update(session_metrics)
+        metrics.update(benchmark_aggregate(sessions))
+        metrics.update(benchmark_render())
+        metrics.update(benchmark_wait())
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    passed = check_thresholds(metrics, thresholds)
+
+    return OrderedDict(
+        [
+            ("datetime", datetime.datetime.now().isoformat(timespec="seconds")),
+            (
+                "environment",
+                OrderedDict(
+                    [
+                        ("platform", platform.platform()),
+                        ("python", platform.python_version()),
+                        ("pygame", pygame.version.ver),
+                        ("pandas", pd.__version__),
+                        ("numpy", np.__version__),
+                    ]
+                ),
+            ),
+            ("passed", passed),
+            ("metrics", metrics),
+        ]
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the battery headlessly and check timing budgets"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="path of the JSON results file (default: print the results)",
+    )
+    parser.add_argument(
+        "-t",
+        "--task",
+        action="append",
+        dest="tasks",
+        choices=simulation.TASK_NAMES,
+        help="task to benchmark. Can be given more than once (default: every " "task)",
+    )
+    parser.add_argument(
+        "--thresholds",
+        default=THRESHOLDS_FILE,
+        help="JSON file of thresholds (default: thresholds.json next to this "
+        "script)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the simulated session"
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.thresholds) as thresholds_file:
+        thresholds = json.load(thresholds_file)
+
+    results = run(args.tasks, args.seed, thresholds)
+
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    for name, metric in results["metrics"].items():
+        if "error" in metric:
+            print("FAILED %s: %s" % (name, metric["error"]), file=sys.stderr)
+        elif not metric.get("passed", True):
+            print(
+                "FAILED %s: %s %s (threshold %s)"
+                % (name, metric["value"], metric["unit"], metric["threshold"]),
+                file=sys.stderr,
+            )
+
+    # Non-zero exit status on a regression, for CI
+    return 0 if results["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
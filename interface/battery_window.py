@@ -6,7 +6,7 @@ import pygame
 import pandas as pd
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-from utils import display, values
+from utils import display, journal, storage, telemetry, values, writer
 from designer import battery_window_qt
 from interface import about_dialog, update_dialog, settings_window
 from tasks import ant, flanker, mrt, sart, ravens, digitspan_backwards, sternberg
@@ -116,6 +116,15 @@ class BatteryWindow(QtWidgets.QMainWindow, battery_window_qt.Ui_CognitiveBattery
         self.settings.setValue("width", self.settings.value("width", 1280))
         self.settings.setValue("height", self.settings.value("height", 1024))
         self.settings.setValue("taskBeep", self.settings.value("taskBeep", "true"))
+        self.settings.setValue("frameRate", self.settings.value("frameRate", 60))
+        self.settings.setValue("dataFormat", self.settings.value("dataFormat", "excel"))
+        self.settings.setValue(
+            "excelExport", self.settings.value("excelExport", "true")
+        )
+        self.settings.setValue(
+            "frameTiming", self.settings.value("frameTiming", "false")
+        )
+        self.settings.setValue("refreshRate", self.settings.value("refreshRate", 60))
         self.settings.endGroup()
 
         # Settings - Attention Network Test
@@ -265,6 +274,21 @@ class BatteryWindow(QtWidgets.QMainWindow, battery_window_qt.Ui_CognitiveBattery
         else:
             self.task_beep = False
 
+        self.task_frame_rate = int(self.settings.value("frameRate"))
+        self.task_data_format = str(self.settings.value("dataFormat"))
+
+        if self.settings.value("excelExport") == "true":
+            self.task_excel_export = True
+        else:
+            self.task_excel_export = False
+
+        if self.settings.value("frameTiming") == "true":
+            self.task_frame_timing = True
+        else:
+            self.task_frame_timing = False
+
+        self.task_refresh_rate = int(self.settings.value("refreshRate"))
+
         self.settings.endGroup()
 
         # ANT settings
@@ -377,12 +401,29 @@ class BatteryWindow(QtWidgets.QMainWindow, battery_window_qt.Ui_CognitiveBattery
             if sub_num in existing_subs:
                 self.error_dialog("Subject number already exists")
             else:
-                # Create the excel writer object and save the file
-                data_file_name = "%s_%s.xls" % (sub_num, condition)
-                output_file = os.path.join(self.dataPath, data_file_name)
-                writer = pd.ExcelWriter(output_file)
-                subject_info.to_excel(writer, "info", index=False)
-                writer.save()
+                # Data storage formats. Excel can be saved alongside the
+                # faster columnar formats
+                try:
+                    session_storage = [storage.get_storage(self.task_data_format)]
+                except (ImportError, ValueError) as e:
+                    self.error_dialog(str(e))
+                    return
+
+                if self.task_data_format != "excel" and self.task_excel_export:
+                    session_storage.append(storage.ExcelStorage())
+
+                # Log every trial to a journal as it finishes, so quitting or
+                # crashing mid-task loses nothing. The data files are saved
+                # from the journal at the end of the session. Entries are
+                # written on a background thread, so the next task can start
+                # while the last one's data is still being written
+                session_name = "%s_%s" % (sub_num, condition)
+                journal_file = os.path.join(self.dataPath, session_name + ".jsonl")
+                session_writer = writer.BackgroundWriter()
+                session_journal = journal.TrialJournal(
+                    journal_file, writer=session_writer
+                )
+                session_journal.write_frame(storage.INFO_TABLE, subject_info)
 
                 # Minimize battery UI
                 self.showMinimized()
@@ -432,81 +473,140 @@ class BatteryWindow(QtWidgets.QMainWindow, battery_window_qt.Ui_CognitiveBattery
                 background = pygame.Surface(self.pygame_screen.get_size())
                 background = background.convert()
 
+                # Optionally log the timing of every frame, to find sessions
+                # where system load made the display miss its deadlines
+                frame_telemetry = None
+                if self.task_frame_timing:
+                    frame_telemetry = telemetry.FrameTelemetry(self.task_refresh_rate)
+                    frame_log = os.path.join(
+                        self.dataPath, session_name + "_frames.csv"
+                    )
+                display.set_telemetry(frame_telemetry)
+
                 # Run each task
                 # Return and save their output to dataframe/excel
-                for task in selected_tasks:
-                    if task == "Attention Network Test (ANT)":
-                        # Set number of blocks for ANT
-                        ant_task = ant.ANT(
-                            self.pygame_screen, background, blocks=self.ant_blocks
-                        )
-                        # Run ANT
-                        ant_data = ant_task.run()
-                        # Save ANT data to excel
-                        ant_data.to_excel(writer, "ANT", index=False)
-                    elif task == "Digit Span (backwards)":
-                        digitspan_backwards_task = digitspan_backwards.DigitspanBackwards(
-                            self.pygame_screen, background
-                        )
-                        # Run Digit span (Backwards)
-                        digitspan_backwards_data = digitspan_backwards_task.run()
-                        # Save digit span (backwards) data to excel
-                        digitspan_backwards_data.to_excel(
-                            writer, "Digit span (backwards)", index=False
-                        )
-                    elif task == "Eriksen Flanker Task":
-                        flanker_task = flanker.Flanker(
-                            self.pygame_screen,
-                            background,
-                            self.flanker_dark_mode,
-                            self.flanker_sets_practice,
-                            self.flanker_sets_main,
-                            self.flanker_blocks_compat,
-                            self.flanker_blocks_incompat,
-                            self.flanker_block_order,
-                        )
-                        # Run Eriksen Flanker
-                        flanker_data = flanker_task.run()
-                        # Save flanker data to excel
-                        flanker_data.to_excel(writer, "Eriksen Flanker", index=False)
-                    elif task == "Mental Rotation Task":
-                        mrt_task = mrt.MRT(self.pygame_screen, background)
-                        # Run MRT
-                        mrt_data = mrt_task.run()
-                        # Save MRT data to excel
-                        mrt_data.to_excel(writer, "MRT", index=False)
-                    elif task == "Raven's Progressive Matrices":
-                        ravens_task = ravens.Ravens(
-                            self.pygame_screen,
-                            background,
-                            start=self.ravens_start,
-                            numTrials=self.ravens_trials,
-                        )
-                        # Run Raven's Matrices
-                        ravens_data = ravens_task.run()
-                        # Save ravens data to excel
-                        ravens_data.to_excel(writer, "Ravens Matrices", index=False)
-                    elif task == "Sternberg Task":
-                        sternberg_task = sternberg.Sternberg(
-                            self.pygame_screen, background, blocks=self.sternberg_blocks
-                        )
-                        # Run Sternberg Task
-                        sternberg_data = sternberg_task.run()
-                        # Save sternberg data to excel
-                        sternberg_data.to_excel(writer, "Sternberg", index=False)
-                    elif task == "Sustained Attention to Response Task (SART)":
-                        sart_task = sart.SART(self.pygame_screen, background)
-                        # Run SART
-                        sart_data = sart_task.run()
-                        # Save SART data to excel
-                        sart_data.to_excel(writer, "SART", index=False)
-
-                    # Play beep after each task
-                    if self.task_beep:
-                        beep_sound.play()
-
-                    # Save excel file
-                    writer.save()
+                try:
+                    for task in selected_tasks:
+                        if task == "Attention Network Test (ANT)":
+                            session_journal.begin_task("ANT")
+                            # Set number of blocks for ANT
+                            ant_task = ant.ANT(
+                                self.pygame_screen,
+                                background,
+                                blocks=self.ant_blocks,
+                                journal=session_journal,
+                            )
+                            # Run ANT
+                            ant_data = ant_task.run()
+                            # Save ANT data to the journal
+                            session_journal.write_frame("ANT", ant_data)
+                        elif task == "Digit Span (backwards)":
+                            session_journal.begin_task("Digit span (backwards)")
+                            digitspan_backwards_task = (
+                                digitspan_backwards.DigitspanBackwards(
+                                    self.pygame_screen,
+                                    background,
+                                    fps=self.task_frame_rate,
+                                    journal=session_journal,
+                                )
+                            )
+                            # Run Digit span (Backwards)
+                            digitspan_backwards_data = digitspan_backwards_task.run()
+                            # Save digit span (backwards) data to the journal
+                            session_journal.write_frame(
+                                "Digit span (backwards)", digitspan_backwards_data
+                            )
+                        elif task == "Eriksen Flanker Task":
+                            session_journal.begin_task("Eriksen Flanker")
+                            flanker_task = flanker.Flanker(
+                                self.pygame_screen,
+                                background,
+                                self.flanker_dark_mode,
+                                self.flanker_sets_practice,
+                                self.flanker_sets_main,
+                                self.flanker_blocks_compat,
+                                self.flanker_blocks_incompat,
+                                self.flanker_block_order,
+                                journal=session_journal,
+                            )
+                            # Run Eriksen Flanker
+                            flanker_data = flanker_task.run()
+                            # Save flanker data to the journal
+                            session_journal.write_frame("Eriksen Flanker", flanker_data)
+                        elif task == "Mental Rotation Task":
+                            session_journal.begin_task("MRT")
+                            mrt_task = mrt.MRT(
+                                self.pygame_screen,
+                                background,
+                                fps=self.task_frame_rate,
+                                journal=session_journal,
+                            )
+                            # Run MRT
+                            mrt_data = mrt_task.run()
+                            # Save MRT data to the journal
+                            session_journal.write_frame("MRT", mrt_data)
+                        elif task == "Raven's Progressive Matrices":
+                            session_journal.begin_task("Ravens Matrices")
+                            ravens_task = ravens.Ravens(
+                                self.pygame_screen,
+                                background,
+                                start=self.ravens_start,
+                                numTrials=self.ravens_trials,
+                                fps=self.task_frame_rate,
+                                journal=session_journal,
+                            )
+                            # Run Raven's Matrices
+                            ravens_data = ravens_task.run()
+                            # Save ravens data to the journal
+                            session_journal.write_frame("Ravens Matrices", ravens_data)
+                        elif task == "Sternberg Task":
+                            session_journal.begin_task("Sternberg")
+                            sternberg_task = sternberg.Sternberg(
+                                self.pygame_screen,
+                                background,
+                                blocks=self.sternberg_blocks,
+                                journal=session_journal,
+                            )
+                            # Run Sternberg Task
+                            sternberg_data = sternberg_task.run()
+                            # Save sternberg data to the journal
+                            session_journal.write_frame("Sternberg", sternberg_data)
+                        elif task == "Sustained Attention to Response Task (SART)":
+                            session_journal.begin_task("SART")
+                            sart_task = sart.SART(
+                                self.pygame_screen, background, journal=session_journal
+                            )
+                            # Run SART
+                            sart_data = sart_task.run()
+                            # Save SART data to the journal
+                            session_journal.write_frame("SART", sart_data)
+
+                        # Save the frame log and timing report of the task
+                        if frame_telemetry is not None:
+                            session_journal.write_frame(
+                                telemetry.TIMING_TABLE,
+                                frame_telemetry.end_task(
+                                    session_journal.task, frame_log
+                                ),
+                            )
+
+                        # Play beep after each task
+                        if self.task_beep:
+                            beep_sound.play()
+                finally:
+                    # Write everything logged so far and save the data files,
+                    # also when the battery is quit (F12) during a task. The
+                    # files are saved on the writer while the end screen is
+                    # shown, or when the writer is closed on exit
+                    display.set_telemetry(None)
+                    session_journal.close()
+                    session_writer.submit(
+                        storage.save_session,
+                        journal_file,
+                        session_storage,
+                        self.dataPath,
+                        session_name,
+                    )
 
                 # End of experiment screen
                 pygame.display.set_caption("Cognitive Battery")
@@ -524,6 +624,9 @@ class BatteryWindow(QtWidgets.QMainWindow, battery_window_qt.Ui_CognitiveBattery
 
                 display.wait_for_space()
 
+                # Wait until the data files are saved
+                session_writer.close()
+
                 # Quit pygame
                 pygame.quit()
 
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import argparse
+import datetime
+import pandas as pd
+
+from utils import journal, simulation, storage, writer
+
+
+def simulate_session(dir_data, sub_num, tasks, participant, seed, data_format):
+    """Run one simulated session and save it like the battery does.
+
+    Parameters:
+    dir_data -- data directory to save the session in
+    sub_num -- subject number
+    tasks -- list of task names
+    participant -- SimulatedParticipant
+    seed -- seed for the trial schedules
+    data_format -- storage format, "excel", "parquet" or "feather"
+
+    Returns:
+    path -- path of the saved session
+    """
+
+    subject_info = pd.DataFrame(
+        [
+            (
+                datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                str(sub_num),
+                "1",
+                25,
+                "other",
+                "simulation",
+                ", ".join(tasks),
+            )
+        ],
+        columns=["datetime", "sub_num", "condition", "age", "sex", "RA", "tasks"],
+    )
+
+    session_name = "%s_1" % sub_num
+    session_storage = storage.get_storage(data_format)
+    journal_file = os.path.join(dir_data, session_name + ".jsonl")
+    session_writer = writer.BackgroundWriter()
+    session_journal = journal.TrialJournal(journal_file, writer=session_writer)
+    session_journal.write_frame(storage.INFO_TABLE, subject_info)
+
+    try:
+        simulation.run_tasks(tasks, participant, seed, journal=session_journal)
+    finally:
+        # As in the battery, the data files are saved also when a task quits
+        # (F12). The save then runs when the writer is closed on exit
+        session_journal.close()
+        session_writer.submit(
+            storage.save_session,
+            journal_file,
+            [session_storage],
+            dir_data,
+            session_name,
+        )
+
+    # Wait until the data files are saved
+    session_writer.close()
+
+    return session_storage.path(dir_data, session_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the battery headlessly with simulated participants"
+    )
+    parser.add_argument("data", help="data directory to save the sessions in")
+    parser.add_argument(
+        "-n",
+        "--sessions",
+        type=int,
+        default=1,
+        help="number of sessions (subjects) to simulate (default: 1)",
+    )
+    parser.add_argument(
+        "-t",
+        "--task",
+        action="append",
+        dest="tasks",
+        choices=simulation.TASK_NAMES,
+        help="task to run. Can be given more than once (default: every task)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="seed of the first session"
+    )
+    parser.add_argument(
+        "--accuracy",
+        type=float,
+        default=0.95,
+        help="probability of a correct response (default: 0.95)",
+    )
+    parser.add_argument(
+        "--rt",
+        type=float,
+        nargs=3,
+        default=(400, 50, 150),
+        metavar=("MU", "SIGMA", "TAU"),
+        help="ex-Gaussian reaction time distribution in milliseconds "
+        "(default: 400 50 150)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        default="excel",
+        choices=["excel", "parquet", "feather"],
+        help="data storage format (default: excel)",
+    )
+    args = parser.parse_args(argv)
+
+    tasks = args.tasks or simulation.TASK_NAMES
+    os.makedirs(args.data, exist_ok=True)
+
+    for i in range(args.sessions):
+        seed = None if args.seed is None else args.seed + i
+        participant = simulation.SimulatedParticipant(
+            seed, simulation.ex_gaussian(*args.rt), args.accuracy
+        )
+
+        start = time.perf_counter()
+        path = simulate_session(args.data, i + 1, tasks, participant, seed, args.format)
+        print("%s (%.1f s)" % (path, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
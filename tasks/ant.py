@@ -1,21 +1,29 @@
 import os
 import sys
-import time
 import pandas as pd
 import numpy as np
 import pygame
 
 from pygame.locals import *
 from itertools import product
-from utils import display
+from utils import assets, display, schedule, trial_data
+from utils.clock import get_clock
 
 
 class ANT(object):
-    def __init__(self, screen, background, blocks=3):
+    def __init__(
+        self, screen, background, blocks=3, seed=None, journal=None, clock=None
+    ):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # Journal that every finished trial is logged to
+        self.journal = journal
+
+        # Clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # Sets font and font size
         self.font = pygame.font.SysFont("arial", 30)
 
@@ -38,6 +46,9 @@ class ANT(object):
         self.FEEDBACK_DURATION = 1000
         self.ITI_MAX = 3500
 
+        # Random generator for the trial order and fixation times
+        self.rng = schedule.create_rng(seed)
+
         # Specify factor levels, and task timings as used by Fan et al. (2002).
         self.CONGRUENCY_LEVELS = ("congruent", "incongruent", "neutral")
         self.CUE_LEVELS = ("nocue", "center", "spatial", "double")
@@ -59,43 +70,47 @@ class ANT(object):
         self.base_dir = os.path.dirname(os.path.realpath(__file__))
         self.image_path = os.path.join(self.base_dir, "images", "ANT")
 
-        self.img_left_congruent = pygame.image.load(
+        self.img_left_congruent = assets.load_image(
             os.path.join(self.image_path, "left_congruent.png")
         )
-        self.img_left_incongruent = pygame.image.load(
+        self.img_left_incongruent = assets.load_image(
             os.path.join(self.image_path, "left_incongruent.png")
         )
-        self.img_right_congruent = pygame.image.load(
+        self.img_right_congruent = assets.load_image(
             os.path.join(self.image_path, "right_congruent.png")
         )
-        self.img_right_incongruent = pygame.image.load(
+        self.img_right_incongruent = assets.load_image(
             os.path.join(self.image_path, "right_incongruent.png")
         )
-        self.img_left_neutral = pygame.image.load(
+        self.img_left_neutral = assets.load_image(
             os.path.join(self.image_path, "left_neutral.png")
         )
-        self.img_right_neutral = pygame.image.load(
+        self.img_right_neutral = assets.load_image(
             os.path.join(self.image_path, "right_neutral.png")
         )
 
-        self.img_fixation = pygame.image.load(
+        self.img_fixation = assets.load_image(
             os.path.join(self.image_path, "fixation.png")
         )
-        self.img_cue = pygame.image.load(os.path.join(self.image_path, "cue.png"))
+        self.img_cue = assets.load_image(os.path.join(self.image_path, "cue.png"))
 
         # Get image dimensions
         self.flanker_h = self.img_left_incongruent.get_rect().height
         self.fixation_h = self.img_fixation.get_rect().height
 
+        # Composite every static trial screen
+        self.frames = display.FrameCache(self.screen, self.background, self.clock)
+        self.create_frames()
+
         # Create output dataframe
         self.all_data = pd.DataFrame()
 
     def create_block(self, block_num, combinations, trial_type):
         if trial_type == "main":
             cur_combinations = combinations * 2
-            np.random.shuffle(cur_combinations)
+            self.rng.shuffle(cur_combinations)
         else:
-            np.random.shuffle(combinations)
+            self.rng.shuffle(combinations)
             cur_combinations = combinations[: len(combinations) // 2]
 
         # Add combinations to dataframe
@@ -108,16 +123,111 @@ class ANT(object):
         cur_block["block"] = block_num + 1
         cur_block["fixationTime"] = [
             x
-            for x in np.random.randint(
+            for x in self.rng.integers(
                 self.FIXATION_DURATION_RANGE[0],
                 self.FIXATION_DURATION_RANGE[1],
                 len(cur_combinations),
             )
         ]
 
-        return cur_block
+        # Preallocate the trial results
+        return trial_data.TrialRecords.from_frame(
+            cur_block,
+            [
+                ("response", "NA"),
+                ("correct", 0),
+                ("RT", np.nan),
+                ("ITI", np.nan),
+                ("fixationOnset", np.nan),
+                ("cueOnset", np.nan),
+                ("targetOnset", np.nan),
+                ("onsetLatency", np.nan),
+                ("responseOnset", np.nan),
+                ("responseObserved", np.nan),
+            ],
+        )
+
+    def create_frames(self):
+        # Fixation, also used for the no cue and ITI screens
+        frame = self.frames.add("fixation")
+        display.image(frame, self.img_fixation, "center", "center")
+
+        # Cue layouts
+        for cue_type in self.CUE_LEVELS:
+            for location in self.LOCATION_LEVELS:
+                key = self.cue_frame(cue_type, location)
+                if key not in self.frames:
+                    frame = self.frames.add(key)
+                    self.display_cue(frame, cue_type, location)
+
+        # Targets
+        for flanker_type, location, direction in product(
+            self.CONGRUENCY_LEVELS, self.LOCATION_LEVELS, self.DIRECTION_LEVELS
+        ):
+            frame = self.frames.add(("target", flanker_type, location, direction))
+            display.image(frame, self.img_fixation, "center", "center")
+            self.display_flanker(frame, flanker_type, location, direction)
+
+        # Practice feedback
+        frame = self.frames.add(("feedback", 1))
+        display.text(frame, self.font, "correct", "center", "center", (0, 255, 0))
+        frame = self.frames.add(("feedback", 0))
+        display.text(frame, self.font, "incorrect", "center", "center", (255, 0, 0))
+
+    def cue_frame(self, cue_type, location):
+        # Only the spatial cue depends on the target location
+        if cue_type == "nocue":
+            return "fixation"
+        elif cue_type == "spatial":
+            return ("cue", cue_type, location)
+        else:
+            return ("cue", cue_type)
+
+    def display_cue(self, surface, cue_type, cue_location):
+        if cue_type == "nocue":
+            # Display fixation in the center
+            display.image(surface, self.img_fixation, "center", "center")
+        elif cue_type == "center":
+            # Display cue in the center
+            display.image(surface, self.img_cue, "center", "center")
+        elif cue_type == "double":
+            # Display fixation in the center
+            display.image(surface, self.img_fixation, "center", "center")
 
-    def display_flanker(self, flanker_type, location, direction):
+            # Display cue above and below fixation
+            display.image(
+                surface,
+                self.img_cue,
+                "center",
+                self.screen_y / 2 - self.fixation_h - self.TARGET_OFFSET,
+            )
+            display.image(
+                surface,
+                self.img_cue,
+                "center",
+                self.screen_y / 2 + self.TARGET_OFFSET,
+            )
+        elif cue_type == "spatial":
+            # Display fixation in the center
+            display.image(surface, self.img_fixation, "center", "center")
+
+            # Display cue at target location
+            if cue_location == "top":
+                display.image(
+                    surface,
+                    self.img_cue,
+                    "center",
+                    self.screen_y / 2 - self.fixation_h - self.TARGET_OFFSET,
+                )
+            elif cue_location == "bottom":
+                display.image(
+                    surface,
+                    self.img_cue,
+                    "center",
+                    self.screen_y / 2 + self.TARGET_OFFSET,
+                )
+
+    def display_flanker(self, surface, flanker_type, location, direction):
         # Left flanker
         if direction == "left":
             if flanker_type == "congruent":
@@ -138,14 +248,14 @@ class ANT(object):
         # Offset the flanker stimulus to above/below fixation
         if location == "top":
             display.image(
-                self.screen,
+                surface,
                 stimulus,
                 "center",
                 self.screen_y / 2 - self.flanker_h - self.TARGET_OFFSET,
             )
         elif location == "bottom":
             display.image(
-                self.screen, stimulus, "center", self.screen_y / 2 + self.TARGET_OFFSET
+                surface, stimulus, "center", self.screen_y / 2 + self.TARGET_OFFSET
             )
 
     def display_trial(self, trial_num, data, trial_type):
@@ -155,150 +265,131 @@ class ANT(object):
                 sys.exit(0)
 
         # Display fixation
-        self.screen.blit(self.background, (0, 0))
-        display.image(self.screen, self.img_fixation, "center", "center")
-        pygame.display.flip()
+        fixation_onset = self.frames.show("fixation")
 
-        display.wait(data["fixationTime"][trial_num])
+        display.wait(data["fixationTime"][trial_num], self.clock)
 
         # Display cue
-        self.screen.blit(self.background, (0, 0))
-
-        cue_type = data["cue"][trial_num]
-
-        if cue_type == "nocue":
-            # Display fixation in the center
-            display.image(self.screen, self.img_fixation, "center", "center")
-        elif cue_type == "center":
-            # Display cue in the center
-            display.image(self.screen, self.img_cue, "center", "center")
-        elif cue_type == "double":
-            # Display fixation in the center
-            display.image(self.screen, self.img_fixation, "center", "center")
-
-            # Display cue above and below fixation
-            display.image(
-                self.screen,
-                self.img_cue,
-                "center",
-                self.screen_y / 2 - self.fixation_h - self.TARGET_OFFSET,
-            )
-            display.image(
-                self.screen,
-                self.img_cue,
-                "center",
-                self.screen_y / 2 + self.TARGET_OFFSET,
-            )
-        elif cue_type == "spatial":
-            cue_location = data["location"][trial_num]
-
-            # Display fixation in the center
-            display.image(self.screen, self.img_fixation, "center", "center")
-
-            # Display cue at target location
-            if cue_location == "top":
-                display.image(
-                    self.screen,
-                    self.img_cue,
-                    "center",
-                    self.screen_y / 2 - self.fixation_h - self.TARGET_OFFSET,
-                )
-            elif cue_location == "bottom":
-                display.image(
-                    self.screen,
-                    self.img_cue,
-                    "center",
-                    self.screen_y / 2 + self.TARGET_OFFSET,
-                )
-
-        pygame.display.flip()
+        cue_onset = self.frames.show(
+            self.cue_frame(data["cue"][trial_num], data["location"][trial_num])
+        )
 
         # Display cue for certain duration
-        display.wait(self.CUE_DURATION)
+        display.wait(self.CUE_DURATION, self.clock)
 
         # Prestim interval with fixation
-        self.screen.blit(self.background, (0, 0))
-        display.image(self.screen, self.img_fixation, "center", "center")
-        pygame.display.flip()
+        self.frames.show("fixation")
 
-        display.wait(self.PRE_STIM_FIXATION_DURATION)
+        overshoot = display.wait(self.PRE_STIM_FIXATION_DURATION, self.clock)
 
         # Display flanker target
-        self.screen.blit(self.background, (0, 0))
-        display.image(self.screen, self.img_fixation, "center", "center")
-
-        self.display_flanker(
-            data["congruency"][trial_num],
-            data["location"][trial_num],
-            data["direction"][trial_num],
+        target_requested = self.clock.now_us()
+        start_time = self.frames.show(
+            (
+                "target",
+                data["congruency"][trial_num],
+                data["location"][trial_num],
+                data["direction"][trial_num],
+            )
         )
-        pygame.display.flip()
 
-        start_time = int(round(time.time() * 1000))
+        display.expect_response(
+            [K_LEFT, K_RIGHT],
+            self.DIRECTION_LEVELS.index(data["direction"][trial_num]),
+            self.FLANKER_DURATION,
+        )
 
         # Clear the event queue before checking for responses
         pygame.event.clear()
         response = "NA"
+        response_time = None
+        observed_time = None
         wait_response = True
         while wait_response:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_LEFT:
                     response = "left"
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
                     wait_response = False
                 elif event.type == KEYDOWN and event.key == K_RIGHT:
                     response = "right"
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
                     wait_response = False
                 elif event.type == KEYDOWN and event.key == K_F12:
                     sys.exit(0)
 
-            end_time = int(round(time.time() * 1000))
-
             # If time limit has been reached, consider it a missed trial
-            if end_time - start_time >= self.FLANKER_DURATION:
+            if self.clock.elapsed_ms(start_time) >= self.FLANKER_DURATION:
                 wait_response = False
 
         # Store reaction time and response
-        rt = int(round(time.time() * 1000)) - start_time
-        data.set_value(trial_num, "RT", rt)
-        data.set_value(trial_num, "response", response)
+        rt = self.clock.elapsed_ms(start_time, response_time)
+        data.set(trial_num, "RT", rt)
+        data.set(trial_num, "response", response)
 
         correct = 1 if response == data["direction"][trial_num] else 0
-        data.set_value(trial_num, "correct", correct)
+        data.set(trial_num, "correct", correct)
+
+        # Store frame onsets, relative to the start of the task
+        data.set(
+            trial_num,
+            "fixationOnset",
+            self.clock.elapsed_ms(self.start_time, fixation_onset),
+        )
+        data.set(
+            trial_num, "cueOnset", self.clock.elapsed_ms(self.start_time, cue_onset)
+        )
+        data.set(
+            trial_num, "targetOnset", self.clock.elapsed_ms(self.start_time, start_time)
+        )
+
+        # Delay between the scheduled and the actual target onset
+        onset_latency = overshoot + self.clock.elapsed_ms(target_requested, start_time)
+        data.set(trial_num, "onsetLatency", round(onset_latency, 3))
+
+        # Store when the response was made and when the loop saw it
+        if response_time is not None:
+            data.set(
+                trial_num,
+                "responseOnset",
+                self.clock.elapsed_ms(self.start_time, response_time),
+            )
+            data.set(
+                trial_num,
+                "responseObserved",
+                self.clock.elapsed_ms(self.start_time, observed_time),
+            )
 
         # Display feedback if practice trials
         if trial_type == "practice":
-            self.screen.blit(self.background, (0, 0))
-            if correct == 1:
-                display.text(
-                    self.screen, self.font, "correct", "center", "center", (0, 255, 0)
-                )
-            else:
-                display.text(
-                    self.screen, self.font, "incorrect", "center", "center", (255, 0, 0)
-                )
-            pygame.display.flip()
+            self.frames.show(("feedback", correct))
 
-            display.wait(self.FEEDBACK_DURATION)
+            display.wait(self.FEEDBACK_DURATION, self.clock)
 
         # Display fixation during ITI
-        self.screen.blit(self.background, (0, 0))
-        display.image(self.screen, self.img_fixation, "center", "center")
-        pygame.display.flip()
+        self.frames.show("fixation")
 
         iti = self.ITI_MAX - rt - data["fixationTime"][trial_num]
-        data.set_value(trial_num, "ITI", iti)
+        data.set(trial_num, "ITI", iti)
 
-        display.wait(iti)
+        display.wait(iti, self.clock)
 
     def run_block(self, block_num, total_blocks, block_type):
         cur_block = self.create_block(block_num, self.combinations, block_type)
 
-        for i in range(cur_block.shape[0]):
+        for i in range(len(cur_block)):
+            display.begin_trial(i)
             self.display_trial(i, cur_block, block_type)
+            display.end_trial(cur_block, i)
+
+            if self.journal is not None:
+                self.journal.write_trial(cur_block, i, block_type)
 
         if block_type == "main":
             # Add block data to all_data
-            self.all_data = pd.concat([self.all_data, cur_block])
+            self.all_data = pd.concat([self.all_data, cur_block.to_frame()])
 
         # End of block screen
         if block_num != total_blocks - 1:  # If not the final block
@@ -313,11 +404,14 @@ class ANT(object):
             display.text_space(
                 self.screen, self.font, "center", (self.screen_y / 2) + 100
             )
-            pygame.display.flip()
+            display.flip(self.clock)
 
             display.wait_for_space()
 
     def run(self):
+        # Time at task start
+        self.start_time = self.clock.now_us()
+
         # Instructions
         self.screen.blit(self.background, (0, 0))
         display.text(
@@ -361,7 +455,7 @@ class ANT(object):
             self.screen_y / 2 + 100,
         )
         display.text_space(self.screen, self.font, "center", (self.screen_y / 2) + 300)
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -375,7 +469,7 @@ class ANT(object):
             "center",
         )
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -399,7 +493,7 @@ class ANT(object):
             self.screen_y / 2 + 50,
         )
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 200)
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -423,14 +517,21 @@ class ANT(object):
             "response",
             "correct",
             "RT",
+            "fixationOnset",
+            "cueOnset",
+            "targetOnset",
+            "onsetLatency",
+            "responseOnset",
+            "responseObserved",
         ]
+        columns += display.timing_columns(self.all_data)
         self.all_data = self.all_data[columns]
 
         # End screen
         self.screen.blit(self.background, (0, 0))
         display.text(self.screen, self.font, "End of task", "center", "center")
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -1,19 +1,33 @@
 import sys
-import random
 import pandas as pd
 import numpy as np
 import pygame
 
 from pygame.locals import *
-from utils import display
+from utils import display, schedule, trial_data
+from utils.clock import get_clock
 
 
 class DigitspanBackwards(object):
-    def __init__(self, screen, background):
+    def __init__(
+        self,
+        screen,
+        background,
+        seed=None,
+        fps=display.FRAME_RATE,
+        journal=None,
+        clock=None,
+    ):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # Journal that every finished trial is logged to
+        self.journal = journal
+
+        # Clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # Set fonts and font sizes
         self.font = pygame.font.SysFont("arial", 30)
         self.stimulus_font = pygame.font.SysFont("arial", 80)
@@ -38,6 +52,9 @@ class DigitspanBackwards(object):
 
         self.num_lengths = self.END_LENGTH - self.START_LENGTH + 1
 
+        # The entry screen redraws continuously, so cap its frame rate
+        self.frame_limiter = display.FrameLimiter(fps, self.clock)
+
         # Generate all possible number sequence lengths for experiment
         self.digit_lengths = np.asarray(
             [
@@ -47,44 +64,59 @@ class DigitspanBackwards(object):
             ]
         )
 
-        # Create main dataframe
-        self.all_data = pd.DataFrame()
+        # Create main trial records
+        self.all_data = trial_data.TrialRecords(len(self.digit_lengths))
         self.all_data["trial"] = list(range(1, self.num_lengths * self.NUM_REPEATS + 1))
         self.all_data["length"] = self.digit_lengths
 
         # Create digit sequences
-        for i in range(len(self.all_data)):
-            generated_sequence = random.sample(
-                self.NUMBERS_USED, self.all_data["length"][i]
-            )
-            self.all_data.set_value(
-                i, "sequence", "".join(str(n) for n in generated_sequence)
-            )
+        self.rng = schedule.create_rng(seed)
+        self.all_data["sequence"] = schedule.digit_sequences(
+            self.rng, self.NUMBERS_USED, self.digit_lengths
+        )
+
+        # Preallocate the trial results
+        self.all_data["user_sequence"] = ""
+        self.all_data["correct"] = 0
 
     def display_numbers(self, i, data):
         for number in data["sequence"][i]:
             self.screen.blit(self.background, (0, 0))
             display.text(self.screen, self.stimulus_font, number, "center", "center")
-            pygame.display.flip()
+            display.flip(self.clock)
 
-            display.wait(self.STIM_DURATION)
+            display.wait(self.STIM_DURATION, self.clock)
 
             self.screen.blit(self.background, (0, 0))
-            pygame.display.flip()
+            display.flip(self.clock)
 
-            display.wait(self.INTER_NUMBER_DURATION)
+            display.wait(self.INTER_NUMBER_DURATION, self.clock)
 
         return data["sequence"][i]
 
-    def number_entry(self):
+    def expect_sequence(self, sequence):
+        # The sequence typed backwards, or with its last digit mistyped
+        answer = sequence[::-1]
+        wrong = answer[:-1] + str(int(answer[-1]) % max(self.NUMBERS_USED) + 1)
+
+        display.expect_response(
+            [
+                [K_0 + int(number) for number in typed] + [K_RETURN]
+                for typed in (answer, wrong)
+            ]
+        )
+
+    def number_entry(self, sequence):
         user_sequence = ""
 
+        self.expect_sequence(sequence)
+
         # Clear the event queue before checking for responses
         pygame.event.clear()
 
         entry = True
         while entry:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_RETURN:
                     entry = False
                 elif event.type == KEYDOWN and event.key == K_F12:
@@ -115,7 +147,8 @@ class DigitspanBackwards(object):
                 self.screen, self.stimulus_font, user_sequence, "center", "center"
             )
 
-            pygame.display.flip()
+            self.frame_limiter.tick()
+            display.flip(self.clock)
 
         return user_sequence
 
@@ -188,7 +221,7 @@ class DigitspanBackwards(object):
 
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 350)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -205,14 +238,14 @@ class DigitspanBackwards(object):
 
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Practice trial
         practice_data = pd.DataFrame(["13579"], columns=["sequence"])
         correct_sequence_p = self.display_numbers(0, practice_data)
-        user_sequence_p = self.number_entry()
+        user_sequence_p = self.number_entry(correct_sequence_p)
 
         # Practice feedback screen
         self.screen.blit(self.background, (0, 0))
@@ -227,9 +260,9 @@ class DigitspanBackwards(object):
                 self.screen, self.font, "Incorrect", "center", "center", (255, 0, 0)
             )
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
-        display.wait(self.FEEDBACK_DURATION)
+        display.wait(self.FEEDBACK_DURATION, self.clock)
 
         # Practice end screen
         self.screen.blit(self.background, (0, 0))
@@ -242,31 +275,36 @@ class DigitspanBackwards(object):
         )
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Main trials
         for i in range(len(self.all_data)):
+            display.begin_trial(i)
             correct_sequence = self.display_numbers(i, self.all_data)
-            user_sequence = self.number_entry()
+            user_sequence = self.number_entry(correct_sequence)
+            display.end_trial(self.all_data, i)
 
-            self.all_data.set_value(i, "user_sequence", user_sequence)
+            self.all_data.set(i, "user_sequence", user_sequence)
 
             if self.check_answer(user_sequence, correct_sequence):
-                self.all_data.set_value(i, "correct", 1)
+                self.all_data.set(i, "correct", 1)
             else:
-                self.all_data.set_value(i, "correct", 0)
+                self.all_data.set(i, "correct", 0)
+
+            if self.journal is not None:
+                self.journal.write_trial(self.all_data, i)
 
         # End screen
         self.screen.blit(self.background, (0, 0))
         display.text(self.screen, self.font, "End of task", "center", "center")
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         print("- Digit span (backwards) complete")
 
-        return self.all_data
+        return self.all_data.to_frame()
@@ -1,12 +1,12 @@
 import sys
-import time
 import pandas as pd
 import numpy as np
 import pygame
 
 from pygame.locals import *
 from itertools import product
-from utils import display
+from utils import display, schedule, trial_data
+from utils.clock import get_clock
 
 
 class Flanker(object):
@@ -20,11 +20,20 @@ class Flanker(object):
         blocks_compat=1,
         blocks_incompat=0,
         block_order="compatible",
+        seed=None,
+        journal=None,
+        clock=None,
     ):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # Journal that every finished trial is logged to
+        self.journal = journal
+
+        # Clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # Sets font and font size
         self.font = pygame.font.SysFont("arial", 30)
         self.font_stim = pygame.font.SysFont("arial", 100)
@@ -58,6 +67,9 @@ class Flanker(object):
         self.FEEDBACK_DURATION = 1500
         self.ITI = 1500
 
+        # Random generator for the trial order
+        self.rng = schedule.create_rng(seed)
+
         # Set stimuli
         self.flanker_stim = {
             "left": {"congruent": "< < < < <", "incongruent": "> > < > >"},
@@ -72,6 +84,10 @@ class Flanker(object):
         # Level combinations give us 4 trials.
         self.combinations = list(product(self.CONGRUENCY_LEVELS, self.DIRECTION_LEVELS))
 
+        # Composite every static trial screen
+        self.frames = display.FrameCache(self.screen, self.background, self.clock)
+        self.create_frames()
+
         # Create output dataframe
         self.all_data = pd.DataFrame()
 
@@ -82,7 +98,7 @@ class Flanker(object):
             cur_combinations = combinations * self.SETS_PRACTICE
 
         # Add shuffled combinations to dataframe
-        np.random.shuffle(cur_combinations)
+        self.rng.shuffle(cur_combinations)
         cur_block = pd.DataFrame(
             data=cur_combinations, columns=("congruency", "direction")
         )
@@ -91,12 +107,46 @@ class Flanker(object):
         cur_block["block"] = block_num + 1
         cur_block["compatibility"] = compatibility
 
-        return cur_block
+        # Preallocate the trial results
+        return trial_data.TrialRecords.from_frame(
+            cur_block,
+            [
+                ("response", "NA"),
+                ("correct", 0),
+                ("RT", np.nan),
+                ("fixationOnset", np.nan),
+                ("targetOnset", np.nan),
+                ("onsetLatency", np.nan),
+                ("responseOnset", np.nan),
+                ("responseObserved", np.nan),
+            ],
+        )
+
+    def create_frames(self):
+        # Fixation
+        frame = self.frames.add("fixation")
+        display.text(frame, self.font, "+", "center", "center", self.colour_font)
+
+        # Blank screen shown once the flanker stimulus has disappeared
+        self.frames.add("blank")
+
+        # Flanker stimuli
+        for flanker_type, direction in self.combinations:
+            frame = self.frames.add(("target", flanker_type, direction))
+            self.display_flanker(frame, flanker_type, direction)
+
+        # Feedback
+        frame = self.frames.add(("feedback", "too slow"))
+        display.text(frame, self.font, "too slow", "center", "center", self.colour_font)
+        frame = self.frames.add(("feedback", 1))
+        display.text(frame, self.font, "correct", "center", "center", (0, 255, 0))
+        frame = self.frames.add(("feedback", 0))
+        display.text(frame, self.font, "incorrect", "center", "center", (255, 0, 0))
 
-    def display_flanker(self, flanker_type, direction):
+    def display_flanker(self, surface, flanker_type, direction):
         stimulus = self.flanker_stim[direction][flanker_type]
         display.text(
-            self.screen, self.font_stim, stimulus, "center", "center", self.colour_font
+            surface, self.font_stim, stimulus, "center", "center", self.colour_font
         )
 
     def display_trial(self, trial_num, data):
@@ -106,89 +156,116 @@ class Flanker(object):
                 sys.exit(0)
 
         # Display fixation
-        self.screen.blit(self.background, (0, 0))
-        display.text(self.screen, self.font, "+", "center", "center", self.colour_font)
-        pygame.display.flip()
+        fixation_onset = self.frames.show("fixation")
 
-        display.wait(self.FIXATION_DURATION)
+        overshoot = display.wait(self.FIXATION_DURATION, self.clock)
 
         # Display flanker stimulus
-        self.screen.blit(self.background, (0, 0))
-        self.display_flanker(
-            data["congruency"][trial_num], data["direction"][trial_num]
+        target_requested = self.clock.now_us()
+        target_onset = self.frames.show(
+            ("target", data["congruency"][trial_num], data["direction"][trial_num])
+        )
+
+        # Incompatible blocks are answered in the opposite direction
+        correct_key = data["direction"][trial_num] == "right"
+        if data["compatibility"][trial_num] == "incompatible":
+            correct_key = not correct_key
+
+        display.expect_response(
+            [K_LEFT, K_RIGHT], int(correct_key), self.MAX_RESPONSE_TIME
         )
-        pygame.display.flip()
 
         # Clear the event queue before checking for responses
         pygame.event.clear()
         response = "NA"
+        response_time = None
+        observed_time = None
         too_slow = False
         wait_response = True
         post_flanker_blank_shown = False
 
-        start_time = int(round(time.time() * 1000))
+        start_time = target_onset
         while wait_response:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_LEFT:
                     response = "left"
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
                     wait_response = False
                 elif event.type == KEYDOWN and event.key == K_RIGHT:
                     response = "right"
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
                     wait_response = False
                 elif event.type == KEYDOWN and event.key == K_F12:
                     sys.exit(0)
 
-            end_time = int(round(time.time() * 1000))
+            elapsed = self.clock.elapsed_ms(start_time)
 
-            if end_time - start_time >= self.FLANKER_DURATION:
+            if elapsed >= self.FLANKER_DURATION:
                 if not post_flanker_blank_shown:
-                    self.screen.blit(self.background, (0, 0))
-                    pygame.display.flip()
+                    self.frames.show("blank")
                     post_flanker_blank_shown = True
 
-            if end_time - start_time >= self.MAX_RESPONSE_TIME:
+            if elapsed >= self.MAX_RESPONSE_TIME:
                 # If time limit has been reached, consider it a missed trial
                 wait_response = False
                 too_slow = True
 
         # Store reaction time and response
-        rt = int(round(time.time() * 1000)) - start_time
-        data.set_value(trial_num, "RT", rt)
-        data.set_value(trial_num, "response", response)
+        rt = self.clock.elapsed_ms(start_time, response_time)
+        data.set(trial_num, "RT", rt)
+        data.set(trial_num, "response", response)
 
         if data["compatibility"][trial_num] == "compatible":
             correct = 1 if response == data["direction"][trial_num] else 0
         else:
             correct = 1 if response != data["direction"][trial_num] else 0
-        data.set_value(trial_num, "correct", correct)
+        data.set(trial_num, "correct", correct)
+
+        # Store frame onsets, relative to the start of the task
+        data.set(
+            trial_num,
+            "fixationOnset",
+            self.clock.elapsed_ms(self.start_time, fixation_onset),
+        )
+        data.set(
+            trial_num,
+            "targetOnset",
+            self.clock.elapsed_ms(self.start_time, target_onset),
+        )
+
+        # Delay between the scheduled and the actual target onset
+        onset_latency = overshoot + self.clock.elapsed_ms(
+            target_requested, target_onset
+        )
+        data.set(trial_num, "onsetLatency", round(onset_latency, 3))
+
+        # Store when the response was made and when the loop saw it
+        if response_time is not None:
+            data.set(
+                trial_num,
+                "responseOnset",
+                self.clock.elapsed_ms(self.start_time, response_time),
+            )
+            data.set(
+                trial_num,
+                "responseObserved",
+                self.clock.elapsed_ms(self.start_time, observed_time),
+            )
 
         # Display feedback
-        self.screen.blit(self.background, (0, 0))
         if too_slow:
-            display.text(
-                self.screen, self.font, "too slow", "center", "center", self.colour_font
-            )
+            self.frames.show(("feedback", "too slow"))
         else:
-            if correct == 1:
-                display.text(
-                    self.screen, self.font, "correct", "center", "center", (0, 255, 0)
-                )
-            else:
-                display.text(
-                    self.screen, self.font, "incorrect", "center", "center", (255, 0, 0)
-                )
-        pygame.display.flip()
+            self.frames.show(("feedback", correct))
 
-        display.wait(self.FEEDBACK_DURATION)
+        display.wait(self.FEEDBACK_DURATION, self.clock)
 
-        if trial_num != data.shape[0] - 1:
+        if trial_num != len(data) - 1:
             # Display fixation
-            self.screen.blit(self.background, (0, 0))
-            display.text(
-                self.screen, self.font, "+", "center", "center", self.colour_font
-            )
-            pygame.display.flip()
-            display.wait(self.ITI)
+            self.frames.show("fixation")
+            display.wait(self.ITI, self.clock)
 
     def run_block(
         self, block_num, total_blocks, block_type, compatibility, second_half=False
@@ -197,12 +274,17 @@ class Flanker(object):
             block_num, self.combinations, block_type, compatibility
         )
 
-        for i in range(cur_block.shape[0]):
+        for i in range(len(cur_block)):
+            display.begin_trial(i)
             self.display_trial(i, cur_block)
+            display.end_trial(cur_block, i)
+
+            if self.journal is not None:
+                self.journal.write_trial(cur_block, i, block_type)
 
         if block_type == "main":
             # Add block data to all_data
-            self.all_data = pd.concat([self.all_data, cur_block])
+            self.all_data = pd.concat([self.all_data, cur_block.to_frame()])
 
         if second_half:
             total_blocks = self.BLOCKS_INCOMPAT + self.BLOCKS_COMPAT
@@ -225,11 +307,14 @@ class Flanker(object):
                 (self.screen_y / 2) + 100,
                 self.colour_font,
             )
-            pygame.display.flip()
+            display.flip(self.clock)
 
             display.wait_for_space()
 
     def run(self):
+        # Time at task start
+        self.start_time = self.clock.now_us()
+
         if self.BLOCK_ORDER == "choose":
             # If the order is "choose" but one of the block types has a 0, then dont show choose screen
             if self.BLOCKS_COMPAT == 0:
@@ -262,11 +347,13 @@ class Flanker(object):
                     self.screen_y / 2 - 150,
                     self.colour_font,
                 )
-                pygame.display.flip()
+                display.flip(self.clock)
+
+                display.expect_response([K_1, K_2])
 
                 wait_response = True
                 while wait_response:
-                    for event in pygame.event.get():
+                    for event in display.get_events():
                         if event.type == KEYDOWN and event.key == K_1:
                             self.BLOCK_ORDER = "compatible"
                             wait_response = False
@@ -382,7 +469,7 @@ class Flanker(object):
             (self.screen_y / 2) + 300,
             self.colour_font,
         )
-        pygame.display.flip()
+        display.flip(self.clock)
         display.wait_for_space()
 
         # Instructions Practice
@@ -398,7 +485,7 @@ class Flanker(object):
         display.text_space(
             self.screen, self.font, "center", self.screen_y / 2 + 100, self.colour_font
         )
-        pygame.display.flip()
+        display.flip(self.clock)
         display.wait_for_space()
 
         # Practice trials
@@ -417,7 +504,7 @@ class Flanker(object):
         display.text_space(
             self.screen, self.font, "center", self.screen_y / 2 + 200, self.colour_font
         )
-        pygame.display.flip()
+        display.flip(self.clock)
         display.wait_for_space()
 
         # Main task second half
@@ -447,7 +534,7 @@ class Flanker(object):
                 self.screen_y / 2 + 200,
                 self.colour_font,
             )
-            pygame.display.flip()
+            display.flip(self.clock)
             display.wait_for_space()
 
             # Practice instructions
@@ -521,7 +608,7 @@ class Flanker(object):
                 self.screen_y / 2 + 250,
                 self.colour_font,
             )
-            pygame.display.flip()
+            display.flip(self.clock)
             display.wait_for_space()
 
             # Instructions Practice
@@ -541,7 +628,7 @@ class Flanker(object):
                 self.screen_y / 2 + 100,
                 self.colour_font,
             )
-            pygame.display.flip()
+            display.flip(self.clock)
             display.wait_for_space()
 
             # Practice trials
@@ -564,7 +651,7 @@ class Flanker(object):
                 self.screen_y / 2 + 200,
                 self.colour_font,
             )
-            pygame.display.flip()
+            display.flip(self.clock)
             display.wait_for_space()
 
             # Main task
@@ -600,7 +687,13 @@ class Flanker(object):
             "response",
             "correct",
             "RT",
+            "fixationOnset",
+            "targetOnset",
+            "onsetLatency",
+            "responseOnset",
+            "responseObserved",
         ]
+        columns += display.timing_columns(self.all_data)
         self.all_data = self.all_data[columns]
 
         # End screen
@@ -611,7 +704,7 @@ class Flanker(object):
         display.text_space(
             self.screen, self.font, "center", self.screen_y / 2 + 100, self.colour_font
         )
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -1,19 +1,30 @@
 import os
 import time
+import itertools
 import pandas as pd
 import numpy as np
 import pygame
 
 from pygame.locals import *
 from sys import exit
+from utils import assets, display, trial_data
+from utils.clock import get_clock
 
 
 class MRT(object):
-    def __init__(self, screen, background):
+    def __init__(
+        self, screen, background, fps=display.FRAME_RATE, journal=None, clock=None
+    ):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # journal that every finished question is logged to
+        self.journal = journal
+
+        # clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # sets font and font size
         self.xFont = pygame.font.SysFont("arial", 20)
 
@@ -58,12 +69,13 @@ class MRT(object):
             columns=["correct_answer1", "correct_answer2"],
         )
 
-        # add blank user answers
-        self.allData["user_answer1"] = 0
-        self.allData["user_answer2"] = 0
+        # preallocate the blank user answers
+        self.allData = trial_data.TrialRecords.from_frame(
+            self.allData, [("user_answer1", 0), ("user_answer2", 0)]
+        )
 
         # add trial numbers
-        self.trialNums = np.arange(1, self.allData.shape[0] + 1)
+        self.trialNums = np.arange(1, len(self.allData) + 1)
         self.allData["trial"] = self.trialNums
 
         # temporary storage for practice questions/answers
@@ -74,10 +86,63 @@ class MRT(object):
         self.directory = os.path.dirname(os.path.realpath(__file__))
         self.imagePath = os.path.join(self.directory, "images", "MRT")
 
+        # Load every image once, so the render loops do no disk I/O
+        imageNames = [
+            "indicator",
+            "circleBlank",
+            "circleBlue",
+            "previous",
+            "next",
+            "finish",
+            "correct",
+            "0a",
+            "0b",
+        ]
+        for i in range(1, 4):
+            imageNames.extend("p{}{}".format(i, part) for part in "qabcd")
+        for i in self.trialNums:
+            imageNames.extend("{}{}".format(i, part) for part in "qabcd")
+
+        self.images = assets.load_images(self.imagePath, imageNames)
+
+        # Render loops redraw continuously, so cap their frame rate
+        self.frameLimiter = display.FrameLimiter(fps, self.clock)
+
+    def journalSection(self, section):
+        # answers can be changed until the section ends, so log them then
+        for i in range((section - 1) * 12, section * 12):
+            display.end_trial(self.allData, i)
+
+            if self.journal is not None:
+                self.journal.write_trial(self.allData, i)
+
     def pressSpace(self, x, y):
-        self.space = self.xFont.render("(Press spacebar when ready)", 1, (0, 0, 0))
+        self.space = display.render_text(
+            self.xFont, "(Press spacebar when ready)", (0, 0, 0)
+        )
         self.screen.blit(self.space, (x, y))
 
+    def buttonCentre(self, button):
+        return (
+            (button[0][0] + button[1][0]) / 2,
+            (button[0][1] + button[1][1]) / 2,
+        )
+
+    def expectAnswers(self, boxes, answer1, answer2, button):
+        # any 2 of the 4 answer boxes can be clicked before pressing the button
+        pairs = list(itertools.combinations(range(1, 5), 2))
+        display.expect_response(
+            [
+                [
+                    self.buttonCentre(boxes[a - 1]),
+                    self.buttonCentre(boxes[b - 1]),
+                    self.buttonCentre(button),
+                ]
+                for a, b in pairs
+            ],
+            pairs.index(tuple(sorted((answer1, answer2)))),
+        )
+
     def mainExperiment(self, section, data):
         main = True
         # check for first half or second half to determine current trial number
@@ -87,12 +152,18 @@ class MRT(object):
             self.curTrial = 13
 
         # time at task start
-        self.start_time = int(time.time())
+        self.start_time = self.clock.now_us()
+
+        # the full screen is only redrawn when the trial or answers change,
+        # otherwise only the timer region is updated
+        lastState = None
+        lastTimer = None
+        self.timerRect = None
+        expectedTrial = None
 
         while main:
-            self.screen.blit(self.background, (0, 0))
             # calculate amount of time left in the task
-            self.curTime = int(time.time()) - self.start_time
+            self.curTime = int(self.clock.elapsed_ms(self.start_time) // 1000)
             self.timeLeft = 180 - self.curTime
             # convert seconds to time format
             self.timer = time.strftime("%M:%S", time.gmtime(self.timeLeft))
@@ -108,254 +179,308 @@ class MRT(object):
             else:
                 self.timerColour = (0, 0, 0)
 
-            # display the timer
-            self.timerText = self.xFont.render(
-                "Time left: " + str(self.timer), 1, self.timerColour
-            )
-            self.timerW = self.timerText.get_rect().width
-            self.screen.blit(
-                self.timerText,
-                (self.screen_x / 2 - self.timerW / 2, self.screen_y / 2 + 300),
-            )
             # stop if timer hits 0
             if self.timeLeft <= 0:
                 main = False
 
-            # draw circles
-            if section == 1:
-                self.trialOffset = 0
-            elif section == 2:
-                self.trialOffset = 12
-
-            for i in range(12):
-                # draws indicating arrow above timeline
-                if i + 1 + self.trialOffset == self.curTrial:
-                    self.imgIndicator = pygame.image.load(os.path.join(self.imagePath,
-                                                                       "indicator.png"))
-                    self.indicatorX, self.indicatorY = self.imgIndicator.get_rect().size
+            state = (
+                self.curTrial,
+                tuple(data["user_answer1"]),
+                tuple(data["user_answer2"]),
+            )
+            redraw = state != lastState
+            lastState = state
+
+            # frames are timed as part of the trial they show
+            display.begin_trial(self.curTrial - 1)
+
+            if redraw:
+                self.screen.blit(self.background, (0, 0))
+
+                # draw circles
+                if section == 1:
+                    self.trialOffset = 0
+                elif section == 2:
+                    self.trialOffset = 12
+
+                for i in range(12):
+                    # draws indicating arrow above timeline
+                    if i + 1 + self.trialOffset == self.curTrial:
+                        self.imgIndicator = self.images["indicator"]
+                        self.indicatorX, self.indicatorY = (
+                            self.imgIndicator.get_rect().size
+                        )
+                        self.screen.blit(
+                            self.imgIndicator,
+                            (
+                                (self.screen_x / 2)
+                                - (self.indicatorX * 6)
+                                + (self.indicatorX * i),
+                                self.screen_y / 2 - 400,
+                            ),
+                        )
+
+                    # if 2 answers have been selected, draw blue circle for that question
+                    if (
+                        data["user_answer1"][i + self.trialOffset] != 0
+                        and data["user_answer2"][i + self.trialOffset] != 0
+                    ):
+                        self.imgCircle = self.images["circleBlue"]
+                    else:
+                        self.imgCircle = self.images["circleBlank"]
+                    self.circleX, self.circleY = self.imgCircle.get_rect().size
                     self.screen.blit(
-                        self.imgIndicator,
+                        self.imgCircle,
                         (
                             (self.screen_x / 2)
-                            - (self.indicatorX * 6)
-                            + (self.indicatorX * i),
-                            self.screen_y / 2 - 400,
+                            - (self.circleX * 6)
+                            + (self.circleX * i),
+                            self.screen_y / 2 - 350,
                         ),
                     )
 
-                # if 2 answers have been selected, draw blue circle for that question
-                if (
-                    data.at[i + self.trialOffset, "user_answer1"] != 0
-                    and data.at[i + self.trialOffset, "user_answer2"] != 0
-                ):
-                    self.imgCircle = pygame.image.load(os.path.join(
-                        self.imagePath, "circleBlue.png")
-                    )
-                else:
-                    self.imgCircle = pygame.image.load(os.path.join(
-                        self.imagePath, "circleBlank.png")
-                    )
-                self.circleX, self.circleY = self.imgCircle.get_rect().size
+                # draw previous button
+                self.imgPrev = self.images["previous"]
+                self.prevX, self.prevY = self.imgPrev.get_rect().size
+                self.prevButton = (
+                    [
+                        (self.screen_x / 2) - (self.circleX * 6) - self.prevX - 50,
+                        self.screen_y / 2 - 350,
+                    ],
+                    [
+                        (self.screen_x / 2) - (self.circleX * 6) - 50,
+                        self.screen_y / 2 - 300,
+                    ],
+                )
                 self.screen.blit(
-                    self.imgCircle,
-                    (
-                        (self.screen_x / 2) - (self.circleX * 6) + (self.circleX * i),
+                    self.imgPrev, (self.prevButton[0][0], self.prevButton[0][1])
+                )
+
+                # draw next button
+                self.imgNext = self.images["next"]
+                self.nextX, self.nextY = self.imgNext.get_rect().size
+                self.nextButton = (
+                    [
+                        (self.screen_x / 2) + (self.circleX * 6) + 50,
                         self.screen_y / 2 - 350,
-                    ),
+                    ],
+                    [
+                        (self.screen_x / 2) + (self.circleX * 6) + self.nextX + 50,
+                        self.screen_y / 2 - 300,
+                    ],
+                )
+                self.screen.blit(
+                    self.imgNext, (self.nextButton[0][0], self.nextButton[0][1])
                 )
 
-            # draw previous button
-            self.imgPrev = pygame.image.load(os.path.join(self.imagePath, "previous.png"))
-            self.prevX, self.prevY = self.imgPrev.get_rect().size
-            self.prevButton = (
-                [
-                    (self.screen_x / 2) - (self.circleX * 6) - self.prevX - 50,
-                    self.screen_y / 2 - 350,
-                ],
-                [
-                    (self.screen_x / 2) - (self.circleX * 6) - 50,
-                    self.screen_y / 2 - 300,
-                ],
-            )
-            self.screen.blit(
-                self.imgPrev, (self.prevButton[0][0], self.prevButton[0][1])
-            )
+                # draw finish button
+                self.imgFinish = self.images["finish"]
+                self.finishX, self.finishY = self.imgFinish.get_rect().size
+                self.finishButton = (
+                    [
+                        (self.screen_x / 2) + (self.circleX * 6) + self.nextX + 60,
+                        self.screen_y / 2 - 350,
+                    ],
+                    [
+                        (self.screen_x / 2)
+                        + (self.circleX * 6)
+                        + self.nextX
+                        + 60
+                        + self.finishX,
+                        self.screen_y / 2 - 300,
+                    ],
+                )
+                if self.curTrial == 12 or self.curTrial == 24:
+                    self.screen.blit(
+                        self.imgFinish,
+                        (self.finishButton[0][0], self.finishButton[0][1]),
+                    )
 
-            # draw next button
-            self.imgNext = pygame.image.load(os.path.join(self.imagePath, "next.png"))
-            self.nextX, self.nextY = self.imgNext.get_rect().size
-            self.nextButton = (
-                [
-                    (self.screen_x / 2) + (self.circleX * 6) + 50,
-                    self.screen_y / 2 - 350,
-                ],
-                [
-                    (self.screen_x / 2) + (self.circleX * 6) + self.nextX + 50,
-                    self.screen_y / 2 - 300,
-                ],
-            )
-            self.screen.blit(
-                self.imgNext, (self.nextButton[0][0], self.nextButton[0][1])
-            )
+                # task boxes
+                self.questionX = (
+                    self.screen_x / 2 - 500
+                )  # question box start X position
+                self.answerX = self.screen_x / 2 - 200  # answer boxes start X position
+                self.spacer = 40  # between answer boxes
+                self.letterOffset = 35  # text offset above boxes
 
-            # draw finish button
-            self.imgFinish = pygame.image.load(os.path.join(self.imagePath, "finish.png"))
-            self.finishX, self.finishY = self.imgFinish.get_rect().size
-            self.finishButton = (
-                [
-                    (self.screen_x / 2) + (self.circleX * 6) + self.nextX + 60,
-                    self.screen_y / 2 - 350,
-                ],
-                [
-                    (self.screen_x / 2)
-                    + (self.circleX * 6)
-                    + self.nextX
-                    + 60
-                    + self.finishX,
-                    self.screen_y / 2 - 300,
-                ],
-            )
-            if self.curTrial == 12 or self.curTrial == 24:
+                # target image
+                imgQ = self.images["{}q".format(self.curTrial)]
+                qX, qY = imgQ.get_rect().size
+                qButton = (
+                    [self.questionX, (self.screen_y / 2) - (qY / 2)],
+                    [self.questionX + qX, (self.screen_y / 2) + (qY / 2)],
+                )
+                self.screen.blit(imgQ, (qButton[0][0], qButton[0][1]))
+                lineQ = display.render_text(
+                    self.xFont, "Q" + str(self.curTrial), (0, 0, 0)
+                )
                 self.screen.blit(
-                    self.imgFinish, (self.finishButton[0][0], self.finishButton[0][1])
+                    lineQ, (qButton[0][0], qButton[0][1] - self.letterOffset)
                 )
 
-            # task boxes
-            self.questionX = self.screen_x / 2 - 500  # question box start X position
-            self.answerX = self.screen_x / 2 - 200  # answer boxes start X position
-            self.spacer = 40  # between answer boxes
-            self.letterOffset = 35  # text offset above boxes
+                # answer a
+                imgA = self.images["{}a".format(self.curTrial)]
+                aX, aY = imgA.get_rect().size
+                aButton = (
+                    [self.answerX, (self.screen_y / 2) - (aY / 2)],
+                    [self.answerX + aX, (self.screen_y / 2) + (aY / 2)],
+                )
+                self.screen.blit(imgA, (aButton[0][0], aButton[0][1]))
+                lineA = display.render_text(self.xFont, "a", (0, 0, 0))
+                self.screen.blit(
+                    lineA, (aButton[0][0], aButton[0][1] - self.letterOffset)
+                )
 
-            # target image
-            imgQ = pygame.image.load(os.path.join(self.imagePath, "{}q.png".format(self.curTrial)))
-            qX, qY = imgQ.get_rect().size
-            qButton = (
-                [self.questionX, (self.screen_y / 2) - (qY / 2)],
-                [self.questionX + qX, (self.screen_y / 2) + (qY / 2)],
-            )
-            self.screen.blit(imgQ, (qButton[0][0], qButton[0][1]))
-            lineQ = self.xFont.render("Q" + str(self.curTrial), 1, (0, 0, 0))
-            self.screen.blit(lineQ, (qButton[0][0], qButton[0][1] - self.letterOffset))
-
-            # answer a
-            imgA = pygame.image.load(os.path.join(self.imagePath, "{}a.png".format(self.curTrial)))
-            aX, aY = imgA.get_rect().size
-            aButton = (
-                [self.answerX, (self.screen_y / 2) - (aY / 2)],
-                [self.answerX + aX, (self.screen_y / 2) + (aY / 2)],
-            )
-            self.screen.blit(imgA, (aButton[0][0], aButton[0][1]))
-            lineA = self.xFont.render("a", 1, (0, 0, 0))
-            self.screen.blit(lineA, (aButton[0][0], aButton[0][1] - self.letterOffset))
-
-            # answer b
-            imgB = pygame.image.load(os.path.join(self.imagePath, "{}b.png".format(self.curTrial)))
-            bX, bY = imgB.get_rect().size
-            bButton = (
-                [self.answerX + aX + self.spacer, (self.screen_y / 2) - (bY / 2)],
-                [self.answerX + aX + self.spacer + bX, (self.screen_y / 2) + (bY / 2)],
-            )
-            self.screen.blit(imgB, (bButton[0][0], bButton[0][1]))
-            lineB = self.xFont.render("b", 1, (0, 0, 0))
-            self.screen.blit(lineB, (bButton[0][0], bButton[0][1] - self.letterOffset))
-
-            # answer c
-            imgC = pygame.image.load(os.path.join(self.imagePath, "{}c.png".format(self.curTrial)))
-            cX, cY = imgC.get_rect().size
-            cButton = (
-                [
-                    self.answerX + bX * 2 + self.spacer * 2,
-                    (self.screen_y / 2) - (bY / 2),
-                ],
-                [
-                    self.answerX + bX * 2 + self.spacer * 2 + cX,
-                    (self.screen_y / 2) + (bY / 2),
-                ],
-            )
-            self.screen.blit(imgC, (cButton[0][0], cButton[0][1]))
-            lineC = self.xFont.render("c", 1, (0, 0, 0))
-            self.screen.blit(lineC, (cButton[0][0], cButton[0][1] - self.letterOffset))
-
-            # answer d
-            imgD = pygame.image.load(os.path.join(self.imagePath, "{}d.png".format(self.curTrial)))
-            dX, dY = imgD.get_rect().size
-            dButton = (
-                [
-                    self.answerX + cX * 3 + self.spacer * 3,
-                    (self.screen_y / 2) - (bY / 2),
-                ],
-                [
-                    self.answerX + cX * 3 + self.spacer * 3 + dX,
-                    (self.screen_y / 2) + (bY / 2),
-                ],
-            )
-            self.screen.blit(imgD, (dButton[0][0], dButton[0][1]))
-            lineD = self.xFont.render("d", 1, (0, 0, 0))
-            self.screen.blit(lineD, (dButton[0][0], dButton[0][1] - self.letterOffset))
-
-            # cache current answers
-            self.answer1 = data.at[self.curTrial - 1, "user_answer1"]
-            self.answer2 = data.at[self.curTrial - 1, "user_answer2"]
-
-            # check what choices have been made/stored, then draw user choice boxes
-            if self.answer1 == 1 or self.answer2 == 1:
-                pygame.draw.rect(
-                    self.screen,
-                    (0, 0, 255),
-                    (
-                        aButton[0][0],
-                        aButton[0][1],
-                        aButton[1][0] - aButton[0][0],
-                        aButton[1][1] - aButton[0][1],
-                    ),
-                    5,
+                # answer b
+                imgB = self.images["{}b".format(self.curTrial)]
+                bX, bY = imgB.get_rect().size
+                bButton = (
+                    [self.answerX + aX + self.spacer, (self.screen_y / 2) - (bY / 2)],
+                    [
+                        self.answerX + aX + self.spacer + bX,
+                        (self.screen_y / 2) + (bY / 2),
+                    ],
                 )
-            if self.answer1 == 2 or self.answer2 == 2:
-                pygame.draw.rect(
-                    self.screen,
-                    (0, 0, 255),
-                    (
-                        bButton[0][0],
-                        bButton[0][1],
-                        bButton[1][0] - bButton[0][0],
-                        bButton[1][1] - bButton[0][1],
-                    ),
-                    5,
+                self.screen.blit(imgB, (bButton[0][0], bButton[0][1]))
+                lineB = display.render_text(self.xFont, "b", (0, 0, 0))
+                self.screen.blit(
+                    lineB, (bButton[0][0], bButton[0][1] - self.letterOffset)
                 )
-            if self.answer1 == 3 or self.answer2 == 3:
-                pygame.draw.rect(
-                    self.screen,
-                    (0, 0, 255),
-                    (
-                        cButton[0][0],
-                        cButton[0][1],
-                        cButton[1][0] - cButton[0][0],
-                        cButton[1][1] - cButton[0][1],
-                    ),
-                    5,
+
+                # answer c
+                imgC = self.images["{}c".format(self.curTrial)]
+                cX, cY = imgC.get_rect().size
+                cButton = (
+                    [
+                        self.answerX + bX * 2 + self.spacer * 2,
+                        (self.screen_y / 2) - (bY / 2),
+                    ],
+                    [
+                        self.answerX + bX * 2 + self.spacer * 2 + cX,
+                        (self.screen_y / 2) + (bY / 2),
+                    ],
+                )
+                self.screen.blit(imgC, (cButton[0][0], cButton[0][1]))
+                lineC = display.render_text(self.xFont, "c", (0, 0, 0))
+                self.screen.blit(
+                    lineC, (cButton[0][0], cButton[0][1] - self.letterOffset)
+                )
+
+                # answer d
+                imgD = self.images["{}d".format(self.curTrial)]
+                dX, dY = imgD.get_rect().size
+                dButton = (
+                    [
+                        self.answerX + cX * 3 + self.spacer * 3,
+                        (self.screen_y / 2) - (bY / 2),
+                    ],
+                    [
+                        self.answerX + cX * 3 + self.spacer * 3 + dX,
+                        (self.screen_y / 2) + (bY / 2),
+                    ],
                 )
-            if self.answer1 == 4 or self.answer2 == 4:
-                pygame.draw.rect(
-                    self.screen,
-                    (0, 0, 255),
+                self.screen.blit(imgD, (dButton[0][0], dButton[0][1]))
+                lineD = display.render_text(self.xFont, "d", (0, 0, 0))
+                self.screen.blit(
+                    lineD, (dButton[0][0], dButton[0][1] - self.letterOffset)
+                )
+
+                # cache current answers
+                self.answer1 = data["user_answer1"][self.curTrial - 1]
+                self.answer2 = data["user_answer2"][self.curTrial - 1]
+
+                # check what choices have been made/stored, then draw user choice boxes
+                if self.answer1 == 1 or self.answer2 == 1:
+                    pygame.draw.rect(
+                        self.screen,
+                        (0, 0, 255),
+                        (
+                            aButton[0][0],
+                            aButton[0][1],
+                            aButton[1][0] - aButton[0][0],
+                            aButton[1][1] - aButton[0][1],
+                        ),
+                        5,
+                    )
+                if self.answer1 == 2 or self.answer2 == 2:
+                    pygame.draw.rect(
+                        self.screen,
+                        (0, 0, 255),
+                        (
+                            bButton[0][0],
+                            bButton[0][1],
+                            bButton[1][0] - bButton[0][0],
+                            bButton[1][1] - bButton[0][1],
+                        ),
+                        5,
+                    )
+                if self.answer1 == 3 or self.answer2 == 3:
+                    pygame.draw.rect(
+                        self.screen,
+                        (0, 0, 255),
+                        (
+                            cButton[0][0],
+                            cButton[0][1],
+                            cButton[1][0] - cButton[0][0],
+                            cButton[1][1] - cButton[0][1],
+                        ),
+                        5,
+                    )
+                if self.answer1 == 4 or self.answer2 == 4:
+                    pygame.draw.rect(
+                        self.screen,
+                        (0, 0, 255),
+                        (
+                            dButton[0][0],
+                            dButton[0][1],
+                            dButton[1][0] - dButton[0][0],
+                            dButton[1][1] - dButton[0][1],
+                        ),
+                        5,
+                    )
+
+            # display the timer
+            dirtyRects = []
+            if redraw or (self.timer, self.timerColour) != lastTimer:
+                lastTimer = (self.timer, self.timerColour)
+                if not redraw:
+                    # clear the previous timer text
+                    self.screen.blit(self.background, self.timerRect, self.timerRect)
+                    dirtyRects.append(self.timerRect)
+
+                self.timerText = display.render_text(
+                    self.xFont, "Time left: " + str(self.timer), self.timerColour
+                )
+                self.timerW = self.timerText.get_rect().width
+                self.timerRect = self.screen.blit(
+                    self.timerText,
+                    (self.screen_x / 2 - self.timerW / 2, self.screen_y / 2 + 300),
+                )
+                dirtyRects.append(self.timerRect)
+
+            if self.curTrial != expectedTrial:
+                expectedTrial = self.curTrial
+                self.expectAnswers(
+                    [aButton, bButton, cButton, dButton],
+                    data["correct_answer1"][self.curTrial - 1],
+                    data["correct_answer2"][self.curTrial - 1],
                     (
-                        dButton[0][0],
-                        dButton[0][1],
-                        dButton[1][0] - dButton[0][0],
-                        dButton[1][1] - dButton[0][1],
+                        self.finishButton
+                        if self.curTrial in (12, 24)
+                        else self.nextButton
                     ),
-                    5,
                 )
 
-            for event in pygame.event.get():
+            for event in display.get_events():
                 # check quit
                 if event.type == KEYDOWN and event.key == K_F12:
                     main = False
                 elif event.type == QUIT:
                     main = False
 
-                # check next previous box clicks
-                (mouseX, mouseY) = pygame.mouse.get_pos()
+                # check next previous box clicks, where the click happened
+                mouseX, mouseY = getattr(event, "pos", pygame.mouse.get_pos())
                 if (
                     event.type == pygame.MOUSEBUTTONUP
                     and event.button == 1
@@ -397,14 +522,14 @@ class MRT(object):
                     and mouseY <= aButton[1][1]
                 ):
                     if self.answer1 == 1:
-                        data.set_value(self.curTrial - 1, "user_answer1", 0)
+                        data.set(self.curTrial - 1, "user_answer1", 0)
                     elif self.answer2 == 1:
-                        data.set_value(self.curTrial - 1, "user_answer2", 0)
+                        data.set(self.curTrial - 1, "user_answer2", 0)
                     else:
                         if self.answer1 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer1", 1)
+                            data.set(self.curTrial - 1, "user_answer1", 1)
                         elif self.answer2 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer2", 1)
+                            data.set(self.curTrial - 1, "user_answer2", 1)
 
                 if (
                     event.type == pygame.MOUSEBUTTONUP
@@ -415,14 +540,14 @@ class MRT(object):
                     and mouseY <= bButton[1][1]
                 ):
                     if self.answer1 == 2:
-                        data.set_value(self.curTrial - 1, "user_answer1", 0)
+                        data.set(self.curTrial - 1, "user_answer1", 0)
                     elif self.answer2 == 2:
-                        data.set_value(self.curTrial - 1, "user_answer2", 0)
+                        data.set(self.curTrial - 1, "user_answer2", 0)
                     else:
                         if self.answer1 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer1", 2)
+                            data.set(self.curTrial - 1, "user_answer1", 2)
                         elif self.answer2 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer2", 2)
+                            data.set(self.curTrial - 1, "user_answer2", 2)
 
                 if (
                     event.type == pygame.MOUSEBUTTONUP
@@ -433,14 +558,14 @@ class MRT(object):
                     and mouseY <= cButton[1][1]
                 ):
                     if self.answer1 == 3:
-                        data.set_value(self.curTrial - 1, "user_answer1", 0)
+                        data.set(self.curTrial - 1, "user_answer1", 0)
                     elif self.answer2 == 3:
-                        data.set_value(self.curTrial - 1, "user_answer2", 0)
+                        data.set(self.curTrial - 1, "user_answer2", 0)
                     else:
                         if self.answer1 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer1", 3)
+                            data.set(self.curTrial - 1, "user_answer1", 3)
                         elif self.answer2 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer2", 3)
+                            data.set(self.curTrial - 1, "user_answer2", 3)
 
                 if (
                     event.type == pygame.MOUSEBUTTONUP
@@ -451,23 +576,27 @@ class MRT(object):
                     and mouseY <= dButton[1][1]
                 ):
                     if self.answer1 == 4:
-                        data.set_value(self.curTrial - 1, "user_answer1", 0)
+                        data.set(self.curTrial - 1, "user_answer1", 0)
                     elif self.answer2 == 4:
-                        data.set_value(self.curTrial - 1, "user_answer2", 0)
+                        data.set(self.curTrial - 1, "user_answer2", 0)
                     else:
                         if self.answer1 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer1", 4)
+                            data.set(self.curTrial - 1, "user_answer1", 4)
                         elif self.answer2 == 0:
-                            data.set_value(self.curTrial - 1, "user_answer2", 4)
+                            data.set(self.curTrial - 1, "user_answer2", 4)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            if redraw:
+                display.flip(self.clock)
+            elif dirtyRects:
+                display.update(dirtyRects, self.clock)
 
     def run(self):
         # instructions
         # page 1
         instructions = True
         while instructions:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     instructions = False
                 elif event.type == KEYDOWN and event.key == K_F12:
@@ -476,70 +605,76 @@ class MRT(object):
 
             self.screen.blit(self.background, (0, 0))
 
-            self.title = self.xFont.render("Mental Rotation Task", 1, (0, 0, 0))
+            self.title = display.render_text(
+                self.xFont, "Mental Rotation Task", (0, 0, 0)
+            )
             self.titleW = self.title.get_rect().width
             self.screen.blit(
                 self.title,
                 (self.screen_x / 2 - self.titleW / 2, self.screen_y / 2 - 400),
             )
 
-            self.line1 = self.xFont.render(
-                "Please look at these five figures:", 1, (0, 0, 0)
+            self.line1 = display.render_text(
+                self.xFont, "Please look at these five figures:", (0, 0, 0)
             )
             self.screen.blit(self.line1, (100, self.screen_y / 2 - 300))
 
-            img0a = pygame.image.load(os.path.join(self.imagePath, "0a.png"))
+            img0a = self.images["0a"]
             x, y = img0a.get_rect().size
             self.screen.blit(
                 img0a, ((self.screen_x / 2) - (x / 2), self.screen_y / 2 - 260)
             )
 
-            line2 = self.xFont.render(
+            line2 = display.render_text(
+                self.xFont,
                 "Note that these are all pictures of the same object which is shown from different angles.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line2, (100, self.screen_y / 2 - 60))
-            line2a = self.xFont.render(
+            line2a = display.render_text(
+                self.xFont,
                 "Try to imagine moving the object (or yourself with respect to the object), as you look from one drawing to the next.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line2a, (100, self.screen_y / 2 - 10))
 
-            img0b = pygame.image.load(os.path.join(self.imagePath, "0b.png"))
+            img0b = self.images["0b"]
             x, y = img0b.get_rect().size
             self.screen.blit(
                 img0b, ((self.screen_x / 2) - (x / 2), self.screen_y / 2 + 80)
             )
 
-            line3 = self.xFont.render(
+            line3 = display.render_text(
+                self.xFont,
                 "Above are two drawings of a new figure that is different from the one shown in the first 5 drawings.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line3, (100, self.screen_y / 2 + 280))
-            line3a = self.xFont.render(
+            line3a = display.render_text(
+                self.xFont,
                 "Satisfy yourself that these two drawings show an object that is different, and cannot be rotated to be identical with the object shown in the first five drawings.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line3a, (100, self.screen_y / 2 + 330))
 
             self.pressSpace(100, self.screen_y / 2 + 400)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # page 2 - practice questions
         instructions = True
         practiceCompleted = 0
+        practiceExpected = False
         while instructions:
             self.screen.blit(self.background, (0, 0))
-            line1 = self.xFont.render("Here are 3 practice questions.", 1, (0, 0, 0))
+            line1 = display.render_text(
+                self.xFont, "Here are 3 practice questions.", (0, 0, 0)
+            )
             self.screen.blit(line1, (100, self.screen_y / 2 - 450))
-            line2 = self.xFont.render(
+            line2 = display.render_text(
+                self.xFont,
                 "For each question, 2 of the 4 pictures show the same object. Click on the 2 matching pictures in each question...",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line2, (100, self.screen_y / 2 - 400))
@@ -556,7 +691,7 @@ class MRT(object):
             dButton = []
             # draws image boxes, 3 rows. appends location of boxes, for each row, into lists above
             for i in range(3):
-                imgQ = pygame.image.load(os.path.join(self.imagePath, "p{}q.png".format(i + 1)))
+                imgQ = self.images["p{}q".format(i + 1)]
                 qX, qY = imgQ.get_rect().size
                 qButton.append(
                     (
@@ -568,12 +703,12 @@ class MRT(object):
                     )
                 )
                 self.screen.blit(imgQ, (qButton[i][0][0], qButton[i][0][1]))
-                lineQ = self.xFont.render("Q" + str(i + 1), 1, (0, 0, 0))
+                lineQ = display.render_text(self.xFont, "Q" + str(i + 1), (0, 0, 0))
                 self.screen.blit(
                     lineQ, (qButton[i][0][0], qButton[i][0][1] - self.letterOffset)
                 )
 
-                imgA = pygame.image.load(os.path.join(self.imagePath, "p{}a.png".format(i + 1)))
+                imgA = self.images["p{}a".format(i + 1)]
                 aX, aY = imgA.get_rect().size
                 aButton.append(
                     (
@@ -582,12 +717,12 @@ class MRT(object):
                     )
                 )
                 self.screen.blit(imgA, (aButton[i][0][0], aButton[i][0][1]))
-                lineA = self.xFont.render("a", 1, (0, 0, 0))
+                lineA = display.render_text(self.xFont, "a", (0, 0, 0))
                 self.screen.blit(
                     lineA, (aButton[i][0][0], aButton[i][0][1] - self.letterOffset)
                 )
 
-                imgB = pygame.image.load(os.path.join(self.imagePath, "p{}b.png".format(i + 1)))
+                imgB = self.images["p{}b".format(i + 1)]
                 bX, bY = imgB.get_rect().size
                 bButton.append(
                     (
@@ -602,12 +737,12 @@ class MRT(object):
                     )
                 )
                 self.screen.blit(imgB, (bButton[i][0][0], bButton[i][0][1]))
-                lineB = self.xFont.render("b", 1, (0, 0, 0))
+                lineB = display.render_text(self.xFont, "b", (0, 0, 0))
                 self.screen.blit(
                     lineB, (bButton[i][0][0], bButton[i][0][1] - self.letterOffset)
                 )
 
-                imgC = pygame.image.load(os.path.join(self.imagePath, "p{}c.png".format(i + 1)))
+                imgC = self.images["p{}c".format(i + 1)]
                 cX, cY = imgC.get_rect().size
                 cButton.append(
                     (
@@ -622,12 +757,12 @@ class MRT(object):
                     )
                 )
                 self.screen.blit(imgC, (cButton[i][0][0], cButton[i][0][1]))
-                lineC = self.xFont.render("c", 1, (0, 0, 0))
+                lineC = display.render_text(self.xFont, "c", (0, 0, 0))
                 self.screen.blit(
                     lineC, (cButton[i][0][0], cButton[i][0][1] - self.letterOffset)
                 )
 
-                imgD = pygame.image.load(os.path.join(self.imagePath, "p{}d.png".format(i + 1)))
+                imgD = self.images["p{}d".format(i + 1)]
                 dX, dY = imgD.get_rect().size
                 dButton.append(
                     (
@@ -642,7 +777,7 @@ class MRT(object):
                     )
                 )
                 self.screen.blit(imgD, (dButton[i][0][0], dButton[i][0][1]))
-                lineD = self.xFont.render("d", 1, (0, 0, 0))
+                lineD = display.render_text(self.xFont, "d", (0, 0, 0))
                 self.screen.blit(
                     lineD, (dButton[i][0][0], dButton[i][0][1] - self.letterOffset)
                 )
@@ -698,9 +833,26 @@ class MRT(object):
                         5,
                     )
 
+            # the practice answers are b and c, a and d, and a and c
+            if not practiceExpected:
+                practiceExpected = True
+                display.expect_response(
+                    [
+                        [
+                            self.buttonCentre(bButton[0]),
+                            self.buttonCentre(cButton[0]),
+                            self.buttonCentre(aButton[1]),
+                            self.buttonCentre(dButton[1]),
+                            self.buttonCentre(aButton[2]),
+                            self.buttonCentre(cButton[2]),
+                            K_SPACE,
+                        ]
+                    ]
+                )
+
             # check answer box clicks
-            (mouseX, mouseY) = pygame.mouse.get_pos()
-            for event in pygame.event.get():
+            for event in display.get_events():
+                mouseX, mouseY = getattr(event, "pos", pygame.mouse.get_pos())
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     # check all practice questions have been completed before showing answers
                     if (
@@ -786,16 +938,17 @@ class MRT(object):
 
             self.pressSpace(100, (self.screen_y / 2) + 450)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # practise answers
         answers = True
         while answers:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     answers = False
             # draws a tick next to the correct answers for practice questions
-            imgCorrect = pygame.image.load(os.path.join(self.imagePath, "correct.png"))
+            imgCorrect = self.images["correct"]
             correctX, correctY = imgCorrect.get_rect().size
             correctAnswers = [
                 [bButton[0][0], bButton[0][1]],
@@ -810,76 +963,80 @@ class MRT(object):
                     imgCorrect, (correctAnswers[i][0], correctAnswers[i][1])
                 )
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # page 3
         instructions = True
         while instructions:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     instructions = False
 
             self.screen.blit(self.background, (0, 0))
-            line1 = self.xFont.render(
+            line1 = display.render_text(
+                self.xFont,
                 "When you do the test, please remember that for each problem set there are 2, and only 2, figures that match the target figure.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line1, (100, self.screen_y / 2 - 200))
 
-            line2 = self.xFont.render(
+            line2 = display.render_text(
+                self.xFont,
                 "You will only be given a point if you mark off BOTH correct matching figures, marking off only one of these will result in no marks.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line2, (100, self.screen_y / 2 - 100))
-            line2a = self.xFont.render(
+            line2a = display.render_text(
+                self.xFont,
                 "Unlike the practice questions, you WON'T be told what the correct answer is.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line2a, (100, self.screen_y / 2))
 
-            line3 = self.xFont.render(
+            line3 = display.render_text(
+                self.xFont,
                 "You will have 3 minutes to complete 12 questions. You may complete them in any order you wish.",
-                1,
                 (0, 0, 0),
             )
             self.screen.blit(line3, (100, self.screen_y / 2 + 100))
 
             self.pressSpace(100, (self.screen_y / 2) + 300)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # page 4
         instructions = True
         while instructions:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     instructions = False
 
             self.screen.blit(self.background, (0, 0))
-            line1 = self.xFont.render("Ready?", 1, (0, 0, 0))
+            line1 = display.render_text(self.xFont, "Ready?", (0, 0, 0))
             self.screen.blit(line1, (100, self.screen_y / 2))
 
             self.pressSpace(100, (self.screen_y / 2) + 100)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # main loop
         self.mainExperiment(1, self.allData)
+        self.journalSection(1)
 
         # break screen
         breakScreen = True
         while breakScreen:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     breakScreen = False
 
             self.screen.blit(self.background, (0, 0))
-            text = self.xFont.render(
+            text = display.render_text(
+                self.xFont,
                 "Take a quick break. We will do another block of 12 questions when you're ready.",
-                1,
                 (0, 0, 0),
             )
 
@@ -887,21 +1044,23 @@ class MRT(object):
 
             self.pressSpace(100, (self.screen_y / 2) + 100)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # second half
         self.mainExperiment(2, self.allData)
+        self.journalSection(2)
 
         # calculate score
         self.accuracy = []
-        for i in range(self.allData.shape[0]):
+        for i in range(len(self.allData)):
             self.trialCorrect = [
-                self.allData.at[i, "correct_answer1"],
-                self.allData.at[i, "correct_answer2"],
+                self.allData["correct_answer1"][i],
+                self.allData["correct_answer2"][i],
             ]
             self.trialUser = [
-                self.allData.at[i, "user_answer1"],
-                self.allData.at[i, "user_answer2"],
+                self.allData["user_answer1"][i],
+                self.allData["user_answer2"][i],
             ]
 
             if (
@@ -923,22 +1082,24 @@ class MRT(object):
             "user_answer2",
             "correct",
         ]
-        self.allData = self.allData[self.columns]
+        self.columns += display.timing_columns(self.allData)
+        self.allData = self.allData.to_frame(self.columns)
 
         # display end screen
         instructions = True
         while instructions:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     instructions = False
 
             self.screen.blit(self.background, (0, 0))
-            endText = self.xFont.render("End of task.", 1, (0, 0, 0))
+            endText = display.render_text(self.xFont, "End of task.", (0, 0, 0))
             self.screen.blit(endText, (100, self.screen_y / 2))
 
             self.pressSpace(100, (self.screen_y / 2) + 100)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         print("- MRT complete")
 
@@ -7,14 +7,31 @@ from pygame.locals import *
 from os import listdir
 from os.path import join, dirname, realpath, splitext
 from sys import exit
+from utils import assets, display, trial_data
+from utils.clock import get_clock
 
 
 class Ravens(object):
-    def __init__(self, screen, background, start=13, numTrials=12):
+    def __init__(
+        self,
+        screen,
+        background,
+        start=13,
+        numTrials=12,
+        fps=display.FRAME_RATE,
+        journal=None,
+        clock=None,
+    ):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # journal that every finished trial is logged to
+        self.journal = journal
+
+        # clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # sets font and font size
         self.instructionsFont = pygame.font.SysFont("arial", 20)
 
@@ -32,6 +49,9 @@ class Ravens(object):
         self.stimDuration = 60000
         self.ITI = 1000
 
+        # render loops redraw continuously, so cap their frame rate
+        self.frameLimiter = display.FrameLimiter(fps, self.clock)
+
         # get images
         self.directory = dirname(realpath(__file__))
         self.imagePath = join(self.directory, "images", "Ravens")
@@ -48,22 +68,26 @@ class Ravens(object):
         # only load the desired number/set of images
         self.images = []
         for i in range(start - 1, start + numTrials - 1):
-            self.images.append(pygame.image.load(join(self.imagePath, self.dirImages[i])))
+            self.images.append(
+                assets.load_image(join(self.imagePath, self.dirImages[i]))
+            )
 
         # get image size
         self.stimH = self.images[0].get_rect().height
         self.stimW = self.images[0].get_rect().width
 
         # load practice image
-        self.practiceImage = pygame.image.load(
+        self.practiceImage = assets.load_image(
             join(self.imagePath, "practice", "practice.png")
         )
 
         # load instructions page example images
-        self.img_example = pygame.image.load(join(self.imagePath, "practice", "example.png"))
+        self.img_example = assets.load_image(
+            join(self.imagePath, "practice", "example.png")
+        )
         self.exampleW = self.img_example.get_rect().width
 
-        self.img_example_answers = pygame.image.load(
+        self.img_example_answers = assets.load_image(
             join(self.imagePath, "practice", "example_answers.png")
         )
         self.exampleAnswersW = self.img_example_answers.get_rect().width
@@ -110,8 +134,8 @@ class Ravens(object):
             ]
         )
 
-        # create output dataframe
-        self.allData = pd.DataFrame()
+        # create output records
+        self.allData = self.createRecords(numTrials)
         self.trial = np.arange(1, numTrials + 1)
         self.allData["trial"] = self.trial
         self.stimNum = np.arange(start, start + numTrials)
@@ -119,9 +143,16 @@ class Ravens(object):
         self.answerSubset = self.correctAnswers[start - 1 : start + numTrials - 1]
         self.allData["correctAnswer"] = self.answerSubset
 
+    def createRecords(self, numTrials):
+        # preallocate the trial results, the answer stays "NA" and the RT
+        # NaN if time runs out
+        return trial_data.TrialRecords(
+            numTrials, [("userAnswer", "NA"), ("RT", np.nan), ("correct", 0)]
+        )
+
     def pressSpace(self, x, y):
-        self.space = self.instructionsFont.render(
-            "(Press spacebar when ready)", 1, (0, 0, 0)
+        self.space = display.render_text(
+            self.instructionsFont, "(Press spacebar when ready)", (0, 0, 0)
         )
         self.screen.blit(self.space, (x, y))
 
@@ -134,123 +165,171 @@ class Ravens(object):
         elif type == "practice":
             self.curImage = self.practiceImage
 
-        self.baseTime = int(round(time.time() * 1000))
-        while int(round(time.time() * 1000)) - self.baseTime < self.stimDuration:
-            self.endTime = int(round(time.time() * 1000))
+        # draw the full trial screen once, after that only the timer is updated
+        self.screen.blit(self.background, (0, 0))
+        self.screen.blit(
+            self.curImage,
+            (
+                self.screen_x / 2 - self.stimW / 2,
+                self.screen_y / 2 - self.stimH / 2,
+            ),
+        )
+        display.flip(self.clock)
+
+        self.timer = None
+        self.timerRect = None
+
+        # answers are given with the number keys 1-8
+        if type == "main":
+            answer = data["correctAnswer"][i]
+        elif type == "practice":
+            answer = 2
+        display.expect_response(
+            [K_1, K_2, K_3, K_4, K_5, K_6, K_7, K_8], answer - 1, self.stimDuration
+        )
 
-            data.set_value(i, "userAnswer", "NA")
-            data.set_value(i, "RT", "NA")
+        self.baseTime = self.clock.now_us()
+        while self.clock.elapsed_ms(self.baseTime) < self.stimDuration:
+            self.endTime = self.clock.now_us()
 
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_F12:
                     pygame.quit()
                     exit()
                 elif event.type == KEYDOWN:
                     if event.key == K_1:
-                        data.set_value(i, "userAnswer", "1")
-                        data.set_value(
+                        data.set(i, "userAnswer", "1")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_2:
-                        data.set_value(i, "userAnswer", "2")
-                        data.set_value(
+                        data.set(i, "userAnswer", "2")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_3:
-                        data.set_value(i, "userAnswer", "3")
-                        data.set_value(
+                        data.set(i, "userAnswer", "3")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_4:
-                        data.set_value(i, "userAnswer", "4")
-                        data.set_value(
+                        data.set(i, "userAnswer", "4")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_5:
-                        data.set_value(i, "userAnswer", "5")
-                        data.set_value(
+                        data.set(i, "userAnswer", "5")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_6:
-                        data.set_value(i, "userAnswer", "6")
-                        data.set_value(
+                        data.set(i, "userAnswer", "6")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_7:
-                        data.set_value(i, "userAnswer", "7")
-                        data.set_value(
+                        data.set(i, "userAnswer", "7")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
                     elif event.key == K_8:
-                        data.set_value(i, "userAnswer", "8")
-                        data.set_value(
+                        data.set(i, "userAnswer", "8")
+                        data.set(
                             i,
                             "RT",
-                            str((float(self.endTime) - float(self.baseTime)) / 1000),
+                            self.clock.elapsed_ms(
+                                self.baseTime, self.clock.event_time_us(event)
+                            )
+                            / 1000,
                         )
                         return 0
 
-            self.screen.blit(self.background, (0, 0))
-            self.screen.blit(
-                self.curImage,
-                (
-                    self.screen_x / 2 - self.stimW / 2,
-                    self.screen_y / 2 - self.stimH / 2,
-                ),
-            )
-
             self.timeLeft = (
-                self.stimDuration / 1000 - (self.endTime - self.baseTime) / 1000
+                self.stimDuration / 1000 - (self.endTime - self.baseTime) / 1000000
             )
             # convert seconds to time format
-            self.timer = time.strftime("%M:%S", time.gmtime(self.timeLeft))
-
-            self.timerText = self.instructionsFont.render(
-                "Time left: " + str(self.timer), 1, (0, 0, 0)
-            )
-            self.timerW = self.timerText.get_rect().width
-            self.screen.blit(
-                self.timerText,
-                (self.screen_x / 2 - self.timerW / 2, self.screen_y / 2 + 400),
-            )
+            timer = time.strftime("%M:%S", time.gmtime(self.timeLeft))
+
+            # redraw the timer only when the displayed time changes
+            self.frameLimiter.tick()
+            if timer != self.timer:
+                self.timer = timer
+                dirtyRects = []
+                if self.timerRect is not None:
+                    # clear the previous timer text
+                    self.screen.blit(self.background, self.timerRect, self.timerRect)
+                    dirtyRects.append(self.timerRect)
+
+                self.timerText = display.render_text(
+                    self.instructionsFont, "Time left: " + str(self.timer), (0, 0, 0)
+                )
+                self.timerW = self.timerText.get_rect().width
+                self.timerRect = self.screen.blit(
+                    self.timerText,
+                    (self.screen_x / 2 - self.timerW / 2, self.screen_y / 2 + 400),
+                )
+                dirtyRects.append(self.timerRect)
 
-            pygame.display.flip()
+                display.update(dirtyRects, self.clock)
 
     def run(self):
         # Instructions
         self.screen.blit(self.background, (0, 0))
 
-        self.title = self.instructionsFont.render(
-            "Raven's Progressive Matrices", 1, (0, 0, 0)
+        self.title = display.render_text(
+            self.instructionsFont, "Raven's Progressive Matrices", (0, 0, 0)
         )
         self.titleW = self.title.get_rect().width
         self.screen.blit(
             self.title, (self.screen_x / 2 - self.titleW / 2, self.screen_y / 2 - 400)
         )
 
-        self.line1 = self.instructionsFont.render(
-            "You will see a grid of items with one item missing:", 1, (0, 0, 0)
+        self.line1 = display.render_text(
+            self.instructionsFont,
+            "You will see a grid of items with one item missing:",
+            (0, 0, 0),
         )
         self.screen.blit(self.line1, (100, self.screen_y / 2 - 350))
 
@@ -259,8 +338,10 @@ class Ravens(object):
             (self.screen_x / 2 - self.exampleW / 2, self.screen_y / 2 - 300),
         )
 
-        self.line2 = self.instructionsFont.render(
-            "There will be a set of 8 possible answer options:", 1, (0, 0, 0)
+        self.line2 = display.render_text(
+            self.instructionsFont,
+            "There will be a set of 8 possible answer options:",
+            (0, 0, 0),
         )
         self.screen.blit(self.line2, (100, self.screen_y / 2 - 100))
 
@@ -269,25 +350,31 @@ class Ravens(object):
             (self.screen_x / 2 - self.exampleAnswersW / 2, self.screen_y / 2 - 50),
         )
 
-        self.line3 = self.instructionsFont.render(
-            "Determine which option is the missing item.", 1, (0, 0, 0)
+        self.line3 = display.render_text(
+            self.instructionsFont,
+            "Determine which option is the missing item.",
+            (0, 0, 0),
         )
         self.screen.blit(self.line3, (100, self.screen_y / 2 + 150))
 
-        self.line4 = self.instructionsFont.render(
-            "In example above, the correct answer is 4.", 1, (0, 0, 0)
+        self.line4 = display.render_text(
+            self.instructionsFont,
+            "In example above, the correct answer is 4.",
+            (0, 0, 0),
         )
         self.screen.blit(self.line4, (100, self.screen_y / 2 + 180))
 
-        self.line5 = self.instructionsFont.render(
+        self.line5 = display.render_text(
+            self.instructionsFont,
             "Select your answer by pressing the corresponding number on the keyboard.",
-            1,
             (0, 0, 0),
         )
         self.screen.blit(self.line5, (100, self.screen_y / 2 + 250))
 
-        self.line6 = self.instructionsFont.render(
-            "You will have 1 minute to complete each question.", 1, (0, 0, 0)
+        self.line6 = display.render_text(
+            self.instructionsFont,
+            "You will have 1 minute to complete each question.",
+            (0, 0, 0),
         )
         self.screen.blit(self.line6, (100, self.screen_y / 2 + 280))
 
@@ -295,7 +382,7 @@ class Ravens(object):
 
         self.instructions = True
         while self.instructions:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     self.instructions = False
                 elif event.type == KEYDOWN and event.key == K_F4:
@@ -304,12 +391,13 @@ class Ravens(object):
                     pygame.quit()
                     exit()
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # Instructions Practice
         self.instructionsPractice = True
         while self.instructionsPractice:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     self.instructionsPractice = False
                 elif event.type == KEYDOWN and event.key == K_F4:
@@ -319,27 +407,36 @@ class Ravens(object):
                     exit()
 
                 self.screen.blit(self.background, (0, 0))
-                self.practiceInstructions = self.instructionsFont.render(
-                    "We will begin with a practice trial...", 1, (0, 0, 0)
+                self.practiceInstructions = display.render_text(
+                    self.instructionsFont,
+                    "We will begin with a practice trial...",
+                    (0, 0, 0),
                 )
                 self.screen.blit(self.practiceInstructions, (100, self.screen_y / 2))
 
                 self.pressSpace(100, (self.screen_y / 2) + 100)
 
-                pygame.display.flip()
+                display.flip(self.clock)
 
         # Practice trials
-        self.practiceData = pd.DataFrame()
+        self.practiceData = self.createRecords(1)
+        display.begin_trial(0)
         self.displayTrial(0, self.practiceData, "practice")
+        display.end_trial(self.practiceData, 0)
+
+        if self.journal is not None:
+            self.journal.write_trial(self.practiceData, 0, "practice")
 
         # Practice feedback screen
         self.screen.blit(self.background, (0, 0))
 
-        if self.practiceData.at[0, "userAnswer"] == "2":
-            self.feedbackLine = self.instructionsFont.render("Correct", 1, (0, 255, 0))
+        if self.practiceData["userAnswer"][0] == "2":
+            self.feedbackLine = display.render_text(
+                self.instructionsFont, "Correct", (0, 255, 0)
+            )
         else:
-            self.feedbackLine = self.instructionsFont.render(
-                "Incorrect", 1, (255, 0, 0)
+            self.feedbackLine = display.render_text(
+                self.instructionsFont, "Incorrect", (255, 0, 0)
             )
 
         self.feedbackLineH = self.feedbackLine.get_rect().height
@@ -353,45 +450,48 @@ class Ravens(object):
             ),
         )
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         # show feedback screen for 2 seconds
-        self.baseTime = int(round(time.time() * 1000))
-        while int(round(time.time() * 1000)) - self.baseTime < 2000:
-            pass
+        display.wait(2000, self.clock)
 
         # Instructions Practice End
         self.practiceEndScreen = True
         while self.practiceEndScreen:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     self.practiceEndScreen = False
 
             self.screen.blit(self.background, (0, 0))
-            self.practiceEndLine = self.instructionsFont.render(
-                "We will now begin the main trials...", 1, (0, 0, 0)
+            self.practiceEndLine = display.render_text(
+                self.instructionsFont, "We will now begin the main trials...", (0, 0, 0)
             )
             self.screen.blit(self.practiceEndLine, (100, self.screen_y / 2))
 
             self.pressSpace(100, (self.screen_y / 2) + 100)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         # Main task
         for i in range(self.numTrials):
+            display.begin_trial(i)
             self.displayTrial(i, self.allData, "main")
+            display.end_trial(self.allData, i)
 
-            if self.allData.at[i, "userAnswer"] == str(
-                self.allData.at[i, "correctAnswer"]
-            ):
-                self.allData.set_value(i, "correct", 1)
+            if self.allData["userAnswer"][i] == str(self.allData["correctAnswer"][i]):
+                self.allData.set(i, "correct", 1)
             else:
-                self.allData.set_value(i, "correct", 0)
+                self.allData.set(i, "correct", 0)
 
-            self.baseTime = int(round(time.time() * 1000))
-            while int(round(time.time() * 1000)) - self.baseTime < self.ITI:
+            if self.journal is not None:
+                self.journal.write_trial(self.allData, i)
+
+            self.baseTime = self.clock.now_us()
+            while self.clock.elapsed_ms(self.baseTime) < self.ITI:
                 self.screen.blit(self.background, (0, 0))
-                pygame.display.flip()
+                self.frameLimiter.tick()
+                display.flip(self.clock)
 
         # rearrange dataframe
         self.columns = [
@@ -402,22 +502,26 @@ class Ravens(object):
             "correct",
             "RT",
         ]
-        self.allData = self.allData[self.columns]
+        self.columns += display.timing_columns(self.allData)
+        self.allData = self.allData.to_frame(self.columns)
 
         # End screen
         self.endScreen = True
         while self.endScreen:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     self.endScreen = False
 
             self.screen.blit(self.background, (0, 0))
-            self.endLine = self.instructionsFont.render("End of task.", 1, (0, 0, 0))
+            self.endLine = display.render_text(
+                self.instructionsFont, "End of task.", (0, 0, 0)
+            )
             self.screen.blit(self.endLine, (100, self.screen_y / 2))
 
             self.pressSpace(100, (self.screen_y / 2) + 100)
 
-            pygame.display.flip()
+            self.frameLimiter.tick()
+            display.flip(self.clock)
 
         print("- Raven's Progressive Matrices complete")
 
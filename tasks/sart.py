@@ -1,20 +1,25 @@
 import os
 import sys
-import time
-import random
-import pandas as pd
+import numpy as np
 import pygame
 
 from pygame.locals import *
-from utils import display
+from utils import assets, display, schedule, trial_data
+from utils.clock import get_clock
 
 
 class SART(object):
-    def __init__(self, screen, background):
+    def __init__(self, screen, background, seed=None, journal=None, clock=None):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # Journal that every finished trial is logged to
+        self.journal = journal
+
+        # Clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # Set font and font size
         self.font = pygame.font.SysFont("arial", 30)
         self.stim_fonts = []
@@ -44,27 +49,50 @@ class SART(object):
         self.image_path = os.path.join(self.base_dir, "images", "SART")
 
         # Use the 29mm mask image (as described by Robertson 1997)
-        self.img_mask = pygame.image.load(os.path.join(self.image_path, "mask_29.png"))
+        self.img_mask = assets.load_image(os.path.join(self.image_path, "mask_29.png"))
+
+        # Composite the mask screen
+        self.frames = display.FrameCache(self.screen, self.background, self.clock)
+        frame = self.frames.add("mask")
+        display.image(frame, self.img_mask, "center", "center")
 
         # Create trial sequence
-        self.number_set = list(range(1, 10)) * 25  # Numbers 1-9
-        random.shuffle(self.number_set)
+        # Numbers 1-9 are each shown 25 times, in a random font size
+        self.rng = schedule.create_rng(seed)
+        self.number_set, stim_sizes = schedule.sart_trials(
+            self.rng, list(range(1, 10)), 25, self.STIMSIZES_PT
+        )
         self.trial_num = list(range(1, len(self.number_set) + 1))
 
-        # Create output dataframe
-        self.all_data = pd.DataFrame()
+        # Create output records
+        self.all_data = self.create_records(self.number_set, stim_sizes)
         self.all_data["trial"] = self.trial_num
-        self.all_data["stimulus"] = self.number_set
+
+    def create_records(self, stimuli, stim_sizes):
+        # Preallocate the trial results. RT is 1150 ms if there is no response
+        records = trial_data.TrialRecords(len(stimuli))
+        records["stimulus"] = stimuli
+        records["stimSize"] = stim_sizes
+        records["RT"] = 1150.0
+        records["key press"] = 0
+        records["accuracy"] = 0
+        records["targetOnset"] = np.nan
+        records["maskOnset"] = np.nan
+        records["onsetLatency"] = np.nan
+        records["responseOnset"] = np.nan
+        records["responseObserved"] = np.nan
+
+        return records
 
     def display_trial(self, i, data):
-        # Randomly choose font size for this trial
-        size_index = random.randint(0, len(self.stim_fonts) - 1)
+        # Font size for this trial, chosen randomly in the schedule
+        size_index = self.STIMSIZES_PT.index(data["stimSize"][i])
         trial_font = self.stim_fonts[size_index]
 
         key_press = 0
-        data.set_value(i, "RT", 1150)
 
         # Display number
+        target_requested = self.clock.now_us()
         self.screen.blit(self.background, (0, 0))
         display.text(
             self.screen,
@@ -74,49 +102,53 @@ class SART(object):
             "center",
             (255, 255, 255),
         )
-        pygame.display.flip()
 
-        # Get start time in ms
-        start_time = int(round(time.time() * 1000))
+        # Get start time in microseconds
+        start_time = display.flip(self.clock)
+
+        # Space is pressed for every number except 3
+        display.expect_response(
+            [K_SPACE],
+            None if data["stimulus"][i] == 3 else 0,
+            self.MASK_DURATION,
+        )
 
         # Clear the event queue before checking for responses
         pygame.event.clear()
         wait_response = True
         while wait_response:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     key_press = 1
-                    data.set_value(i, "RT", int(round(time.time() * 1000)) - start_time)
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
+                    data.set(i, "RT", self.clock.elapsed_ms(start_time, response_time))
                 elif event.type == KEYDOWN and event.key == K_F12:
                     sys.exit(0)
 
-            end_time = int(round(time.time() * 1000))
-
             # Stop this loop if stim duration has passed
-            if end_time - start_time >= self.STIM_DURATION:
+            if self.clock.elapsed_ms(start_time) >= self.STIM_DURATION:
                 wait_response = False
 
         # Display mask
-        self.screen.blit(self.background, (0, 0))
-        display.image(self.screen, self.img_mask, "center", "center")
-        pygame.display.flip()
+        mask_onset = self.frames.show("mask")
 
         wait_response = True
         while wait_response:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_SPACE:
                     if key_press == 0:
                         key_press = 1
-                        data.set_value(
-                            i, "RT", int(round(time.time() * 1000)) - start_time
+                        response_time = self.clock.event_time_us(event)
+                        observed_time = self.clock.now_us()
+                        data.set(
+                            i, "RT", self.clock.elapsed_ms(start_time, response_time)
                         )
                 elif event.type == KEYDOWN and event.key == K_F12:
                     sys.exit(0)
 
-            end_time = int(round(time.time() * 1000))
-
             # Stop this loop if mask duration has passed
-            if end_time - start_time >= self.MASK_DURATION:
+            if self.clock.elapsed_ms(start_time) >= self.MASK_DURATION:
                 wait_response = False
 
         # Check if response is correct
@@ -132,11 +164,33 @@ class SART(object):
                 accuracy = 1
 
         # Store key press data in dataframe
-        data.set_value(i, "key press", key_press)
-        data.set_value(i, "accuracy", accuracy)
-        data.set_value(i, "stimSize", self.STIMSIZES_PT[size_index])
+        data.set(i, "key press", key_press)
+        data.set(i, "accuracy", accuracy)
+
+        # Store frame onsets, relative to the start of the task
+        data.set(i, "targetOnset", self.clock.elapsed_ms(self.start_time, start_time))
+        data.set(i, "maskOnset", self.clock.elapsed_ms(self.start_time, mask_onset))
+
+        # Delay between requesting the number frame and its onset
+        data.set(i, "onsetLatency", self.clock.elapsed_ms(target_requested, start_time))
+
+        # Store when the response was made and when the loop saw it
+        if key_press == 1:
+            data.set(
+                i,
+                "responseOnset",
+                self.clock.elapsed_ms(self.start_time, response_time),
+            )
+            data.set(
+                i,
+                "responseObserved",
+                self.clock.elapsed_ms(self.start_time, observed_time),
+            )
 
     def run(self):
+        # Time at task start
+        self.start_time = self.clock.now_us()
+
         # Instructions
         self.screen.blit(self.background, (0, 0))
         display.text(
@@ -188,7 +242,7 @@ class SART(object):
             self.screen, self.font, "center", self.screen_y / 2 + 300, (255, 255, 255)
         )
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -207,20 +261,29 @@ class SART(object):
             self.screen, self.font, "center", self.screen_y / 2 + 100, (255, 255, 255)
         )
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Blank screen
-        display.blank_screen(self.screen, self.background, self.BLANK_DURATION)
+        display.blank_screen(
+            self.screen, self.background, self.BLANK_DURATION, self.clock
+        )
 
         # Show practice trials
-        practice_trials = pd.DataFrame(
-            [5, 7, 7, 3, 9, 2, 1, 3, 8, 6], columns=["stimulus"]
+        practice_stimuli = [5, 7, 7, 3, 9, 2, 1, 3, 8, 6]
+        practice_trials = self.create_records(
+            practice_stimuli,
+            self.rng.choice(self.STIMSIZES_PT, len(practice_stimuli)),
         )
 
-        for i in range(practice_trials.shape[0]):
+        for i in range(len(practice_trials)):
+            display.begin_trial(i)
             self.display_trial(i, practice_trials)
+            display.end_trial(practice_trials, i)
+
+            if self.journal is not None:
+                self.journal.write_trial(practice_trials, i, "practice")
 
         # Practice end screen
         self.screen.blit(self.background, (0, 0))
@@ -246,20 +309,40 @@ class SART(object):
             self.screen, self.font, "center", self.screen_y / 2 + 100, (255, 255, 255)
         )
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Blank screen
-        display.blank_screen(self.screen, self.background, self.BLANK_DURATION)
+        display.blank_screen(
+            self.screen, self.background, self.BLANK_DURATION, self.clock
+        )
 
         # Show main trials
-        for i in range(self.all_data.shape[0]):
+        for i in range(len(self.all_data)):
+            display.begin_trial(i)
             self.display_trial(i, self.all_data)
+            display.end_trial(self.all_data, i)
+
+            if self.journal is not None:
+                self.journal.write_trial(self.all_data, i)
 
         # Rearrange dataframe
-        columns = ["trial", "stimulus", "stimSize", "RT", "key press", "accuracy"]
-        self.all_data = self.all_data[columns]
+        columns = [
+            "trial",
+            "stimulus",
+            "stimSize",
+            "RT",
+            "key press",
+            "accuracy",
+            "targetOnset",
+            "maskOnset",
+            "onsetLatency",
+            "responseOnset",
+            "responseObserved",
+        ]
+        columns += display.timing_columns(self.all_data)
+        self.all_data = self.all_data.to_frame(columns)
 
         # End screen
         self.screen.blit(self.background, (0, 0))
@@ -271,7 +354,7 @@ class SART(object):
             self.screen, self.font, "center", self.screen_y / 2 + 100, (255, 255, 255)
         )
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
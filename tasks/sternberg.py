@@ -1,21 +1,29 @@
 import os
 import sys
-import random
-import time
+import numpy as np
 import pandas as pd
 import pygame
 
 from pygame.locals import *
 from itertools import product
-from utils import display
+from utils import assets, display, schedule, trial_data
+from utils.clock import get_clock
 
 
 class Sternberg(object):
-    def __init__(self, screen, background, blocks=2):
+    def __init__(
+        self, screen, background, blocks=2, seed=None, journal=None, clock=None
+    ):
         # Get the pygame display window
         self.screen = screen
         self.background = background
 
+        # Journal that every finished trial is logged to
+        self.journal = journal
+
+        # Clock that the task is timed with
+        self.clock = get_clock() if clock is None else clock
+
         # Set fonts and font sizes
         self.font = pygame.font.SysFont("arial", 30)
         self.stim_font = pygame.font.SysFont("arial", 50)
@@ -33,11 +41,11 @@ class Sternberg(object):
         self.base_dir = os.path.dirname(os.path.realpath(__file__))
         self.image_path = os.path.join(self.base_dir, "images", "Sternberg")
 
-        self.img_left = pygame.image.load(
+        self.img_left = assets.load_image(
             os.path.join(self.image_path, "left_arrow.png")
         )
 
-        self.img_right = pygame.image.load(
+        self.img_right = assets.load_image(
             os.path.join(self.image_path, "right_arrow.png")
         )
 
@@ -59,86 +67,85 @@ class Sternberg(object):
         # Create condition combinations
         self.combinations = list(product(self.SET_SIZE, self.PROBE_TYPE))
 
+        # Random generator for the trial schedule
+        self.rng = schedule.create_rng(seed)
+
+        # Composite every static trial screen
+        self.frames = display.FrameCache(self.screen, self.background, self.clock)
+        self.create_frames()
+
         # Create practice trials
         # This gives 24 practice trials
-        self.practice_combinations = self.combinations * 6
-        random.shuffle(self.practice_combinations)
-        self.practice_trials = self.create_trials(self.practice_combinations)
+        self.practice_trials = self.create_trials(
+            schedule.sternberg_trials(self.rng, self.combinations, 6, 1, self.STIM_SET)
+        )
 
         # Create main trial blocks
-        self.blocks = []  # List will contain a dataframe for each block
-
-        for i in range(self.NUM_BLOCKS):
-            # This creates 48 trials per block
-            block_combinations = self.combinations * 12
-            random.shuffle(block_combinations)
+        # This creates 48 trials per block
+        main_trials = schedule.sternberg_trials(
+            self.rng, self.combinations, 12, self.NUM_BLOCKS, self.STIM_SET
+        )
 
-            block = self.create_trials(block_combinations)
+        self.blocks = []  # List will contain the trial records of each block
+        for i, block_trials in main_trials.groupby("block"):
+            block = self.create_trials(block_trials)
             block["block"] = str(i + 1)  # Store the block number
             self.blocks.append(block)
 
-    def create_trials(self, combinations):
-        df = pd.DataFrame(combinations, columns=("setSize", "probeType"))
+    def create_trials(self, trials):
+        # Preallocate the trial results
+        return trial_data.TrialRecords.from_frame(
+            trials[["setSize", "probeType", "set", "probe"]],
+            [
+                ("trialNum", ""),
+                ("block", ""),
+                ("response", ""),
+                ("RT", np.nan),
+                ("correct", ""),
+                ("fixationOnset", np.nan),
+                ("targetOnset", np.nan),
+                ("onsetLatency", np.nan),
+                ("responseOnset", np.nan),
+                ("responseObserved", np.nan),
+            ],
+        )
 
-        for i, r in df.iterrows():
-            # Store the current used set
-            used_set = random.sample(self.STIM_SET, r["setSize"])
-            unused_set = list(set(self.STIM_SET) - set(used_set))
+    def create_frames(self):
+        # Probe warning
+        frame = self.frames.add("fixation")
+        display.text(frame, self.stim_font, "+", "center", "center")
 
-            df.set_value(i, "set", "".join(str(x) for x in used_set))
+        # Feedback
+        frame = self.frames.add(("feedback", "too slow"))
+        display.text(frame, self.font, "too slow", "center", "center", (255, 165, 0))
+        frame = self.frames.add(("feedback", 1))
+        display.text(frame, self.font, "correct", "center", "center", (0, 255, 0))
+        frame = self.frames.add(("feedback", 0))
+        display.text(frame, self.font, "incorrect", "center", "center", (255, 0, 0))
 
-            # Store the target probe number
-            # Probe will be from/in the set 50% of the time (probe present)
-            if r["probeType"] == "present":
-                df.set_value(i, "probe", str(random.choice(used_set)))
-            else:
-                df.set_value(i, "probe", str(random.choice(unused_set)))
-
-            # Store blank columns to be used later
-            df["trialNum"] = ""
-            df["block"] = ""
-            df["response"] = ""
-            df["RT"] = ""
-            df["correct"] = ""
-
-            # Rearrange the dataframe
-            columns = [
-                "trialNum",
-                "block",
-                "setSize",
-                "probeType",
-                "set",
-                "probe",
-                "response",
-                "RT",
-                "correct",
-            ]
-            df = df[columns]
-
-        return df
-
-    def display_trial(self, df, i, r, trial_type):
+    def display_trial(self, df, i, trial_type):
         # Clear screen
         self.screen.blit(self.background, (0, 0))
-        pygame.display.flip()
+        display.flip(self.clock)
 
         # Display number sequence
-        self.display_sequence(r["set"])
+        self.display_sequence(df["set"][i])
 
         # Display probe warning
-        self.screen.blit(self.background, (0, 0))
-        display.text(self.screen, self.stim_font, "+", "center", "center")
-        pygame.display.flip()
+        fixation_onset = self.frames.show("fixation")
 
-        display.wait(self.PROBE_WARN_DURATION)
+        display.wait(self.PROBE_WARN_DURATION, self.clock)
 
         # Display blank screen
-        display.blank_screen(self.screen, self.background, self.BETWEEN_STIM_DURATION)
+        overshoot = display.blank_screen(
+            self.screen, self.background, self.BETWEEN_STIM_DURATION, self.clock
+        )
 
         # Display probe
+        target_requested = self.clock.now_us()
         self.screen.blit(self.background, (0, 0))
         display.text(
-            self.screen, self.stim_font, r["probe"], "center", "center", (0, 0, 255)
+            self.screen, self.stim_font, df["probe"][i], "center", "center", (0, 0, 255)
         )
 
         # Display key reminders if practice trials
@@ -150,7 +157,7 @@ class Sternberg(object):
                 self.screen_y / 2 + 150,
             )
 
-            yes_text = self.font.render("(yes)", 1, (0, 0, 0))
+            yes_text = display.render_text(self.font, "(yes)")
             display.text(
                 self.screen,
                 self.font,
@@ -166,7 +173,7 @@ class Sternberg(object):
                 self.screen_y / 2 + 150,
             )
 
-            no_text = self.font.render("(no)", 1, (0, 0, 0))
+            no_text = display.render_text(self.font, "(no)")
             display.text(
                 self.screen,
                 self.font,
@@ -175,79 +182,106 @@ class Sternberg(object):
                 self.screen_y / 2 + 160,
             )
 
-        pygame.display.flip()
+        start_time = display.flip(self.clock)
 
-        start_time = int(round(time.time() * 1000))
+        # Left for a probe in the set (present), right if absent
+        display.expect_response(
+            [K_LEFT, K_RIGHT],
+            ["present", "absent"].index(df["probeType"][i]),
+            self.PROBE_DURATION,
+        )
 
         # Clear the event queue before checking for responses
         pygame.event.clear()
+        response_time = None
+        observed_time = None
         wait_response = True
         while wait_response:
-            for event in pygame.event.get():
+            for event in display.get_events():
                 if event.type == KEYDOWN and event.key == K_LEFT:
-                    df.set_value(i, "response", "present")
+                    df.set(i, "response", "present")
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
                     wait_response = False
                 elif event.type == KEYDOWN and event.key == K_RIGHT:
-                    df.set_value(i, "response", "absent")
+                    df.set(i, "response", "absent")
+                    response_time = self.clock.event_time_us(event)
+                    observed_time = self.clock.now_us()
                     wait_response = False
                 elif event.type == KEYDOWN and event.key == K_F12:
                     sys.exit(0)
 
-            end_time = int(round(time.time() * 1000))
-
             # If time limit has been reached, consider it a missed trial
-            if end_time - start_time >= self.PROBE_DURATION:
+            if self.clock.elapsed_ms(start_time) >= self.PROBE_DURATION:
                 wait_response = False
 
         # Store RT
-        rt = int(round(time.time() * 1000)) - start_time
-        df.set_value(i, "RT", rt)
+        rt = self.clock.elapsed_ms(start_time, response_time)
+        df.set(i, "RT", rt)
+
+        # Store frame onsets, relative to the start of the task
+        df.set(
+            i, "fixationOnset", self.clock.elapsed_ms(self.start_time, fixation_onset)
+        )
+        df.set(i, "targetOnset", self.clock.elapsed_ms(self.start_time, start_time))
+
+        # Delay between the scheduled and the actual probe onset
+        onset_latency = overshoot + self.clock.elapsed_ms(target_requested, start_time)
+        df.set(i, "onsetLatency", round(onset_latency, 3))
+
+        # Store when the response was made and when the loop saw it
+        if response_time is not None:
+            df.set(
+                i,
+                "responseOnset",
+                self.clock.elapsed_ms(self.start_time, response_time),
+            )
+            df.set(
+                i,
+                "responseObserved",
+                self.clock.elapsed_ms(self.start_time, observed_time),
+            )
 
         # Display blank screen
-        display.blank_screen(self.screen, self.background, self.BETWEEN_STIM_DURATION)
+        display.blank_screen(
+            self.screen, self.background, self.BETWEEN_STIM_DURATION, self.clock
+        )
 
         # Display feedback
-        self.screen.blit(self.background, (0, 0))
-
         if rt >= self.PROBE_DURATION:
-            df.set_value(i, "correct", 0)
-            display.text(
-                self.screen, self.font, "too slow", "center", "center", (255, 165, 0)
-            )
+            df.set(i, "correct", 0)
+            self.frames.show(("feedback", "too slow"))
         else:
             if df["probeType"][i] == df["response"][i]:
-                df.set_value(i, "correct", 1)
-                display.text(
-                    self.screen, self.font, "correct", "center", "center", (0, 255, 0)
-                )
+                df.set(i, "correct", 1)
+                self.frames.show(("feedback", 1))
             else:
-                df.set_value(i, "correct", 0)
-                display.text(
-                    self.screen, self.font, "incorrect", "center", "center", (255, 0, 0)
-                )
-
-        pygame.display.flip()
+                df.set(i, "correct", 0)
+                self.frames.show(("feedback", 0))
 
-        display.wait(self.FEEDBACK_DURATION)
+        display.wait(self.FEEDBACK_DURATION, self.clock)
 
         # Display blank screen (ITI)
-        display.blank_screen(self.screen, self.background, self.ITI)
+        display.blank_screen(self.screen, self.background, self.ITI, self.clock)
 
     def display_sequence(self, sequence):
         for i, number in enumerate(sequence):
             # Display number
             self.screen.blit(self.background, (0, 0))
             display.text(self.screen, self.stim_font, number, "center", "center")
-            pygame.display.flip()
+            display.flip(self.clock)
 
-            display.wait(self.STIM_DURATION)
+            display.wait(self.STIM_DURATION, self.clock)
 
             # Display blank screen
             display.blank_screen(
-                self.screen, self.background, self.BETWEEN_STIM_DURATION
+                self.screen, self.background, self.BETWEEN_STIM_DURATION, self.clock
             )
 
     def run(self):
+        # Time at task start
+        self.start_time = self.clock.now_us()
+
         # Instructions screen
         self.screen.blit(self.background, (0, 0))
         display.text(self.screen, self.font, "Sternberg Task", "center", 100)
@@ -300,7 +334,7 @@ class Sternberg(object):
 
         display.text_space(self.screen, self.font, "center", 900)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
@@ -316,13 +350,18 @@ class Sternberg(object):
 
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Practice trials
-        for i, r in self.practice_trials.iterrows():
-            self.display_trial(self.practice_trials, i, r, "practice")
+        for i in range(len(self.practice_trials)):
+            display.begin_trial(i)
+            self.display_trial(self.practice_trials, i, "practice")
+            display.end_trial(self.practice_trials, i)
+
+            if self.journal is not None:
+                self.journal.write_trial(self.practice_trials, i, "practice")
 
         # Main trials ready screen
         self.screen.blit(self.background, (0, 0))
@@ -352,14 +391,19 @@ class Sternberg(object):
         )
         display.text_space(self.screen, self.font, "center", 800)
 
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Main trials
         for i, block in enumerate(self.blocks):
-            for j, r in block.iterrows():
-                self.display_trial(block, j, r, "main")
+            for j in range(len(block)):
+                display.begin_trial(j)
+                self.display_trial(block, j, "main")
+                display.end_trial(block, j)
+
+                if self.journal is not None:
+                    self.journal.write_trial(block, j)
 
             # If this is not the final block, show instructions for next block
             if i != len(self.blocks) - 1:
@@ -374,7 +418,7 @@ class Sternberg(object):
                 )
                 display.text_space(self.screen, self.font, "center", 700)
 
-                pygame.display.flip()
+                display.flip(self.clock)
 
                 display.wait_for_space()
 
@@ -382,12 +426,29 @@ class Sternberg(object):
         self.screen.blit(self.background, (0, 0))
         display.text(self.screen, self.font, "End of task", "center", "center")
         display.text_space(self.screen, self.font, "center", self.screen_y / 2 + 100)
-        pygame.display.flip()
+        display.flip(self.clock)
 
         display.wait_for_space()
 
         # Concatenate blocks and add trial numbers
-        all_data = pd.concat(self.blocks)
+        columns = [
+            "trialNum",
+            "block",
+            "setSize",
+            "probeType",
+            "set",
+            "probe",
+            "response",
+            "RT",
+            "correct",
+            "fixationOnset",
+            "targetOnset",
+            "onsetLatency",
+            "responseOnset",
+            "responseObserved",
+        ]
+        columns += display.timing_columns(self.blocks[0])
+        all_data = pd.concat([block.to_frame(columns) for block in self.blocks])
         all_data["trialNum"] = list(range(1, len(all_data) + 1))
 
         print("- Sternberg Task complete")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The analysis modules import each other from their own directory
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"
+    )
+)
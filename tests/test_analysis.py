@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+
+
+def trials(rng, conditions, num_trials=40):
+    # Random trials crossing the condition levels, with RT and correct columns
+    columns = list(conditions)
+    rows = [
+        [levels[rng.integers(len(levels))] for levels in conditions.values()]
+        for _ in range(num_trials)
+    ]
+
+    df = pd.DataFrame(rows, columns=columns)
+    df["RT"] = rng.normal(500, 80, num_trials).round(3)
+    df["correct"] = (rng.random(num_trials) < 0.85).astype(int)
+
+    return df
+
+
+def ant_trials(rng, num_trials=288):
+    return trials(
+        rng,
+        {
+            "congruency": ["congruent", "incongruent", "neutral"],
+            "cue": ["nocue", "center", "spatial", "double"],
+        },
+        num_trials,
+    )
+
+
+def sternberg_trials(rng, num_trials=40):
+    return trials(rng, {"setSize": [2, 6]}, num_trials)
+
+
+def flanker_trials(rng, num_trials=200):
+    return trials(
+        rng,
+        {
+            "compatibility": ["compatible", "incompatible"],
+            "congruency": ["congruent", "incongruent"],
+        },
+        num_trials,
+    )
+
+
+def assert_same_summary(closed, fitted):
+    assert closed[0] == fitted[0]
+    np.testing.assert_allclose(
+        np.array(closed[1:], dtype=float),
+        np.array(fitted[1:], dtype=float),
+        rtol=1e-12,
+        atol=1e-12,
+    )
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(3)
+
+
+@pytest.mark.parametrize("response_type", ["full", "correct", "incorrect"])
+@pytest.mark.parametrize(
+    "aggregate, make_trials",
+    [
+        (analysis.aggregate_ant, ant_trials),
+        (analysis.aggregate_sternberg, sternberg_trials),
+        (analysis.aggregate_flanker, flanker_trials),
+    ],
+)
+def test_closed_contrasts_match_ols(rng, aggregate, make_trials, response_type):
+    pytest.importorskip("statsmodels")
+
+    for _ in range(5):
+        data = make_trials(rng)
+        assert_same_summary(
+            aggregate(data, "1", response_type, "closed"),
+            aggregate(data, "1", response_type, "statsmodels"),
+        )
+
+
+def test_closed_contrasts_match_ols_with_missing_level(rng):
+    pytest.importorskip("statsmodels")
+
+    # No neutral trials, which only the descriptives use
+    data = ant_trials(rng)
+    data = data[data["congruency"] != "neutral"].reset_index(drop=True)
+
+    closed = analysis.aggregate_ant(data, "1", "full", "closed")
+    assert_same_summary(
+        closed, analysis.aggregate_ant(data, "1", "full", "statsmodels")
+    )
+
+    neutral_rt = analysis.ANT_COLUMNS.index("ant_neutral_rt")
+    assert np.isnan(closed[neutral_rt])
+
+
+def test_closed_contrasts_match_ols_with_single_trial_cell(rng):
+    pytest.importorskip("statsmodels")
+
+    # A single center cue trial, and a single set size 6 trial
+    data = ant_trials(rng)
+    center = data.index[data["cue"] == "center"]
+    data = data.drop(center[1:]).reset_index(drop=True)
+    assert_same_summary(
+        analysis.aggregate_ant(data, "1", "full", "closed"),
+        analysis.aggregate_ant(data, "1", "full", "statsmodels"),
+    )
+
+    data = sternberg_trials(rng)
+    six = data.index[data["setSize"] == 6]
+    data = data.drop(six[1:]).reset_index(drop=True)
+    assert_same_summary(
+        analysis.aggregate_sternberg(data, "1", "full", "closed"),
+        analysis.aggregate_sternberg(data, "1", "full", "statsmodels"),
+    )
+
+
+def test_closed_contrast_of_missing_level_is_nan():
+    df = pd.DataFrame({"congruency": ["congruent"] * 3, "RT": [400.0, 500.0, 600.0]})
+
+    intercept, slope = analysis.contrast(df, "congruency", "congruent", "incongruent")
+    assert intercept == 500
+    assert np.isnan(slope)
+
+    # The model cannot be fit without trials of both levels
+    pytest.importorskip("statsmodels")
+    with pytest.raises(ValueError):
+        analysis.contrast(df, "congruency", "congruent", "incongruent", "statsmodels")
+
+
+def original_aggregate_ant(data, sub_num, response_type="full"):
+    # The ANT summary as first written, one groupby reduction per value, with
+    # .loc in place of the removed get_value and the contrasts fitted by OLS
+    import statsmodels.formula.api as smf
+
+    df = data
+    follow_error_rt = df.loc[df.correct.shift() == 0, "RT"].mean()
+    follow_correct_rt = df.loc[df.correct.shift() == 1, "RT"].mean()
+
+    if response_type == "correct":
+        df = data[data["correct"] == 1]
+    elif response_type == "incorrect":
+        df = data[data["correct"] == 0]
+
+    values = [sub_num, follow_error_rt, follow_correct_rt]
+    for condition, levels in [
+        ("congruency", ["neutral", "congruent", "incongruent"]),
+        ("cue", ["nocue", "center", "spatial", "double"]),
+    ]:
+        grouped = df[[condition, "RT", "correct"]].groupby(condition)
+        rt = [grouped.mean().loc[level, "RT"] for level in levels]
+        rtsd = [grouped.std().loc[level, "RT"] for level in levels]
+        rtcov = [sd / mean for sd, mean in zip(rtsd, rt)]
+        correct = [grouped.sum().loc[level, "correct"] for level in levels]
+        values += rt + rtsd + rtcov + correct
+
+    level_rt = df.groupby("congruency")["RT"].mean()
+    cue_rt = df.groupby("cue")["RT"].mean()
+    for condition, reference, level, reference_rt in [
+        ("congruency", "congruent", "incongruent", level_rt["congruent"]),
+        ("cue", "double", "nocue", cue_rt["double"]),
+        ("cue", "spatial", "center", cue_rt["spatial"]),
+    ]:
+        contrast_df = df[(df[condition] == reference) | (df[condition] == level)]
+        formula = "RT ~ C(%s, Treatment(reference=%r))" % (condition, reference)
+        intercept, slope = smf.ols(formula, contrast_df).fit().params
+        values += [intercept, slope, slope / reference_rt]
+
+    return values
+
+
+@pytest.mark.parametrize("response_type", ["full", "correct", "incorrect"])
+def test_ant_summary_is_unchanged(rng, response_type):
+    pytest.importorskip("statsmodels")
+
+    for _ in range(5):
+        data = ant_trials(rng)
+        # Trials without a response have no RT
+        data.loc[rng.random(len(data)) < 0.05, "RT"] = np.nan
+
+        summary = analysis.aggregate_ant(data, "1", response_type)
+        expected = original_aggregate_ant(data, "1", response_type)
+
+        assert len(summary) == len(analysis.ANT_COLUMNS)
+        assert_same_summary(summary, expected)
+
+        # The numbers correct are still integers
+        for column in analysis.ANT_COLUMNS:
+            if column.endswith("_correct"):
+                index = analysis.ANT_COLUMNS.index(column)
+                assert summary[index] == expected[index]
+                assert isinstance(summary[index], (int, np.integer))
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+import batch
+
+from tests.test_storage import ravens_table
+from utils import simulation
+
+SUBJECTS = ["1", "2", "3"]
+
+# Simulated tasks, and the aggregate functions of each
+TASKS = [
+    ("ANT", analysis.aggregate_ant, batch.aggregate_ant, analysis.ANT_COLUMNS),
+    (
+        "Digit span (backwards)",
+        analysis.aggregate_digit_span,
+        batch.aggregate_digit_span,
+        analysis.DIGIT_SPAN_COLUMNS,
+    ),
+    (
+        "Eriksen Flanker",
+        analysis.aggregate_flanker,
+        batch.aggregate_flanker,
+        analysis.FLANKER_COMPAT_COLUMNS,
+    ),
+    ("SART", analysis.aggregate_sart, batch.aggregate_sart, analysis.SART_COLUMNS),
+    (
+        "Sternberg",
+        analysis.aggregate_sternberg,
+        batch.aggregate_sternberg,
+        analysis.STERNBERG_COLUMNS,
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def sessions():
+    # Task data of a few simulated subjects, keyed by subject number
+    data = {}
+    for i, sub_num in enumerate(SUBJECTS):
+        data[sub_num] = simulation.run_tasks(
+            [name for name, _, _, _ in TASKS],
+            simulation.SimulatedParticipant(i, accuracy=0.8),
+            i,
+            task_options={"ANT": {"blocks": 1}, "Eriksen Flanker": {"sets_main": 10}},
+        )
+
+    return data
+
+
+def long_format(tables):
+    # Trials of every subject in one table, as batch aggregates take them
+    trials = []
+    for sub_num, data in tables.items():
+        data = data.copy()
+        data.insert(0, "sub_num", sub_num)
+        trials.append(data)
+
+    return pd.concat(trials, ignore_index=True)
+
+
+def per_subject(aggregate, tables, columns, *args):
+    rows = [aggregate(data, sub_num, *args) for sub_num, data in tables.items()]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def assert_same_summary(expected, summary):
+    assert summary["sub_num"].tolist() == expected["sub_num"].tolist()
+    np.testing.assert_allclose(
+        summary[expected.columns[1:]].to_numpy(dtype=float),
+        expected[expected.columns[1:]].to_numpy(dtype=float),
+        rtol=1e-12,
+        atol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("name, aggregate, batch_aggregate, columns", TASKS)
+def test_batch_aggregate_matches_per_subject(
+    sessions, name, aggregate, batch_aggregate, columns
+):
+    tables = {sub_num: data[name] for sub_num, data in sessions.items()}
+    response_types = ["full", "correct", "incorrect"]
+    if name not in ("ANT", "Eriksen Flanker", "Sternberg"):
+        response_types = [None]
+
+    for response_type in response_types:
+        args = () if response_type is None else (response_type,)
+        expected = per_subject(aggregate, tables, columns, *args)
+        summary = batch_aggregate(long_format(tables), *args)
+
+        # The flanker summary always has the incompatible block columns,
+        # which are NaN as the battery only runs compatible blocks by default
+        extra = [column for column in summary.columns if column not in columns]
+        if name == "Eriksen Flanker":
+            assert extra == analysis.FLANKER_INCOMPAT_COLUMNS[1:]
+            assert summary[extra].isna().all().all()
+        else:
+            assert extra == []
+
+        assert_same_summary(expected, summary)
+
+
+@pytest.mark.parametrize(
+    "aggregate, batch_aggregate, columns, make_table",
+    [
+        (
+            analysis.aggregate_ravens,
+            batch.aggregate_ravens,
+            analysis.RAVENS_COLUMNS,
+            ravens_table,
+        ),
+        (
+            analysis.aggregate_mrt,
+            batch.aggregate_mrt,
+            analysis.MRT_COLUMNS,
+            lambda: pd.DataFrame({"correct": [1, 0, 1, 1]}),
+        ),
+    ],
+)
+def test_batch_score_aggregate_matches_per_subject(
+    aggregate, batch_aggregate, columns, make_table
+):
+    tables = {sub_num: make_table() for sub_num in SUBJECTS}
+
+    expected = per_subject(aggregate, tables, columns)
+    summary = batch_aggregate(long_format(tables))
+
+    assert list(summary.columns) == columns
+    assert_same_summary(expected, summary)
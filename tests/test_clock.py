@@ -0,0 +1,78 @@
+import pygame
+import pytest
+
+from pygame.locals import KEYDOWN, K_SPACE
+from utils import clock
+
+
+class PartialClock(clock.Clock):
+    # A clock that can be read, but not waited on
+    def now_ns(self):
+        return 0
+
+
+def test_partial_clock_cannot_be_instantiated():
+    with pytest.raises(TypeError, match="sleep"):
+        PartialClock()
+
+
+@pytest.mark.parametrize("clock_class", [clock.MonotonicClock, clock.VirtualClock])
+def test_clocks_implement_the_interface(clock_class):
+    assert isinstance(clock_class(), clock.Clock)
+
+
+def test_monotonic_clock_never_goes_back():
+    monotonic = clock.MonotonicClock()
+    readings = [monotonic.now_ns() for _ in range(1000)]
+
+    assert readings == sorted(readings)
+
+
+def test_elapsed_ms_keeps_microseconds():
+    virtual = clock.VirtualClock(start_ns=2000000000)
+    start = virtual.now_us()
+    virtual.advance(523456789)
+
+    assert virtual.elapsed_ms(start) == 523.456
+    assert virtual.elapsed_ms(start, start + 1) == 0.001
+
+
+def test_virtual_clock_only_moves_forward():
+    virtual = clock.VirtualClock()
+    virtual.sleep(0.25)
+    virtual.spin_until(100000)
+
+    assert virtual.now_us() == 250000
+
+    virtual.spin_until(300000)
+    virtual.advance(-1000)
+
+    assert virtual.now_us() == 300000
+
+
+def test_event_time_prefers_the_stamped_time():
+    monotonic = clock.MonotonicClock()
+    event = pygame.event.Event(KEYDOWN, key=K_SPACE, time_us=1234)
+
+    assert monotonic.event_time_us(event) == 1234
+    assert clock.VirtualClock().event_time_us(event) == 1234
+
+
+def test_event_time_maps_sdl_timestamps(monkeypatch):
+    # An event that happened 20 ms before it is read
+    monkeypatch.setattr(pygame.time, "get_ticks", lambda: 1020)
+    monotonic = clock.MonotonicClock()
+    event = pygame.event.Event(KEYDOWN, key=K_SPACE, timestamp=1000)
+
+    before = monotonic.now_us()
+    time_us = monotonic.event_time_us(event)
+    after = monotonic.now_us()
+
+    assert before - 20000 <= time_us <= after - 20000
+
+
+def test_event_time_defaults_to_now():
+    virtual = clock.VirtualClock(start_ns=5000000)
+    event = pygame.event.Event(KEYDOWN, key=K_SPACE)
+
+    assert virtual.event_time_us(event) == 5000
@@ -0,0 +1,169 @@
+import os
+
+import pygame
+import pytest
+
+from pygame.locals import KEYDOWN, K_F12, K_SPACE
+from utils import display
+from utils.clock import VirtualClock
+
+
+@pytest.fixture(autouse=True)
+def events():
+    # The event queue needs an initialised display, a dummy one here
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    yield
+    pygame.display.quit()
+
+
+class SleepyClock(VirtualClock):
+    # Virtual clock whose sleeps overrun, posting an event each time if given
+    def __init__(self, oversleep_ms=0, event=None):
+        super().__init__()
+        self.oversleep_ms = oversleep_ms
+        self.event = event
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        super().sleep(seconds + self.oversleep_ms / 1000)
+        if self.event is not None:
+            pygame.event.post(self.event)
+
+
+def test_wait_ends_on_its_deadline():
+    clock = SleepyClock()
+
+    assert display.wait(500, clock) == 0
+    assert clock.now_us() == 500000
+
+    # Slept in slices up to the spin margin, then spun to the deadline
+    assert max(clock.sleeps) == display.WAIT_SLICE / 1000
+    assert sum(clock.sleeps) == pytest.approx((500 - display.WAIT_SPIN_MARGIN) / 1000)
+
+
+def test_wait_reports_its_overshoot():
+    # A 5 ms slice that sleeps 10 ms too long ends 5 ms after a 10 ms wait
+    clock = SleepyClock(oversleep_ms=10)
+
+    assert display.wait(10, clock) == 5
+    assert clock.now_us() == 15000
+
+
+def test_wait_spin_absorbs_a_short_oversleep():
+    # Oversleeping into the spin margin still ends on the deadline
+    clock = SleepyClock(oversleep_ms=4)
+
+    assert display.wait(10, clock) == 0
+    assert clock.now_us() == 10000
+
+
+def test_wait_quits_on_f12():
+    clock = SleepyClock(event=pygame.event.Event(KEYDOWN, key=K_F12))
+
+    with pytest.raises(SystemExit) as exit_info:
+        display.wait(1000, clock)
+
+    assert exit_info.value.code == 0
+
+    # Caught after the first slice
+    assert clock.now_us() == display.WAIT_SLICE * 1000
+
+
+def test_wait_ignores_other_keys():
+    clock = SleepyClock(event=pygame.event.Event(KEYDOWN, key=K_SPACE))
+
+    assert display.wait(100, clock) == 0
+    assert clock.now_us() == 100000
+
+
+@pytest.fixture
+def font():
+    pygame.font.init()
+    display.clear_text_cache()
+    yield pygame.font.Font(None, 24)
+    display.clear_text_cache()
+
+
+def test_text_cache_reuses_rendered_text(font):
+    plus = display.render_text(font, "+")
+
+    assert display.render_text(font, "+") is plus
+    assert display.render_text(font, "+", (255, 0, 0)) is not plus
+    assert display.text_cache_info() == {
+        "hits": 1,
+        "misses": 2,
+        "size": 2,
+        "max_size": display.TEXT_CACHE_SIZE,
+    }
+
+
+def test_text_cache_evicts_least_recently_used(font, monkeypatch):
+    monkeypatch.setattr(display, "TEXT_CACHE_SIZE", 3)
+
+    for digit in "123":
+        display.render_text(font, digit)
+    one = display.render_text(font, "1")  # Now the most recently used
+    display.render_text(font, "4")
+
+    info = display.text_cache_info()
+    assert info["size"] == 3
+    assert (info["hits"], info["misses"]) == (1, 4)
+
+    # "2" was dropped and is rendered again, "1" is kept
+    assert display.render_text(font, "1") is one
+    display.render_text(font, "2")
+    assert display.text_cache_info()["misses"] == 5
+
+
+def test_text_blits_surfaces_without_caching_them(font):
+    screen = pygame.Surface((200, 100))
+    surface = font.render("Ready", 1, (0, 0, 0))
+
+    display.text(screen, font, surface, "center", "center")
+
+    assert display.text_cache_info()["size"] == 0
+
+
+def test_stamp_input_keeps_the_first_time_seen():
+    clock = VirtualClock(start_ns=1000000)
+    pygame.event.post(pygame.event.Event(KEYDOWN, key=K_SPACE))
+
+    display.stamp_input(clock)
+    clock.advance(30000000)
+    display.stamp_input(clock)
+
+    (event,) = pygame.event.get(KEYDOWN)
+    assert event.key == K_SPACE
+    assert event.time_us == 1000
+    assert clock.event_time_us(event) == 1000
+
+
+def test_stamp_input_keeps_event_order():
+    clock = VirtualClock()
+    for key in [K_SPACE, K_F12]:
+        pygame.event.post(pygame.event.Event(KEYDOWN, key=key))
+        clock.advance(1000000)
+        display.stamp_input(clock)
+
+    events = pygame.event.get(KEYDOWN)
+    assert [(event.key, event.time_us) for event in events] == [
+        (K_SPACE, 1000),
+        (K_F12, 2000),
+    ]
+
+
+def test_frame_limiter_stamps_input_during_a_frame():
+    # A key pressed while the frame is drawn is timed before the tick sleeps
+    clock = VirtualClock()
+    limiter = display.FrameLimiter(60, clock)
+    limiter.tick()
+
+    clock.advance(4000000)
+    pygame.event.post(pygame.event.Event(KEYDOWN, key=K_SPACE))
+    limiter.tick()
+    clock.advance(50000000)
+
+    (event,) = pygame.event.get(KEYDOWN)
+    assert event.time_us == 4000
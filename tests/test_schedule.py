@@ -0,0 +1,69 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import schedule
+
+STERNBERG_COMBINATIONS = list(product((2, 6), ("present", "absent")))
+
+
+def schedules(seed):
+    # One of every schedule, all from a single generator as the tasks draw them
+    rng = schedule.create_rng(seed)
+
+    return (
+        schedule.shuffled_blocks(rng, 12, 8, 3),
+        schedule.sternberg_trials(rng, STERNBERG_COMBINATIONS, 12, 5, range(10)),
+        schedule.digit_sequences(rng, range(1, 10), [3, 3, 4, 4, 5, 8]),
+        schedule.sart_trials(rng, list(range(1, 10)), 25, [48, 72, 94, 100]),
+    )
+
+
+def assert_same_schedules(first, second):
+    order, sternberg, sequences, (stimuli, sizes) = first
+
+    np.testing.assert_array_equal(order, second[0])
+    pd.testing.assert_frame_equal(sternberg, second[1])
+    assert sequences == second[2]
+    np.testing.assert_array_equal(stimuli, second[3][0])
+    np.testing.assert_array_equal(sizes, second[3][1])
+
+
+def test_schedules_are_reproducible_from_a_seed():
+    assert_same_schedules(schedules(20180601), schedules(20180601))
+
+
+def test_schedules_differ_between_seeds():
+    with pytest.raises(AssertionError):
+        assert_same_schedules(schedules(1), schedules(2))
+
+
+def test_blocks_are_balanced():
+    order = schedule.shuffled_blocks(schedule.create_rng(3), 12, 8, 300)
+
+    assert order.shape == (300, 96)
+    assert (np.sort(order, axis=1) == np.repeat(np.arange(12), 8)).all()
+
+
+def test_sternberg_probes_match_probe_type():
+    trials = schedule.sternberg_trials(
+        schedule.create_rng(4), STERNBERG_COMBINATIONS, 12, 200, range(10)
+    )
+
+    assert len(trials) == 200 * 48
+    assert (trials["set"].str.len() == trials["setSize"]).all()
+    assert all(len(set(digits)) == len(digits) for digits in trials["set"])
+
+    in_set = [probe in digits for probe, digits in zip(trials["probe"], trials["set"])]
+    assert (np.array(in_set) == (trials["probeType"] == "present")).all()
+
+
+def test_digit_sequences_do_not_repeat_digits():
+    lengths = [3, 4, 5, 6, 7, 8] * 50
+    sequences = schedule.digit_sequences(schedule.create_rng(5), range(1, 10), lengths)
+
+    assert [len(sequence) for sequence in sequences] == lengths
+    assert all(len(set(sequence)) == len(sequence) for sequence in sequences)
+    assert "0" not in "".join(sequences)
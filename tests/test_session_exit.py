@@ -0,0 +1,100 @@
+import os
+import sys
+import subprocess
+
+import pytest
+import pandas as pd
+
+import analysis
+
+from tests.test_storage import ravens_records
+from utils import journal, storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs a simulated session in which the participant presses F12 during SART,
+# so that the task calls sys.exit() and SystemExit ends the process
+QUIT_SESSION = """
+import sys
+from pygame.locals import K_F12
+from simulate_battery import simulate_session
+from utils import simulation
+
+
+class QuittingParticipant(simulation.SimulatedParticipant):
+    def __init__(self, responses, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = responses
+
+    def post(self, response, time_us):
+        self.responses -= 1
+        if self.responses < 0:
+            response = K_F12
+        super().post(response, time_us)
+
+
+dir_data, data_format = sys.argv[1:]
+simulate_session(
+    dir_data, 1, ["SART"], QuittingParticipant(30, seed=1), 1, data_format
+)
+raise AssertionError("The session was not quit")
+"""
+
+
+@pytest.mark.parametrize("data_format", ["parquet", "feather"])
+def test_quit_during_task_saves_session(tmp_path, data_format):
+    pytest.importorskip("pyarrow")
+
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    result = subprocess.run(
+        [sys.executable, "-c", QUIT_SESSION, str(tmp_path), data_format],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    # The data files are saved next to the journal, from the trials logged
+    # before quitting
+    assert sorted(os.listdir(tmp_path)) == ["1_1", "1_1.jsonl"]
+
+    sessions = storage.find_sessions(str(tmp_path))
+    assert [path for path, _ in sessions] == [str(tmp_path / "1_1")]
+
+    path, session_storage = sessions[0]
+    assert session_storage.name == data_format
+
+    tables = session_storage.load(path)
+    assert list(tables) == [storage.INFO_TABLE, "SART"]
+    assert 0 < len(tables["SART"]) < 225
+
+
+def test_find_sessions_reads_unsaved_journal(tmp_path):
+    session_journal = journal.TrialJournal(str(tmp_path / "2_1.jsonl"))
+    session_journal.write_frame(
+        storage.INFO_TABLE,
+        pd.DataFrame([("002", "1")], columns=["sub_num", "condition"]),
+    )
+
+    # Raven's trials in the older string layout, quit before the task ended
+    ravens = ravens_records(as_strings=True)
+    session_journal.begin_task("Ravens Matrices")
+    for i in range(len(ravens)):
+        session_journal.write_trial(ravens, i)
+    session_journal.close()
+
+    sessions = storage.find_sessions(str(tmp_path))
+    assert len(sessions) == 1
+
+    path, session_storage = sessions[0]
+    assert isinstance(session_storage, storage.JournalStorage)
+    assert session_storage.table_names(path) == [storage.INFO_TABLE, "Ravens Matrices"]
+
+    tables = session_storage.load(path)
+    assert tables[storage.INFO_TABLE].loc[0, "sub_num"] == "002"
+    assert tables["Ravens Matrices"]["RT"].dtype == float
+
+    summary = analysis.aggregate_ravens(tables["Ravens Matrices"], "002")
+    assert summary == ["002", pytest.approx(21.375), 1, pytest.approx(1 / 3), 3]
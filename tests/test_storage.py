@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+import batch
+
+from utils import storage, trial_data
+
+RAVENS_COLUMNS = ["trial", "correctAnswer", "userAnswer", "correct", "RT"]
+
+
+def ravens_records(as_strings=False):
+    # Raven's items as the task records them, the last one timed out. Older
+    # sessions recorded the RT as a string, "NA" when timed out
+    data = trial_data.TrialRecords(
+        3,
+        [
+            ("userAnswer", "NA"),
+            ("RT", "NA" if as_strings else np.nan),
+            ("correct", 0),
+        ],
+    )
+    data["trial"] = np.arange(1, 4)
+    data["correctAnswer"] = np.array([2, 5, 1])
+    for i, (answer, rt) in enumerate([("2", 12.5), ("3", 30.25)]):
+        data.set(i, "userAnswer", answer)
+        data.set(i, "RT", str(rt) if as_strings else rt)
+    data.set(0, "correct", 1)
+
+    return data
+
+
+def ravens_table(as_strings=False):
+    return ravens_records(as_strings).to_frame(RAVENS_COLUMNS)
+
+
+def test_typed_treats_missing_values_as_nan():
+    frame = pd.DataFrame(
+        {
+            "sub_num": ["007", "007"],
+            "RT": ["1.5", "NA"],
+            "response": [1, ""],
+            "label": ["a", "NA"],
+        }
+    )
+
+    typed = storage._typed(frame)
+
+    assert typed["sub_num"].tolist() == ["007", "007"]
+    assert typed["RT"].dtype == float
+    assert typed["RT"].isna().tolist() == [False, True]
+    assert typed["response"].dtype == float
+    assert typed["label"].tolist() == ["a", "NA"]
+
+
+@pytest.mark.parametrize("as_strings", [False, True])
+@pytest.mark.parametrize("data_format", ["parquet", "feather"])
+def test_ravens_round_trip_aggregates(tmp_path, data_format, as_strings):
+    pytest.importorskip("pyarrow")
+
+    session_storage = storage.get_storage(data_format)
+    info = pd.DataFrame([("001", "1")], columns=["sub_num", "condition"])
+    tables = {storage.INFO_TABLE: info, "Ravens Matrices": ravens_table(as_strings)}
+
+    path = session_storage.save(tables, str(tmp_path), "1_1")
+    loaded = session_storage.load(path)
+    ravens = loaded["Ravens Matrices"]
+
+    assert loaded[storage.INFO_TABLE].loc[0, "sub_num"] == "001"
+    assert ravens["RT"].dtype == float
+
+    summary = analysis.aggregate_ravens(ravens, "001")
+    assert summary == ["001", pytest.approx(21.375), 1, pytest.approx(1 / 3), 3]
+
+    ravens.insert(0, "sub_num", "001")
+    batch_summary = batch.aggregate_ravens(ravens)
+    assert batch_summary.iloc[0].tolist() == summary
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import trial_data
+
+# SART trials: stimulus, font size and the RT of a key press (None if
+# withheld)
+SART_TRIALS = [(3, 48, None), (7, 72, 412.5), (1, 94, 388.0), (3, 100, 530.25)]
+
+
+def set_value(df, i, column, value):
+    # DataFrame.set_value as the tasks used it, before its removal from
+    # pandas. Setting a new column adds it, missing in every other row
+    df.loc[i, column] = value
+
+
+def sart_set_value_layout():
+    # SART results as the task recorded them cell by cell with set_value
+    data = pd.DataFrame()
+    data["trial"] = range(1, len(SART_TRIALS) + 1)
+    data["stimulus"] = [stimulus for stimulus, _, _ in SART_TRIALS]
+
+    for i, (stimulus, size, rt) in enumerate(SART_TRIALS):
+        set_value(data, i, "RT", 1150)
+        if rt is not None:
+            set_value(data, i, "RT", rt)
+
+        key_press = int(rt is not None)
+        set_value(data, i, "key press", key_press)
+        set_value(data, i, "accuracy", int(key_press == (stimulus != 3)))
+        set_value(data, i, "stimSize", size)
+
+    return data
+
+
+def sart_records():
+    # The same results recorded in preallocated trial records
+    records = trial_data.TrialRecords(len(SART_TRIALS))
+    records["stimulus"] = [stimulus for stimulus, _, _ in SART_TRIALS]
+    records["stimSize"] = [size for _, size, _ in SART_TRIALS]
+    records["RT"] = 1150.0
+    records["key press"] = 0
+    records["accuracy"] = 0
+    records["trial"] = range(1, len(SART_TRIALS) + 1)
+
+    for i, (stimulus, _, rt) in enumerate(SART_TRIALS):
+        if rt is not None:
+            records.set(i, "RT", rt)
+            records.set(i, "key press", 1)
+        records.set(i, "accuracy", int((rt is not None) == (stimulus != 3)))
+
+    return records
+
+
+def test_records_match_set_value_layout():
+    expected = sart_set_value_layout()
+    records = sart_records()
+
+    data = records.to_frame(list(expected.columns))
+
+    # set_value gave float columns, as new columns started out missing
+    pd.testing.assert_frame_equal(data, expected, check_dtype=False)
+    assert data["key press"].dtype == np.int64
+    assert data["RT"].dtype == np.float64
+
+    for i in range(len(SART_TRIALS)):
+        assert dict(records.row(i)) == pytest.approx(
+            expected.loc[i, list(records.columns)].to_dict()
+        )
+
+
+def test_records_from_frame_keep_conditions():
+    conditions = pd.DataFrame(
+        {"setSize": [2, 6, 2], "probe": ["present", "absent", "absent"]}
+    )
+    records = trial_data.TrialRecords.from_frame(
+        conditions, [("response", "NA"), ("RT", np.nan), ("correct", 0)]
+    )
+    records.set(1, "response", "absent")
+    records.set(1, "RT", 612.75)
+    records.set(1, "correct", 1)
+
+    data = records.to_frame()
+
+    assert list(data.columns) == ["setSize", "probe", "response", "RT", "correct"]
+    pd.testing.assert_frame_equal(data[["setSize", "probe"]], conditions)
+    assert data["response"].tolist() == ["NA", "absent", "NA"]
+    assert data["RT"].tolist()[1] == 612.75
+    assert np.isnan(data["RT"].tolist()[0])
+    assert data["correct"].tolist() == [0, 1, 0]
+
+
+def test_records_reject_columns_of_the_wrong_length():
+    records = trial_data.TrialRecords(3)
+
+    with pytest.raises(ValueError):
+        records["trial"] = [1, 2]
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from utils.writer import BackgroundWriter
+
+
+def test_writes_run_in_order_before_flush_returns():
+    writer = BackgroundWriter()
+    written = []
+    for i in range(100):
+        writer.submit(written.append, i)
+
+    writer.flush()
+    assert written == list(range(100))
+
+    writer.submit(written.append, 100)
+    writer.close()
+    assert written == list(range(101))
+
+
+def test_close_runs_queued_writes_and_stops():
+    writer = BackgroundWriter()
+    release = threading.Event()
+    written = []
+
+    writer.submit(release.wait)
+    writer.submit(written.append, "session")
+    release.set()
+    writer.close()
+
+    assert written == ["session"]
+    assert not writer.thread.is_alive()
+
+    with pytest.raises(RuntimeError):
+        writer.submit(written.append, "late")
+
+    writer.close()  # Closing again does nothing
+
+
+def test_full_queue_blocks_submit():
+    writer = BackgroundWriter(queue_size=2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_write():
+        started.set()
+        release.wait()
+
+    writer.submit(slow_write)
+    started.wait()
+    writer.submit(id, 1)
+    writer.submit(id, 2)  # The queue is now full
+
+    submitter = threading.Thread(target=writer.submit, args=(id, 3))
+    submitter.start()
+    submitter.join(0.2)
+    assert submitter.is_alive()
+
+    release.set()
+    submitter.join(5)
+    assert not submitter.is_alive()
+
+    writer.close()
+
+
+def test_write_errors_are_raised_in_the_caller():
+    writer = BackgroundWriter()
+    written = []
+
+    writer.submit(int, "not a number")
+    writer.submit(written.append, "next")
+
+    with pytest.raises(ValueError):
+        writer.flush()
+
+    # The error is raised once, and later writes still ran
+    assert written == ["next"]
+    writer.close()
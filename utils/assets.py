@@ -0,0 +1,67 @@
+import os
+import pygame
+
+from pygame.locals import *
+
+# Size in bytes of the pixel data of every image loaded, keyed by file path
+_image_bytes = {}
+
+
+def load_image(path, alpha=None):
+    """Load an image and convert it to the pixel format of the display.
+
+    Converting once at load time means blits during a task do not have to
+    convert every pixel. Images with per-pixel transparency keep their alpha
+    channel. A display mode must be set before images are loaded.
+
+    Parameters:
+    path -- path to the image file
+    alpha -- whether to keep an alpha channel. Defaults to keeping it only
+        if the image has per-pixel transparency
+    """
+
+    if not os.path.isfile(path):
+        raise IOError("Image file not found: %s" % path)
+
+    img = pygame.image.load(path)
+
+    width, height = img.get_size()
+    if width == 0 or height == 0:
+        raise ValueError("Image file is empty: %s" % path)
+
+    if alpha is None:
+        alpha = bool(img.get_flags() & SRCALPHA)
+
+    if alpha:
+        img = img.convert_alpha()
+    else:
+        img = img.convert()
+
+    _image_bytes[path] = width * height * img.get_bytesize()
+
+    return img
+
+
+def load_images(directory, names, extension=".png"):
+    """Load a set of images from one directory with load_image().
+
+    Parameters:
+    directory -- path to the directory containing the images
+    names -- file names of the images, without the extension
+    extension -- file extension shared by all the images
+
+    Returns:
+    images -- dictionary of converted images, keyed by name
+    """
+
+    images = {}
+    for name in names:
+        images[name] = load_image(os.path.join(directory, name + extension))
+
+    return images
+
+
+def memory_usage():
+    """Return the total size in bytes of all images loaded by load_image()."""
+
+    return sum(_image_bytes.values())
@@ -0,0 +1,200 @@
+import abc
+import time
+import pygame
+
+
+class Clock(abc.ABC):
+    """Interface of the clocks that the battery is timed with.
+
+    Tasks and the display functions take a clock object, so that a session
+    can run on the real time clock or on a virtual one. Subclasses must
+    implement now_ns(), sleep(), spin_until() and event_time_us(); a clock
+    missing any of them cannot be instantiated.
+    """
+
+    @abc.abstractmethod
+    def now_ns(self):
+        """Return the current time in nanoseconds."""
+
+    @abc.abstractmethod
+    def sleep(self, seconds):
+        """Suspend the calling thread for a number of seconds.
+
+        Parameters:
+        seconds -- duration of the sleep
+        """
+
+    @abc.abstractmethod
+    def spin_until(self, deadline):
+        """Wait until a deadline, for the sub-millisecond end of a wait.
+
+        Parameters:
+        deadline -- battery clock time in microseconds
+        """
+
+    @abc.abstractmethod
+    def event_time_us(self, event):
+        """Return the time at which a pygame event occurred, in microseconds.
+
+        Parameters:
+        event -- pygame event object
+        """
+
+    def now_us(self):
+        """Return the current time in microseconds."""
+
+        return self.now_ns() // 1000
+
+    def elapsed_ms(self, start, end=None):
+        """Return the time between two clock readings in milliseconds.
+
+        The result keeps microsecond resolution (3 decimal places).
+
+        Parameters:
+        start -- start time in microseconds
+        end -- end time in microseconds. Defaults to the current time
+        """
+
+        if end is None:
+            end = self.now_us()
+
+        return round((end - start) / 1000, 3)
+
+
+class MonotonicClock(Clock):
+    """Real time clock, read from the monotonic high resolution timer.
+
+    The clock uses `perf_counter_ns`, so it is unaffected by changes to the
+    system/wall clock. Its values are only meaningful relative to each other.
+    """
+
+    def now_ns(self):
+        """Return the current time in nanoseconds."""
+
+        return time.perf_counter_ns()
+
+    def sleep(self, seconds):
+        """Suspend the calling thread for a number of seconds.
+
+        Parameters:
+        seconds -- duration of the sleep
+        """
+
+        time.sleep(seconds)
+
+    def spin_until(self, deadline):
+        """Busy wait until a deadline, for the sub-millisecond end of a wait.
+
+        Parameters:
+        deadline -- battery clock time in microseconds
+        """
+
+        while self.now_us() < deadline:
+            pass
+
+    def event_time_us(self, event):
+        """Return the time at which a pygame event occurred, in microseconds.
+
+        Events stamped with a `time_us` attribute when they were first taken
+        off the SDL queue (see display.stamp_input()) keep that time. SDL
+        events also carry a millisecond timestamp on some pygame builds. Where
+        it is available it is mapped onto the battery clock, so that the time
+        reflects when the event happened rather than when the polling loop
+        noticed it. Otherwise the current time is used.
+
+        Parameters:
+        event -- pygame event object
+        """
+
+        stamped = getattr(event, "time_us", None)
+        if stamped is not None:
+            return stamped
+
+        observed = self.now_us()
+
+        timestamp = getattr(event, "timestamp", None)
+        if timestamp is None:
+            return observed
+
+        # SDL timestamps share their base with pygame.time.get_ticks()
+        age = max(pygame.time.get_ticks() - timestamp, 0)
+
+        return observed - age * 1000
+
+
+class VirtualClock(Clock):
+    """Simulated clock that only moves forward when it is told to.
+
+    Sleeping and waiting advance the clock instantly instead of passing real
+    time, so a task runs as fast as it can be drawn while every recorded time
+    stays exactly as it would be in a real session. Used to run the battery
+    headlessly (see utils.simulation).
+
+    Parameters:
+    start_ns -- initial time in nanoseconds
+    """
+
+    def __init__(self, start_ns=0):
+        self.time_ns = start_ns
+
+    def now_ns(self):
+        """Return the current time in nanoseconds."""
+
+        return self.time_ns
+
+    def now_us(self):
+        """Return the current time in microseconds."""
+
+        return self.time_ns // 1000
+
+    def advance(self, ns):
+        """Move the clock forward.
+
+        Parameters:
+        ns -- amount of time in nanoseconds
+        """
+
+        self.time_ns += max(int(ns), 0)
+
+    def sleep(self, seconds):
+        """Advance the clock by a number of seconds.
+
+        Parameters:
+        seconds -- duration of the sleep
+        """
+
+        self.advance(seconds * 1000000000)
+
+    def spin_until(self, deadline):
+        """Advance the clock to a deadline, if it has not passed already.
+
+        Parameters:
+        deadline -- battery clock time in microseconds
+        """
+
+        self.advance(deadline * 1000 - self.time_ns)
+
+    def event_time_us(self, event):
+        """Return the time at which a pygame event occurred, in microseconds.
+
+        Simulated events carry their virtual time in a `time_us` attribute.
+        Otherwise the current time is used.
+
+        Parameters:
+        event -- pygame event object
+        """
+
+        return getattr(event, "time_us", self.time_ns // 1000)
+
+
+# Default clock, used wherever no clock is given
+_clock = MonotonicClock()
+
+
+def get_clock():
+    """Return the default clock of the battery.
+
+    Used by the tasks and display functions that are not given a clock.
+    """
+
+    return _clock
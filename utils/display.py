@@ -1,23 +1,193 @@
 import sys
-import time
 import pygame
 
+from collections import OrderedDict
 from pygame.locals import *
+from utils.clock import get_clock
+from utils.telemetry import TRIAL_COLUMNS
 
+# Longest single sleep inside wait(), so F12 is caught within a frame (ms)
+WAIT_SLICE = 5
 
-def blank_screen(screen, background, duration):
+# Time before the end of a wait where sleeping stops and spinning begins (ms)
+WAIT_SPIN_MARGIN = 2
+
+# Maximum number of rendered text surfaces kept by render_text()
+TEXT_CACHE_SIZE = 256
+
+# Default frame rate cap for interactive render loops (frames per second)
+FRAME_RATE = 60
+
+# Events that participants respond with
+INPUT_EVENTS = (KEYDOWN, MOUSEBUTTONDOWN, MOUSEBUTTONUP)
+
+# Rendered text surfaces, least recently used first
+_text_cache = OrderedDict()
+_text_cache_stats = {"hits": 0, "misses": 0}
+
+# Simulated participant that responds to the tasks instead of a person
+_participant = None
+
+# Frame timing telemetry (utils.telemetry), installed for opt-in logging
+_telemetry = None
+
+
+class FrameCache(object):
+    """Store of pre-composited, full screen frames for static task screens.
+
+    Each frame starts as a copy of the task background, in the display's pixel
+    format, and is drawn once when the task is set up. Showing a frame during a
+    trial is then a single blit and flip.
+
+    Parameters:
+    screen -- pygame screen object used for display
+    background -- pygame background that frames are drawn on top of
+    clock -- battery clock (utils.clock). Defaults to the default clock
+    """
+
+    def __init__(self, screen, background, clock=None):
+        self.screen = screen
+        self.background = background
+        self.clock = get_clock() if clock is None else clock
+        self.frames = {}
+
+    def __contains__(self, key):
+        return key in self.frames
+
+    def add(self, key):
+        """Create a new frame and return its surface to be drawn on.
+
+        Parameters:
+        key -- hashable identifier of the frame (e.g. a tuple of trial levels)
+        """
+
+        frame = self.background.copy()
+        self.frames[key] = frame
+
+        return frame
+
+    def show(self, key):
+        """Display a stored frame and return its onset time in microseconds.
+
+        Parameters:
+        key -- identifier the frame was stored under
+        """
+
+        self.screen.blit(self.frames[key], (0, 0))
+
+        return flip(self.clock)
+
+
+class FrameLimiter(object):
+    """Cap the frame rate of a render loop that redraws continuously.
+
+    Calling tick() once per pass of the loop sleeps until the next frame is
+    due, so the loop does not redraw as fast as the CPU allows. The sleep ends
+    early when a key press or mouse click is queued, so responses are still
+    handled within a few milliseconds. Input that is queued while the loop
+    draws or sleeps is stamped with the time it was seen (see stamp_input()),
+    so response times do not include the rest of the frame. If the loop falls
+    more than a frame behind, the schedule restarts from the current time
+    instead of rendering a burst of frames to catch up.
+
+    Parameters:
+    fps -- maximum number of frames per second
+    clock -- battery clock (utils.clock). Defaults to the default clock
+    """
+
+    # Events that end a tick() early
+    INPUT_EVENTS = INPUT_EVENTS
+
+    def __init__(self, fps=FRAME_RATE, clock=None):
+        self.frame_duration = int(1000000 / fps)
+        self.next_frame = None
+        self.clock = get_clock() if clock is None else clock
+
+    def tick(self):
+        """Wait until the next frame is due, or until an input event arrives."""
+
+        now = self.clock.now_us()
+
+        if _telemetry is not None:
+            _telemetry.expect_frame(self.next_frame, render_loop=True)
+
+        if self.next_frame is None or now - self.next_frame >= self.frame_duration:
+            self.next_frame = now
+
+        # Stamp input that arrived while the frame was drawn
+        stamp_input(self.clock)
+
+        while now < self.next_frame and not pygame.event.peek(self.INPUT_EVENTS):
+            self.clock.sleep(min(self.next_frame - now, WAIT_SLICE * 1000) / 1000000)
+            now = self.clock.now_us()
+
+        stamp_input(self.clock)
+
+        if now >= self.next_frame:
+            self.next_frame += self.frame_duration
+
+
+def blank_screen(screen, background, duration, clock=None):
     """Display a blank screen for a certain duration.
 
     Parameters:
     screen -- pygame screen object used for display
     background -- pygame background that will be displayed
     duration -- duration of the blank screen in milliseconds
+    clock -- battery clock (utils.clock). Defaults to the default clock
+
+    Returns:
+    overshoot -- time in milliseconds by which the wait overran its deadline
     """
 
     screen.blit(background, (0, 0))
+    flip(clock)
+
+    return wait(duration, clock)
+
+
+def flip(clock=None):
+    """Update the full display and return the onset time of the new frame.
+
+    The onset is taken as soon as pygame.display.flip() returns, i.e. after
+    any wait for the vertical retrace, when the frame is actually on screen.
+
+    Parameters:
+    clock -- battery clock (utils.clock). Defaults to the default clock
+
+    Returns:
+    onset -- battery clock time of the frame onset in microseconds
+    """
+
     pygame.display.flip()
 
-    wait(duration)
+    onset = (get_clock() if clock is None else clock).now_us()
+    if _telemetry is not None:
+        _telemetry.record(onset)
+
+    return onset
+
+
+def update(rects, clock=None):
+    """Update only the given regions of the display and return the time.
+
+    Cheaper than flip() when only a small part of the screen has changed.
+
+    Parameters:
+    rects -- list of pygame Rect objects covering the changed regions
+    clock -- battery clock (utils.clock). Defaults to the default clock
+
+    Returns:
+    onset -- battery clock time of the update in microseconds
+    """
+
+    pygame.display.update(rects)
+
+    onset = (get_clock() if clock is None else clock).now_us()
+    if _telemetry is not None:
+        _telemetry.record(onset, "update")
+
+    return onset
 
 
 def image(screen, img, x, y):
@@ -42,6 +212,57 @@ def image(screen, img, x, y):
     screen.blit(img, (x_p, y_p))
 
 
+def render_text(font, text_string, colour=(0, 0, 0)):
+    """Render text to a pygame surface, reusing previously rendered text.
+
+    Rendered surfaces are kept in a least recently used cache keyed by font,
+    string and colour, holding at most TEXT_CACHE_SIZE surfaces. The returned
+    surface is shared, so it should only be blitted and not drawn on.
+
+    Parameters:
+    font -- pygame font object (pygame.font.SysFont(...))
+    text_string -- text string to be rendered
+    colour -- tuple containing (Red, Green, Blue) colour values (0-255) of the
+        text. Defaults to black (0,0,0)
+    """
+
+    key = (font, text_string, tuple(colour))
+
+    try:
+        text_object = _text_cache[key]
+    except KeyError:
+        text_object = font.render(text_string, 1, colour)
+        _text_cache_stats["misses"] += 1
+
+        _text_cache[key] = text_object
+        if len(_text_cache) > TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)  # Drop least recently used
+    else:
+        _text_cache_stats["hits"] += 1
+        _text_cache.move_to_end(key)
+
+    return text_object
+
+
+def text_cache_info():
+    """Return the hit/miss counters and current size of the text cache."""
+
+    return {
+        "hits": _text_cache_stats["hits"],
+        "misses": _text_cache_stats["misses"],
+        "size": len(_text_cache),
+        "max_size": TEXT_CACHE_SIZE,
+    }
+
+
+def clear_text_cache():
+    """Remove all rendered text from the text cache and reset its counters."""
+
+    _text_cache.clear()
+    _text_cache_stats["hits"] = 0
+    _text_cache_stats["misses"] = 0
+
+
 def text(screen, font, text_string, x, y, colour=(0, 0, 0)):
     """Display text on screen.
 
@@ -59,7 +280,7 @@ def text(screen, font, text_string, x, y, colour=(0, 0, 0)):
 
     # Duck typing to check whether we received a string or pygame text surface
     try:
-        text_object = font.render(text_string, 1, colour)  # Assume string
+        text_object = render_text(font, text_string, colour)  # Assume string
     except TypeError:
         text_object = text_string  # Already a pygame surface
 
@@ -90,21 +311,52 @@ def text_space(screen, font, x, y, colour=(0, 0, 0)):
     text(screen, font, "(press space to continue)", x, y, colour=colour)
 
 
-def wait(duration):
+def wait(duration, clock=None):
     """Wait for a certain amount of time before proceeding.
 
+    The wait sleeps in short slices until just before the deadline, so the CPU
+    is left idle, and then spins for the last couple of milliseconds to finish
+    on time. The `Quit` key is checked between every slice. On a virtual
+    clock the sleeps and the spin take no real time.
+
     Parameters:
     duration -- duration of the wait in milliseconds
+    clock -- battery clock (utils.clock). Defaults to the default clock
+
+    Returns:
+    overshoot -- time in milliseconds by which the wait overran its deadline
     """
     pygame.event.clear()  # Clear any events in the queue
 
-    start_time = int(round(time.time() * 1000))
-    while (int(round(time.time() * 1000)) - start_time) < duration:
+    if clock is None:
+        clock = get_clock()
+
+    deadline = clock.now_us() + int(duration * 1000)
+    spin_start = deadline - WAIT_SPIN_MARGIN * 1000
+
+    # The next frame is due when the wait ends
+    if _telemetry is not None:
+        _telemetry.expect_frame(deadline)
+
+    # Sleep until just before the deadline
+    # The real clock uses time.sleep(), a high resolution timer on Python 3.11+
+    while True:
         for event in pygame.event.get():
             # Battery will quit if F12 is pressed while waiting
             if event.type == KEYDOWN and event.key == K_F12:
                 sys.exit(0)
 
+        remaining = spin_start - clock.now_us()
+        if remaining <= 0:
+            break
+
+        clock.sleep(min(remaining, WAIT_SLICE * 1000) / 1000000)
+
+    # Spin for the remainder of the wait
+    clock.spin_until(deadline)
+
+    return clock.elapsed_ms(deadline)
+
 
 def wait_for_space():
     """Wait for a spacebar press.
@@ -116,8 +368,157 @@ def wait_for_space():
 
     waiting = True
     while waiting:
-        for event in pygame.event.get():
+        for event in get_events():
             if event.type == KEYDOWN and event.key == K_SPACE:
                 waiting = False
             elif event.type == KEYDOWN and event.key == K_F12:
                 sys.exit(0)
+
+
+def stamp_input(clock=None):
+    """Stamp queued key presses and mouse clicks with the time they were seen.
+
+    Response loops only read the event queue between frames, so without a
+    stamp a response is timed when the loop gets to it. The input events are
+    taken off the queue, given a `time_us` attribute and put back, so that
+    clock.event_time_us() returns the time they were first seen. Events that
+    already have a time are left as they are.
+
+    SDL only lets the thread that opened the display read the event queue,
+    so input cannot be polled from a separate thread. Instead, loops that
+    spend time drawing or sleeping call this between their steps.
+
+    Parameters:
+    clock -- battery clock (utils.clock). Defaults to the default clock
+    """
+
+    events = pygame.event.get(INPUT_EVENTS)
+    if not events:
+        return
+
+    if clock is None:
+        clock = get_clock()
+
+    for event in events:
+        if getattr(event, "time_us", None) is None:
+            event = pygame.event.Event(
+                event.type, event.dict, time_us=clock.event_time_us(event)
+            )
+        pygame.event.post(event)
+
+
+def set_participant(participant):
+    """Install a simulated participant that responds in place of a person.
+
+    While a participant is installed, get_events() lets it post its key
+    presses and mouse clicks before the event queue is read. Tasks describe
+    the responses they accept with expect_response().
+
+    Parameters:
+    participant -- object with poll() and expect() methods (e.g.
+        utils.simulation.SimulatedParticipant), or None to remove it
+    """
+
+    global _participant
+
+    _participant = participant
+
+
+def get_events():
+    """Return the queued pygame events, as pygame.event.get() does.
+
+    Response loops read events with this function so that a simulated
+    participant, when installed, can respond.
+    """
+
+    if _participant is not None:
+        _participant.poll()
+
+    # The next frame is shown in response to the events, not at a deadline
+    if _telemetry is not None:
+        _telemetry.expect_frame(None)
+
+    return pygame.event.get()
+
+
+def expect_response(options, correct=0, timeout=None):
+    """Describe the responses accepted by the screen that is now shown.
+
+    Has no effect unless a simulated participant is installed, so tasks call
+    it at every stimulus onset regardless.
+
+    Parameters:
+    options -- list of possible responses. Each is a key (e.g. K_LEFT), an
+        (x, y) mouse click position, or a list of those made in sequence
+    correct -- index of the correct option, or None if withholding a
+        response is correct
+    timeout -- time in milliseconds after which responses are no longer
+        accepted. Defaults to no time limit
+    """
+
+    if _participant is not None:
+        _participant.expect(options, correct, timeout)
+
+
+def set_telemetry(telemetry):
+    """Install frame timing telemetry, which logs every display update.
+
+    While telemetry is installed, flip() and update() log each frame, and
+    begin_trial() and end_trial() add the timing of each trial's frames to
+    the task data.
+
+    Parameters:
+    telemetry -- utils.telemetry.FrameTelemetry, or None to remove it
+    """
+
+    global _telemetry
+
+    _telemetry = telemetry
+
+
+def begin_trial(trial):
+    """Mark the following frames as shown for a trial.
+
+    Has no effect unless telemetry is installed.
+
+    Parameters:
+    trial -- hashable trial identifier, e.g. its row number
+    """
+
+    if _telemetry is not None:
+        _telemetry.begin_trial(trial)
+
+
+def end_trial(records, i, trial=None):
+    """Store the frame timing of a finished trial in its data.
+
+    Adds the maxFrameInterval (ms) and droppedFrames columns to the records.
+    Has no effect unless telemetry is installed.
+
+    Parameters:
+    records -- TrialRecords holding the trial
+    i -- trial (row) number within the records
+    trial -- identifier the trial was begun with. Defaults to i
+    """
+
+    if _telemetry is None:
+        return
+
+    max_interval, dropped = _telemetry.end_trial(i if trial is None else trial)
+
+    if "maxFrameInterval" not in records:
+        records["maxFrameInterval"] = float("nan")
+        records["droppedFrames"] = 0
+
+    records.set(i, "maxFrameInterval", max_interval)
+    records.set(i, "droppedFrames", dropped)
+
+
+def timing_columns(records):
+    """Return the frame timing columns that end_trial() added to the data.
+
+    Parameters:
+    records -- TrialRecords, or a DataFrame made from them
+    """
+
+    return [column for column in TRIAL_COLUMNS if column in records]
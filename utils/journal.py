@@ -0,0 +1,194 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+
+# Number of trials written between forced writes to disk (fsync)
+SYNC_INTERVAL = 10
+
+
+def _json_default(value):
+    # NumPy scalars/arrays are not serialisable by the json module
+    if isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, np.ndarray):
+        return value.tolist()
+
+    raise TypeError("Cannot write %r to the journal" % (value,))
+
+
+class TrialJournal(object):
+    """Append-only, crash-safe log of a testing session.
+
+    Each entry is one line of JSON. Entries are flushed to the operating
+    system as soon as they are written, so quitting or crashing mid-task
+    loses nothing, and forced to disk (fsync) every SYNC_INTERVAL trials and
+    at the end of every task. The session data is saved from the journal
+    afterwards, with read_journal() and a storage backend.
+
+    With a BackgroundWriter (utils.writer), entries are serialised and
+    written on the writer's thread, so logging a trial or a whole task's data
+    does not hold up the display. close() waits until everything is written.
+
+    Parameters:
+    path -- path to the journal file. An existing file is appended to
+    sync_interval -- number of trials between forced writes to disk
+    writer -- BackgroundWriter to write the entries on. Defaults to writing
+        them in the calling thread
+    """
+
+    def __init__(self, path, sync_interval=SYNC_INTERVAL, writer=None):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.writer = writer
+        self.task = None
+        self.unsynced = 0
+
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _call(self, function, *args):
+        # Run a file operation on the writer thread, if there is one
+        if self.writer is None:
+            function(*args)
+        else:
+            self.writer.submit(function, *args)
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry, default=_json_default) + "\n")
+        self.file.flush()
+
+    def _write_frame(self, name, frame):
+        for row in frame.to_dict("records"):
+            self._write({"type": "result", "task": name, "data": row})
+
+        self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        if not self.file.closed:
+            self._sync()
+            self.file.close()
+
+    def write(self, entry):
+        """Append a single entry to the journal.
+
+        Parameters:
+        entry -- dictionary of JSON serialisable values
+        """
+
+        self._call(self._write, entry)
+
+    def begin_task(self, task):
+        """Mark the start of a task. Following trials are logged under it.
+
+        Parameters:
+        task -- name of the task, used as its sheet name when exporting
+        """
+
+        self.task = task
+        self.write({"type": "task", "task": task})
+
+    def write_trial(self, records, i, phase="main"):
+        """Log a finished trial of the current task.
+
+        Parameters:
+        records -- TrialRecords holding the trial
+        i -- trial (row) number within the records
+        phase -- "practice" or "main"
+        """
+
+        self.write(
+            {
+                "type": "trial",
+                "task": self.task,
+                "phase": phase,
+                "data": records.row(i),
+            }
+        )
+
+        self.unsynced += 1
+        if self.unsynced >= self.sync_interval:
+            self.sync()
+
+    def write_frame(self, name, frame):
+        """Log a complete table, e.g. subject info or the final task data.
+
+        With a writer the table is written later, so it should not be
+        changed afterwards.
+
+        Parameters:
+        name -- name of the table, used as its sheet name when exporting
+        frame -- pandas DataFrame
+        """
+
+        self._call(self._write_frame, name, frame)
+        self.unsynced = 0
+
+    def sync(self):
+        """Force all logged entries to be written to disk."""
+
+        self._call(self._sync)
+        self.unsynced = 0
+
+    def close(self):
+        """Write any remaining entries to disk and close the journal.
+
+        With a writer, waits until every entry has been written.
+        """
+
+        if self.file.closed:
+            return
+
+        self._call(self._close)
+
+        if self.writer is not None:
+            self.writer.flush()
+
+
+def read_journal(path):
+    """Read a session journal back into tables.
+
+    Completed tasks are read from their final data. Tasks that were quit or
+    crashed before finishing are read from their individual trials, so no
+    recorded trial is lost.
+
+    Parameters:
+    path -- path to the journal file
+
+    Returns:
+    tables -- ordered dictionary of DataFrames, keyed by sheet name
+    """
+
+    tasks = OrderedDict()
+    results = {}
+    trials = {}
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line, object_pairs_hook=OrderedDict)
+            except ValueError:
+                # Partially written final line after a crash
+                continue
+
+            tasks[entry["task"]] = None
+
+            if entry["type"] == "result":
+                results.setdefault(entry["task"], []).append(entry["data"])
+            elif entry["type"] == "trial":
+                row = OrderedDict([("phase", entry["phase"])])
+                row.update(entry["data"])
+                trials.setdefault(entry["task"], []).append(row)
+
+    tables = OrderedDict()
+    for task in tasks:
+        rows = results.get(task, trials.get(task))
+        if rows:
+            tables[task] = pd.DataFrame(rows, columns=list(rows[0]))
+
+    return tables
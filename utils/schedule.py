@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+
+def create_rng(seed=None):
+    """Return a NumPy random generator for building trial schedules.
+
+    Parameters:
+    seed -- seed for the generator, so a schedule can be reproduced. Defaults
+        to fresh entropy from the operating system
+    """
+
+    return np.random.default_rng(seed)
+
+
+def shuffled_blocks(rng, num_conditions, repeats, num_blocks=1):
+    """Return the condition order of every block, each shuffled separately.
+
+    Parameters:
+    rng -- NumPy random generator
+    num_conditions -- number of condition combinations
+    repeats -- number of times each condition appears in a block
+    num_blocks -- number of blocks
+
+    Returns:
+    order -- integer array of condition indices, one row per block
+    """
+
+    conditions = np.tile(np.arange(num_conditions), repeats)
+    keys = rng.random((num_blocks, conditions.size))
+
+    return conditions[np.argsort(keys, axis=1)]
+
+
+def permutations(rng, population, num_rows):
+    """Return independent random orderings of a population.
+
+    Taking the first n items of a row gives a sample of n items drawn without
+    replacement.
+
+    Parameters:
+    rng -- NumPy random generator
+    population -- sequence of items to order
+    num_rows -- number of orderings
+
+    Returns:
+    rows -- array with one shuffled copy of the population per row
+    """
+
+    population = np.asarray(population)
+    keys = rng.random((num_rows, population.size))
+
+    return population[np.argsort(keys, axis=1)]
+
+
+def join_prefixes(rows, lengths):
+    """Join the first items of each row into a string.
+
+    Parameters:
+    rows -- 2D array of items
+    lengths -- number of items to take from each row
+    """
+
+    rows = rows.astype(str)
+
+    return ["".join(row[:length]) for row, length in zip(rows, lengths)]
+
+
+def sternberg_trials(rng, combinations, repeats, num_blocks, stim_set):
+    """Return the trials of one or more Sternberg task blocks.
+
+    Parameters:
+    rng -- NumPy random generator
+    combinations -- list of (set size, probe type) conditions
+    repeats -- number of times each condition appears in a block
+    num_blocks -- number of blocks
+    stim_set -- digits that sets and probes are drawn from
+
+    Returns:
+    trials -- DataFrame with block (starting from 0), setSize, probeType, set
+        and probe columns, with the blocks one after the other
+    """
+
+    order = shuffled_blocks(rng, len(combinations), repeats, num_blocks)
+    blocks = np.repeat(np.arange(num_blocks), order.shape[1])
+    order = order.ravel()
+
+    set_sizes = np.array([c[0] for c in combinations])[order]
+    probe_types = np.array([c[1] for c in combinations])[order]
+
+    # The first setSize digits of each row are the set, the rest are unused
+    digits = permutations(rng, stim_set, order.size)
+
+    # Probe is from the set when present, and from the unused digits when absent
+    present = probe_types == "present"
+    low = np.where(present, 0, set_sizes)
+    high = np.where(present, set_sizes, digits.shape[1])
+    probes = digits[np.arange(order.size), rng.integers(low, high)]
+
+    return pd.DataFrame(
+        {
+            "block": blocks,
+            "setSize": set_sizes,
+            "probeType": probe_types,
+            "set": join_prefixes(digits, set_sizes),
+            "probe": probes.astype(str),
+        }
+    )
+
+
+def digit_sequences(rng, numbers, lengths):
+    """Return one digit sequence per trial, with no repeated digits.
+
+    Parameters:
+    rng -- NumPy random generator
+    numbers -- digits the sequences are drawn from
+    lengths -- length of the sequence of each trial
+    """
+
+    return join_prefixes(permutations(rng, numbers, len(lengths)), lengths)
+
+
+def sart_trials(rng, numbers, repeats, sizes):
+    """Return the stimuli and stimulus sizes of the SART trials.
+
+    Parameters:
+    rng -- NumPy random generator
+    numbers -- digits that are shown
+    repeats -- number of times each digit is shown
+    sizes -- font sizes that each stimulus is randomly shown in
+
+    Returns:
+    stimuli -- array of digits in presentation order
+    stim_sizes -- array of font sizes, one per trial
+    """
+
+    stimuli = rng.permutation(np.tile(numbers, repeats))
+    stim_sizes = np.asarray(sizes)[rng.integers(0, len(sizes), stimuli.size)]
+
+    return stimuli, stim_sizes
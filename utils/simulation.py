@@ -0,0 +1,326 @@
+import os
+import pygame
+
+from collections import OrderedDict
+from pygame.locals import *
+from utils import display, schedule
+from utils.clock import VirtualClock
+
+# Tasks that can be simulated, keyed by the name their data is saved under
+TASK_NAMES = [
+    "ANT",
+    "Digit span (backwards)",
+    "Eriksen Flanker",
+    "MRT",
+    "Ravens Matrices",
+    "Sternberg",
+    "SART",
+]
+
+# Tasks that take a seed for their trial schedule
+SEEDED_TASKS = ["ANT", "Digit span (backwards)", "Eriksen Flanker", "SART", "Sternberg"]
+
+# Screen size the battery was designed for
+RESOLUTION = (1280, 1024)
+
+
+def ex_gaussian(mu=400, sigma=50, tau=150, minimum=150):
+    """Return a reaction time distribution for SimulatedParticipant.
+
+    Reaction times follow an ex-Gaussian distribution (the sum of a normal
+    and an exponential variable), which fits the long right tail of human
+    reaction times.
+
+    Parameters:
+    mu -- mean of the normal component in milliseconds
+    sigma -- standard deviation of the normal component in milliseconds
+    tau -- mean of the exponential component in milliseconds
+    minimum -- shortest reaction time in milliseconds
+
+    Returns:
+    rt -- function that takes a NumPy random generator and returns a reaction
+        time in milliseconds
+    """
+
+    def rt(rng):
+        return max(rng.normal(mu, sigma) + rng.exponential(tau), minimum)
+
+    return rt
+
+
+def _events(response, time_us):
+    # pygame events of a key press or left mouse click, at a virtual time
+    if isinstance(response, tuple):
+        return [
+            pygame.event.Event(event_type, pos=response, button=1, time_us=time_us)
+            for event_type in (MOUSEBUTTONDOWN, MOUSEBUTTONUP)
+        ]
+
+    return [pygame.event.Event(KEYDOWN, key=response, mod=0, time_us=time_us)]
+
+
+class SimulatedParticipant(object):
+    """Synthetic participant that responds to the tasks through the event queue.
+
+    Tasks describe the responses each screen accepts with
+    display.expect_response(). The participant picks the correct response
+    with a given probability, otherwise another option (or no response, when
+    there is no other option and the screen times out), and posts the key
+    presses or mouse clicks after a random reaction time. Screens that expect
+    nothing in particular, such as instructions, are continued with the
+    spacebar.
+
+    The participant keeps the time of a virtual clock, which the tasks it
+    responds to are given. Every poll advances the clock to the next
+    response, so a whole session takes a few seconds.
+
+    Parameters:
+    seed -- seed for the random responses. Defaults to fresh entropy
+    rt -- reaction time distribution, a function taking a NumPy random
+        generator and returning milliseconds. Defaults to ex_gaussian()
+    accuracy -- probability of giving the correct response
+    key_interval -- time between the key presses or clicks of a response
+        made up of several, in milliseconds
+    continue_delay -- time before continuing a screen that expects no
+        particular response, in milliseconds
+    poll_interval -- amount of virtual time that passes between polls of
+        the event queue, in milliseconds
+    clock -- clock the responses are timed on. Defaults to a new
+        utils.clock.VirtualClock. Polls only advance clocks with an
+        advance() method, so a real time clock can be used too
+    """
+
+    def __init__(
+        self,
+        seed=None,
+        rt=None,
+        accuracy=0.95,
+        key_interval=250,
+        continue_delay=1000,
+        poll_interval=1,
+        clock=None,
+    ):
+        self.clock = VirtualClock() if clock is None else clock
+        self.rng = schedule.create_rng(seed)
+        self.rt = ex_gaussian() if rt is None else rt
+        self.accuracy = accuracy
+        self.key_interval = key_interval
+        self.continue_delay = continue_delay
+        self.poll_interval = poll_interval
+
+        # (time, response) pairs to post, in time order
+        self.pending = []
+        # Time until which the current screen is responded to, after which
+        # the participant continues with the spacebar
+        self.expect_until = None
+
+    def choose(self, options, correct, timeout):
+        """Return the option responded with, or None to withhold a response.
+
+        Parameters:
+        options -- list of possible responses
+        correct -- index of the correct option, or None if withholding a
+            response is correct
+        timeout -- time limit of the response in milliseconds, or None
+        """
+
+        if self.rng.random() < self.accuracy:
+            return None if correct is None else options[correct]
+
+        others = [option for i, option in enumerate(options) if i != correct]
+        if others:
+            return others[self.rng.integers(len(others))]
+        elif timeout is not None:
+            return None
+
+        # A response is required to continue, so give the only one there is
+        return options[correct]
+
+    def expect(self, options, correct=0, timeout=None):
+        """Respond to a new screen (see display.expect_response()).
+
+        Parameters:
+        options -- list of possible responses
+        correct -- index of the correct option, or None if withholding a
+            response is correct
+        timeout -- time limit of the response in milliseconds, or None
+        """
+
+        onset = self.clock.now_us()
+        self.pending = []
+        self.expect_until = None if timeout is None else onset + timeout * 1000
+
+        option = self.choose(options, correct, timeout)
+        rt = self.rt(self.rng)
+        if option is None or (timeout is not None and rt >= timeout):
+            if timeout is None:
+                # Withheld without a time limit, so nothing more is posted
+                self.expect_until = float("inf")
+            return
+
+        if not isinstance(option, list):
+            option = [option]
+
+        for i, response in enumerate(option):
+            time_us = onset + int((rt + i * self.key_interval) * 1000)
+            self.pending.append((time_us, response))
+
+        # The screen is done with once the response has been made
+        self.expect_until = self.pending[-1][0]
+
+    def poll(self):
+        """Advance the virtual clock and post the responses that are due.
+
+        Called by display.get_events() before the event queue is read.
+        """
+
+        now = self.clock.now_us()
+
+        if not self.pending and (self.expect_until is None or now >= self.expect_until):
+            # Nothing is expected, so continue with the spacebar
+            self.pending.append((now + self.continue_delay * 1000, K_SPACE))
+            self.expect_until = self.pending[-1][0]
+
+        # Only a virtual clock is moved on, stopping at the next response
+        advance = getattr(self.clock, "advance", None)
+        if advance is not None:
+            step = self.poll_interval * 1000
+            if self.pending:
+                step = min(step, max(self.pending[0][0] - now, 0))
+            advance(step * 1000)
+            now = self.clock.now_us()
+
+        while self.pending and self.pending[0][0] <= now:
+            time_us, response = self.pending.pop(0)
+            self.post(response, time_us)
+
+    def post(self, response, time_us):
+        """Post the events of a single key press or mouse click.
+
+        Parameters:
+        response -- key, or (x, y) mouse click position
+        time_us -- virtual time of the response in microseconds
+        """
+
+        for event in _events(response, time_us):
+            pygame.event.post(event)
+
+
+def open_screen(resolution=RESOLUTION):
+    """Initialise pygame headlessly and return the screen and background.
+
+    SDL's dummy video and audio drivers are used unless other drivers are
+    set in the SDL_VIDEODRIVER and SDL_AUDIODRIVER environment variables.
+
+    Parameters:
+    resolution -- (width, height) of the virtual screen
+    """
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    pygame.init()
+    screen = pygame.display.set_mode(resolution)
+
+    return screen, pygame.Surface(screen.get_size()).convert()
+
+
+def create_task(
+    name, screen, background, seed=None, journal=None, clock=None, **options
+):
+    """Create a task object, as the battery does.
+
+    Parameters:
+    name -- task name from TASK_NAMES
+    screen -- pygame screen object used for display
+    background -- pygame background surface
+    seed -- seed for the trial schedule, for the tasks that take one
+    journal -- TrialJournal to log the trials to
+    clock -- clock the task is timed with
+    options -- extra keyword arguments for the task class
+    """
+
+    # Import the tasks when needed, so the module loads without them
+    from tasks import ant, digitspan_backwards, flanker, mrt, ravens, sart, sternberg
+
+    task_classes = {
+        "ANT": ant.ANT,
+        "Digit span (backwards)": digitspan_backwards.DigitspanBackwards,
+        "Eriksen Flanker": flanker.Flanker,
+        "MRT": mrt.MRT,
+        "Ravens Matrices": ravens.Ravens,
+        "Sternberg": sternberg.Sternberg,
+        "SART": sart.SART,
+    }
+
+    if name in SEEDED_TASKS:
+        options.setdefault("seed", seed)
+
+    return task_classes[name](
+        screen, background, journal=journal, clock=clock, **options
+    )
+
+
+def run_tasks(
+    tasks=None,
+    participant=None,
+    seed=None,
+    task_options=None,
+    journal=None,
+    resolution=RESOLUTION,
+):
+    """Run tasks headlessly, with a simulated participant and virtual time.
+
+    The screen is opened with open_screen(). The tasks are timed with the
+    participant's clock, so on a virtual clock the waits and reaction times
+    take no real time while the recorded times are those of a real session.
+
+    Parameters:
+    tasks -- list of task names from TASK_NAMES. Defaults to every task
+    participant -- SimulatedParticipant. Defaults to one with default
+        settings and the given seed
+    seed -- seed for the trial schedules of the tasks that take one
+    task_options -- dictionary of extra keyword arguments for each task
+        class, keyed by task name (e.g. {"ANT": {"blocks": 1}})
+    journal -- TrialJournal to log the trials and task data to
+    resolution -- (width, height) of the virtual screen
+
+    Returns:
+    data -- ordered dictionary of the task DataFrames, keyed by task name
+    """
+
+    if tasks is None:
+        tasks = TASK_NAMES
+    if participant is None:
+        participant = SimulatedParticipant(seed)
+    if task_options is None:
+        task_options = {}
+
+    screen, background = open_screen(resolution)
+
+    display.set_participant(participant)
+
+    data = OrderedDict()
+    try:
+        for name in tasks:
+            if journal is not None:
+                journal.begin_task(name)
+
+            task = create_task(
+                name,
+                screen,
+                background,
+                seed,
+                journal,
+                participant.clock,
+                **task_options.get(name, {})
+            )
+            data[name] = task.run()
+
+            if journal is not None:
+                journal.write_frame(name, data[name])
+    finally:
+        display.set_participant(None)
+        pygame.quit()
+
+    return data
@@ -0,0 +1,322 @@
+import os
+import importlib.util
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from utils import journal
+
+# Name of the table holding the subject information
+INFO_TABLE = "info"
+
+# Columns kept as text, e.g. subject numbers with leading zeros
+TEXT_COLUMNS = ["sub_num"]
+
+# Values the tasks record for missing data, e.g. "NA" for an unanswered item
+MISSING_VALUES = ["", "NA"]
+
+
+def _typed(frame):
+    """Return a copy of a table with a single type per column.
+
+    Columns are stored as objects while a task runs (e.g. "" or "NA" until a
+    value is recorded), and some tasks record numbers as strings. Columnar
+    formats need one type per column, so object and string columns holding
+    numbers become numeric, with the missing values as NaN, as when reading
+    an Excel file. Other columns, and the TEXT_COLUMNS, become strings.
+
+    Parameters:
+    frame -- pandas DataFrame
+    """
+
+    frame = frame.copy()
+    for column in frame.columns:
+        if not pd.api.types.is_string_dtype(frame[column].dtype):
+            continue
+
+        if column in TEXT_COLUMNS:
+            frame[column] = frame[column].astype(str)
+            continue
+
+        try:
+            frame[column] = pd.to_numeric(frame[column].replace(MISSING_VALUES, np.nan))
+        except (ValueError, TypeError):
+            frame[column] = frame[column].astype(str)
+
+    return frame
+
+
+class ExcelStorage(object):
+    """Save each session as an Excel file, with one sheet per table."""
+
+    name = "excel"
+    extension = ".xls"
+
+    def path(self, directory, session):
+        """Return the path a session is saved to.
+
+        Parameters:
+        directory -- directory the file is saved in
+        session -- session file name, without the extension
+        """
+
+        return os.path.join(directory, session + self.extension)
+
+    def save(self, tables, directory, session):
+        """Save the tables of a session and return the path written to.
+
+        Parameters:
+        tables -- ordered dictionary of DataFrames, keyed by sheet name
+        directory -- directory to save the file in
+        session -- session file name, without the extension
+        """
+
+        path = self.path(directory, session)
+
+        with pd.ExcelWriter(path) as writer:
+            for name, table in tables.items():
+                table.to_excel(writer, sheet_name=name, index=False)
+
+        return path
+
+    def table_names(self, path):
+        """Return the names of the tables in a saved session.
+
+        Parameters:
+        path -- path to the session file
+        """
+
+        with pd.ExcelFile(path) as workbook:
+            return workbook.sheet_names
+
+    def load(self, path, tables=None):
+        """Load the tables of a saved session.
+
+        The workbook is opened once and only the requested sheets are parsed.
+
+        Parameters:
+        path -- path to the session file
+        tables -- list of table names to load. Defaults to every table.
+            Tables that are not in the session are skipped
+        """
+
+        loaded = OrderedDict()
+        with pd.ExcelFile(path) as workbook:
+            if tables is None:
+                tables = workbook.sheet_names
+
+            for name in tables:
+                if name in workbook.sheet_names:
+                    loaded[name] = workbook.parse(name, converters={"sub_num": str})
+
+        return loaded
+
+
+class ColumnarStorage(object):
+    """Save each session as a directory with one typed file per table.
+
+    Parquet and Feather (Arrow IPC) files keep their column types and load
+    much faster than Excel. Both require the optional pyarrow package.
+
+    Parameters:
+    name -- file format, "parquet" or "feather"
+    """
+
+    def __init__(self, name):
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError(
+                "Saving data as %s requires pyarrow (pip install pyarrow)" % name
+            )
+
+        self.name = name
+        self.extension = "." + name
+
+    def path(self, directory, session):
+        """Return the path a session is saved to.
+
+        Parameters:
+        directory -- directory the session directory is created in
+        session -- name of the session directory
+        """
+
+        return os.path.join(directory, session)
+
+    def save(self, tables, directory, session):
+        """Save the tables of a session and return the path written to.
+
+        Parameters:
+        tables -- ordered dictionary of DataFrames, keyed by table name
+        directory -- directory to create the session directory in
+        session -- name of the session directory
+        """
+
+        path = self.path(directory, session)
+        os.makedirs(path, exist_ok=True)
+
+        for name, table in tables.items():
+            table_path = os.path.join(path, name + self.extension)
+            table = _typed(table).reset_index(drop=True)
+
+            if self.name == "parquet":
+                table.to_parquet(table_path, index=False)
+            else:
+                table.to_feather(table_path)
+
+        return path
+
+    def table_names(self, path):
+        """Return the names of the tables in a saved session.
+
+        Parameters:
+        path -- path to the session directory
+        """
+
+        tables = sorted(
+            os.path.splitext(f)[0]
+            for f in os.listdir(path)
+            if f.endswith(self.extension)
+        )
+
+        # Subject information first, as in the Excel files
+        if INFO_TABLE in tables:
+            tables.remove(INFO_TABLE)
+            tables.insert(0, INFO_TABLE)
+
+        return tables
+
+    def load(self, path, tables=None):
+        """Load the tables of a saved session.
+
+        Parameters:
+        path -- path to the session directory
+        tables -- list of table names to load. Defaults to every table.
+            Tables that are not in the session are skipped
+        """
+
+        if tables is None:
+            tables = self.table_names(path)
+
+        loaded = OrderedDict()
+        for name in tables:
+            table_path = os.path.join(path, name + self.extension)
+            if not os.path.exists(table_path):
+                continue
+
+            if self.name == "parquet":
+                loaded[name] = pd.read_parquet(table_path)
+            else:
+                loaded[name] = pd.read_feather(table_path)
+
+        return loaded
+
+
+class JournalStorage(object):
+    """Read sessions from their journal, for sessions that were never saved.
+
+    A journal is left without data files when saving them failed, or when the
+    battery was killed before it could save them. Journals can be read like
+    saved sessions, but not saved to. The tables are typed as when saving
+    them in a columnar format, so e.g. "NA" values are read as NaN.
+    """
+
+    name = "journal"
+    extension = ".jsonl"
+
+    def table_names(self, path):
+        """Return the names of the tables in a session journal.
+
+        Parameters:
+        path -- path to the journal file
+        """
+
+        return list(journal.read_journal(path))
+
+    def load(self, path, tables=None):
+        """Load the tables of a session journal.
+
+        Parameters:
+        path -- path to the journal file
+        tables -- list of table names to load. Defaults to every table.
+            Tables that are not in the session are skipped
+        """
+
+        session_tables = journal.read_journal(path)
+        if tables is None:
+            tables = session_tables
+
+        return OrderedDict(
+            (name, _typed(session_tables[name]))
+            for name in tables
+            if name in session_tables
+        )
+
+
+def get_storage(name):
+    """Return the storage backend for a data format.
+
+    Parameters:
+    name -- "excel", "parquet" or "feather"
+    """
+
+    if name == "excel":
+        return ExcelStorage()
+    elif name in ("parquet", "feather"):
+        return ColumnarStorage(name)
+
+    raise ValueError("Unknown data format: %s" % name)
+
+
+def find_sessions(directory):
+    """Return the saved sessions in a data directory, in name order.
+
+    A session saved in a columnar format as well as in Excel is only returned
+    once, in the columnar format. Sessions whose data files were never saved
+    are read from their journal.
+
+    Parameters:
+    directory -- data directory
+
+    Returns:
+    sessions -- list of (path, storage) pairs
+    """
+
+    sessions = {}
+    for f in os.listdir(directory):
+        path = os.path.join(directory, f)
+
+        if os.path.isdir(path):
+            files = os.listdir(path)
+            for name in ("parquet", "feather"):
+                if any(x.endswith("." + name) for x in files):
+                    sessions[f] = (path, get_storage(name))
+                    break
+        elif f.endswith(ExcelStorage.extension):
+            session = f[: -len(ExcelStorage.extension)]
+            sessions.setdefault(session, (path, ExcelStorage()))
+
+    for f in os.listdir(directory):
+        if f.endswith(JournalStorage.extension):
+            session = f[: -len(JournalStorage.extension)]
+            sessions.setdefault(session, (os.path.join(directory, f), JournalStorage()))
+
+    return [sessions[session] for session in sorted(sessions)]
+
+
+def save_session(journal_file, session_storage, directory, session):
+    """Save the data files of a session from its journal.
+
+    Parameters:
+    journal_file -- path to the session journal
+    session_storage -- list of storage backends to save the session with
+    directory -- directory to save the files in
+    session -- session file name, without the extension
+
+    Returns:
+    paths -- list of the paths written to, one per backend
+    """
+
+    session_tables = journal.read_journal(journal_file)
+
+    return [
+        backend.save(session_tables, directory, session) for backend in session_storage
+    ]
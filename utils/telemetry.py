@@ -0,0 +1,198 @@
+import os
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+
+# Name of the session table holding the frame timing report
+TIMING_TABLE = "frameTiming"
+
+# Per-trial columns added to the task data while telemetry is installed
+TRIAL_COLUMNS = ["maxFrameInterval", "droppedFrames"]
+
+# Columns of the per-frame log
+LOG_COLUMNS = ["task", "trial", "kind", "time", "interval", "lateness", "dropped"]
+
+
+class FrameTelemetry(object):
+    """Opt-in log of every display update, flagging dropped frames.
+
+    Once installed with display.set_telemetry(), every display.flip() and
+    display.update() is logged with its onset time and the interval since the
+    previous frame. A frame is judged against a deadline: the end of the
+    display.wait() before it, or the time a FrameLimiter scheduled it for.
+    With vertical sync a frame is shown at most one refresh period after its
+    deadline, so every further refresh period it is late by counts as a
+    dropped frame. Frames without a deadline, e.g. those shown in response to
+    a key press, are logged but not judged.
+
+    Parameters:
+    refresh_rate -- nominal refresh rate of the monitor in Hz
+    """
+
+    def __init__(self, refresh_rate=60):
+        self.refresh_rate = refresh_rate
+        self.refresh_us = 1000000 / refresh_rate
+
+        # Time by which the next frame should be shown (us), or None
+        self.deadline = None
+        # Whether the deadline was set by a render loop (FrameLimiter)
+        self.render_loop = False
+        # Trial that frames are shown for, or None between trials
+        self.trial = None
+
+        self.last_onset = None
+        self.last_trial = None
+        self.last_render_loop = False
+
+        # Frames of the current task, one list per log column
+        self.log = OrderedDict((name, []) for name in LOG_COLUMNS)
+        # [longest interval (us), dropped frames] of each unfinished trial
+        self.trials = {}
+
+    def expect_frame(self, deadline, render_loop=False):
+        """Set the deadline of the next frame.
+
+        Parameters:
+        deadline -- battery clock time in microseconds, or None if the next
+            frame has no deadline
+        render_loop -- True if the deadline was scheduled by a render loop.
+            The first frame of a loop is not judged, as the loop's schedule
+            may be left over from an earlier screen
+        """
+
+        self.deadline = deadline
+        self.render_loop = render_loop
+
+    def record(self, onset, kind="flip"):
+        """Log a frame.
+
+        Parameters:
+        onset -- battery clock time of the frame onset in microseconds
+        kind -- "flip" for a full screen update, "update" for a partial one
+        """
+
+        interval = np.nan if self.last_onset is None else onset - self.last_onset
+
+        # Frames of a render loop are judged from its second frame on
+        lateness = np.nan
+        dropped = 0
+        if self.deadline is not None and (
+            self.last_render_loop or not self.render_loop
+        ):
+            lateness = onset - self.deadline
+            dropped = max(int(lateness // self.refresh_us), 0)
+
+        render_loop = self.render_loop
+        self.deadline = None
+        self.render_loop = False
+
+        if self.trial is not None:
+            summary = self.trials.setdefault(self.trial, [np.nan, 0])
+            # The interval from a frame of another trial is not the trial's
+            if self.last_trial == self.trial:
+                summary[0] = np.fmax(summary[0], interval)
+            summary[1] += dropped
+
+        for name, value in zip(
+            LOG_COLUMNS, (None, self.trial, kind, onset, interval, lateness, dropped)
+        ):
+            self.log[name].append(value)
+
+        self.last_onset = onset
+        self.last_trial = self.trial
+        self.last_render_loop = render_loop
+
+    def begin_trial(self, trial):
+        """Mark the following frames as shown for a trial.
+
+        Parameters:
+        trial -- hashable trial identifier, e.g. its row number
+        """
+
+        self.trial = trial
+
+    def end_trial(self, trial):
+        """Stop marking frames, and return the timing of a trial's frames.
+
+        Parameters:
+        trial -- identifier the trial was begun with
+
+        Returns:
+        max_interval -- longest interval between two frames of the trial in
+            milliseconds, or NaN if the trial had fewer than two frames
+        dropped -- number of frames the trial dropped
+        """
+
+        self.trial = None
+        max_interval, dropped = self.trials.pop(trial, (np.nan, 0))
+
+        return round(max_interval / 1000, 3), dropped
+
+    def to_frame(self):
+        """Return the log of the current task's frames as a DataFrame.
+
+        Times, intervals and lateness are in milliseconds.
+        """
+
+        frames = pd.DataFrame(self.log, columns=LOG_COLUMNS)
+        for name in ("time", "interval", "lateness"):
+            frames[name] = (frames[name].astype(float) / 1000).round(3)
+
+        return frames
+
+    def end_task(self, task, log_path=None):
+        """Finish logging a task and return its timing report.
+
+        The task's frames are appended to a CSV file, if one is given, and
+        removed from memory.
+
+        Parameters:
+        task -- name of the task the frames were shown for
+        log_path -- path of the per-frame CSV log
+
+        Returns:
+        report -- one row DataFrame summarising the task's frame timing
+        """
+
+        self.log["task"] = [task] * len(self.log["task"])
+        frames = self.to_frame()
+
+        if log_path is not None:
+            frames.to_csv(
+                log_path,
+                mode="a",
+                header=not os.path.exists(log_path),
+                index=False,
+            )
+
+        judged = frames["lateness"].notna()
+        late = frames["dropped"] > 0
+
+        report = pd.DataFrame(
+            [
+                (
+                    task,
+                    self.refresh_rate,
+                    len(frames),
+                    int(judged.sum()),
+                    int(late.sum()),
+                    int(frames["dropped"].sum()),
+                    frames["lateness"].max(),
+                )
+            ],
+            columns=[
+                "task",
+                "refreshRate",
+                "frames",
+                "timedFrames",
+                "lateFrames",
+                "droppedFrames",
+                "maxLateness",
+            ],
+        )
+
+        for name in LOG_COLUMNS:
+            self.log[name] = []
+
+        return report
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+
+
+class TrialRecords(object):
+    """Preallocated, column-oriented store of per-trial data.
+
+    Each column is a NumPy array with one element per trial, allocated up
+    front, so recording a result during a trial is a single array assignment
+    and never grows the table. Reading a column returns its array, so
+    `records["RT"][i]` works as it does for a DataFrame. The records are
+    converted to a DataFrame once, with to_frame(), at the end of a block.
+
+    Parameters:
+    num_trials -- number of trials (rows)
+    columns -- list of (name, default) pairs for the result columns. The type
+        of the default sets the column type: floats (e.g. NaN) give a float
+        column, ints an int column and anything else an object column
+    """
+
+    __slots__ = ("num_trials", "columns")
+
+    def __init__(self, num_trials, columns=()):
+        self.num_trials = num_trials
+        self.columns = OrderedDict()
+
+        for name, default in columns:
+            self[name] = default
+
+    @classmethod
+    def from_frame(cls, frame, columns=()):
+        """Create records from a DataFrame of trial conditions.
+
+        Parameters:
+        frame -- DataFrame with one row per trial
+        columns -- list of (name, default) pairs for the result columns
+        """
+
+        records = cls(frame.shape[0])
+        for name in frame.columns:
+            records[name] = frame[name].to_numpy()
+
+        for name, default in columns:
+            records[name] = default
+
+        return records
+
+    def __len__(self):
+        return self.num_trials
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __setitem__(self, column, values):
+        """Set a whole column, adding it if it does not exist.
+
+        Parameters:
+        column -- column name
+        values -- sequence with one value per trial, or a single value that
+            is used for every trial
+        """
+
+        if np.ndim(values) == 0:
+            if isinstance(values, (int, np.integer)):
+                dtype = np.int64
+            elif isinstance(values, (float, np.floating)):
+                dtype = np.float64
+            else:
+                dtype = object
+
+            array = np.empty(self.num_trials, dtype=dtype)
+            array.fill(values)
+        else:
+            array = np.asarray(values)
+            if array.shape != (self.num_trials,):
+                raise ValueError(
+                    "Column %s has %d values, expected %d"
+                    % (column, len(array), self.num_trials)
+                )
+
+        self.columns[column] = array
+
+    def set(self, i, column, value):
+        """Store the value of one column for one trial.
+
+        Parameters:
+        i -- trial (row) number, starting from 0
+        column -- name of an existing column
+        value -- value to store
+        """
+
+        self.columns[column][i] = value
+
+    def get(self, i, column):
+        """Return the value of one column for one trial.
+
+        Parameters:
+        i -- trial (row) number, starting from 0
+        column -- column name
+        """
+
+        return self.columns[column][i]
+
+    def row(self, i):
+        """Return the values of every column for one trial.
+
+        Parameters:
+        i -- trial (row) number, starting from 0
+
+        Returns:
+        row -- ordered dictionary of values, keyed by column name
+        """
+
+        return OrderedDict((name, values[i]) for name, values in self.columns.items())
+
+    def to_frame(self, columns=None):
+        """Return the records as a DataFrame.
+
+        Parameters:
+        columns -- list of column names, in output order. Defaults to all
+            columns in the order they were added
+        """
+
+        if columns is None:
+            columns = list(self.columns)
+
+        return pd.DataFrame(
+            OrderedDict((name, self.columns[name]) for name in columns),
+            columns=columns,
+        )
@@ -0,0 +1,93 @@
+import atexit
+import queue
+import threading
+
+# Maximum number of writes waiting for the writer thread. Submitting more
+# blocks until the thread catches up
+QUEUE_SIZE = 1000
+
+
+class BackgroundWriter(object):
+    """Run file writes on a background thread, in the order they were made.
+
+    Writes are queued and the calling thread carries on, so serialising and
+    saving data does not hold up the display. The queue is bounded, so a slow
+    disk makes the caller wait rather than using unbounded memory. Errors
+    raised by a write are raised again in the calling thread by the next
+    submit(), flush() or close().
+
+    The writer is closed when the interpreter exits, including through
+    sys.exit() (e.g. the F12 quit key), so queued writes are not lost.
+
+    Parameters:
+    queue_size -- maximum number of writes waiting to be run
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue = queue.Queue(queue_size)
+        self.error = None
+
+        # A daemon thread, as non-daemon threads are joined before the atexit
+        # handler that tells this one to finish
+        self.thread = threading.Thread(
+            target=self._run, name="BackgroundWriter", daemon=True
+        )
+        self.thread.start()
+
+        atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+
+                function, args, kwargs = item
+                try:
+                    function(*args, **kwargs)
+                except Exception as e:
+                    if self.error is None:
+                        self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, function, *args, **kwargs):
+        """Queue a write to run on the writer thread.
+
+        Parameters:
+        function -- function to call
+        args -- positional arguments of the function
+        kwargs -- keyword arguments of the function
+        """
+
+        self._raise_error()
+
+        if not self.thread.is_alive():
+            raise RuntimeError("The background writer is closed")
+
+        self.queue.put((function, args, kwargs))
+
+    def flush(self):
+        """Wait until every queued write has run."""
+
+        if self.thread.is_alive():
+            self.queue.join()
+
+        self._raise_error()
+
+    def close(self):
+        """Run the queued writes and stop the writer thread."""
+
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+        atexit.unregister(self.close)
+
+        self._raise_error()